@@ -0,0 +1,217 @@
+"""
+Llamadas a Gemini sin bloquear, para el modo asíncrono (`ASYNC_MODE`).
+
+Con los workers sync de Gunicorn cada petición ocupa un proceso entero mientras
+espera a Gemini: con `-w 4`, cuatro llamadas lentas dejan al servidor sin
+capacidad. En modo asíncrono Gunicorn usa workers `gthread` con cientos de
+hilos (ver `gunicorn.conf.py`), y las llamadas de todos los hilos de un proceso
+van a un único event loop con `generate_content_async`: el hilo de la petición
+solo espera el resultado y el SDK multiplexa las llamadas en vuelo sobre el
+mismo canal. Los streams también corren en el loop (`AsyncRunner.stream`) y el
+hilo de la petición recibe cada fragmento por una cola.
+
+`ModelSlots` acota cuántas llamadas a cada modelo puede haber en vuelo a la vez
+en un proceso. Si no se libera un lugar a tiempo se lanza `ModelSaturatedError`
+sin llamar a la API, y los mismos caminos de respaldo que cubren un circuito
+abierto (respuesta vencida, banco de preguntas) atienden al alumno.
+"""
+import asyncio
+import os
+import queue
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+from circuit_breaker import CircuitOpenError
+
+
+class ModelSaturatedError(CircuitOpenError):
+    """No se liberó un lugar para llamar al modelo a tiempo: no se llama a la API."""
+
+
+class ModelSlots:
+    def __init__(self, limit: int, wait: float = 2.0):
+        self.limit = limit
+        self.wait = wait
+        self._lock = threading.Lock()
+        self._semaphores = {}
+        self._in_flight = {}
+        # Corrutinas esperando un lugar: (loop, future) que `release` despierta de a una
+        self._waiters = {}
+        self._pid = os.getpid()
+
+    def _semaphore(self, model_name: str) -> threading.BoundedSemaphore:
+        with self._lock:
+            if self._pid != os.getpid():
+                # Los lugares tomados en el proceso padre no se liberan en este
+                self._semaphores, self._in_flight, self._waiters = {}, {}, {}
+                self._pid = os.getpid()
+            semaphore = self._semaphores.get(model_name)
+            if semaphore is None:
+                semaphore = self._semaphores[model_name] = threading.BoundedSemaphore(self.limit)
+            return semaphore
+
+    def acquire(self, model_name: str, timeout: float = None) -> bool:
+        """Toma un lugar esperando hasta `timeout` segundos (por defecto `wait`; 0 = sin esperar)."""
+        if self.limit <= 0:
+            return True
+        timeout = self.wait if timeout is None else timeout
+        semaphore = self._semaphore(model_name)
+        if not (semaphore.acquire(timeout=timeout) if timeout > 0 else semaphore.acquire(blocking=False)):
+            return False
+        with self._lock:
+            self._in_flight[model_name] = self._in_flight.get(model_name, 0) + 1
+        return True
+
+    async def acquire_async(self, model_name: str) -> bool:
+        """`acquire` para el event loop: espera sin bloquear hasta que `release` avise o pase `wait`."""
+        if self.limit <= 0:
+            return True
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.wait
+        while True:
+            # Se anota antes de probar: un `release` entre el intento y el await no se pierde
+            waiter = loop.create_future()
+            self._semaphore(model_name)  # antes de anotarse: si hubo fork, reinicia el estado
+            with self._lock:
+                self._waiters.setdefault(model_name, deque()).append((loop, waiter))
+            if self.acquire(model_name, timeout=0):
+                self._forget(model_name, loop, waiter)
+                return True
+            try:
+                await asyncio.wait_for(waiter, max(0.0, deadline - loop.time()))
+            except asyncio.TimeoutError:
+                self._forget(model_name, loop, waiter)
+                return False
+            except BaseException:
+                self._forget(model_name, loop, waiter)
+                raise
+
+    def _forget(self, model_name: str, loop, waiter) -> None:
+        with self._lock:
+            waiters = self._waiters.get(model_name, ())
+            if (loop, waiter) in waiters:
+                waiters.remove((loop, waiter))
+                return
+        # `release` ya nos despertó y no vamos a usar ese aviso: pasa a la siguiente corrutina
+        self._wake(model_name)
+
+    def _wake(self, model_name: str) -> None:
+        with self._lock:
+            waiters = self._waiters.get(model_name)
+            if not waiters:
+                return
+            loop, waiter = waiters.popleft()
+        try:
+            loop.call_soon_threadsafe(_notify, waiter)
+        except RuntimeError:
+            # El loop ya se cerró: nadie más espera en él
+            pass
+
+    def release(self, model_name: str) -> None:
+        if self.limit <= 0:
+            return
+        with self._lock:
+            self._in_flight[model_name] -= 1
+        self._semaphore(model_name).release()
+        self._wake(model_name)
+
+    @contextmanager
+    def held(self, model_name: str, acquired: bool):
+        """Usa un lugar ya pedido con `acquire`: lo libera al salir, o lanza si no se consiguió."""
+        if not acquired:
+            raise ModelSaturatedError(f"{model_name}: {self.limit} llamadas en vuelo en este proceso")
+        try:
+            yield
+        finally:
+            self.release(model_name)
+
+    def take(self, model_name: str):
+        """Ocupa un lugar del modelo mientras dura la llamada (sin límite si `limit` es 0)."""
+        return self.held(model_name, self.acquire(model_name))
+
+    def in_flight(self) -> dict:
+        with self._lock:
+            return dict(self._in_flight)
+
+
+def _notify(waiter: asyncio.Future) -> None:
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+class AsyncRunner:
+    """Event loop propio de cada proceso, en un hilo aparte, para las llamadas a los modelos."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loop = None
+        self._pid = None
+
+    def loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None or self._pid != os.getpid():
+                # El hilo del loop no sobrevive al fork: cada worker arma el suyo
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="aio-models", daemon=True).start()
+                self._loop, self._pid = loop, os.getpid()
+            return self._loop
+
+    def run(self, coroutine, timeout: float = None):
+        """Corre la corrutina en el loop y espera el resultado desde el hilo de la petición."""
+        future = asyncio.run_coroutine_threadsafe(coroutine, self.loop())
+        try:
+            return future.result(timeout)
+        except BaseException:
+            # Timeout o el alumno cerró la página: se cancela la llamada en el loop
+            future.cancel()
+            raise
+
+    def generate(self, client, prompt, timeout: float = None):
+        """`client.generate_content_async` con el timeout de la llamada, sin bloquear el loop."""
+        async def call():
+            return await asyncio.wait_for(
+                client.generate_content_async(prompt, request_options={"timeout": timeout}), timeout
+            )
+        return self.run(call())
+
+    def stream(self, open_stream, timeout: float = None):
+        """Recorre desde el hilo de la petición un stream que corre en el loop.
+
+        `open_stream()` devuelve la corrutina que abre el stream (por ejemplo
+        `generate_content_async(prompt, stream=True)`); el stream entero tiene que
+        terminar en `timeout`. Si el generador se cierra antes (el alumno cerró la
+        página), se cancela el stream en el loop.
+        """
+        chunks = queue.Queue()
+        end = object()
+
+        async def pump():
+            async for chunk in await open_stream():
+                chunks.put(chunk)
+
+        async def run():
+            try:
+                await asyncio.wait_for(pump(), timeout)
+            except BaseException as e:
+                chunks.put(_StreamError(e))
+                raise
+            finally:
+                chunks.put(end)
+
+        future = asyncio.run_coroutine_threadsafe(run(), self.loop())
+        try:
+            while True:
+                chunk = chunks.get()
+                if chunk is end:
+                    return
+                if isinstance(chunk, _StreamError):
+                    raise chunk.error
+                yield chunk
+        finally:
+            future.cancel()
+
+
+class _StreamError:
+    def __init__(self, error: BaseException):
+        self.error = error
@@ -0,0 +1,95 @@
+"""
+Caché persistente de respuestas del tutor.
+
+Guarda en SQLite las respuestas ya generadas por Gemini para que cualquier
+worker de Gunicorn pueda reutilizarlas. Las entradas vencen por TTL y, cuando
+se supera el máximo configurado, se descartan las menos usadas (LRU).
+"""
+import hashlib
+import re
+import time
+
+from storage import Counters, connect
+
+
+def normalize_question(question: str) -> str:
+    """Normaliza mayúsculas, espacios y signos de apertura/cierre."""
+    text = re.sub(r"\s+", " ", question.casefold()).strip()
+    return text.strip("¿?¡!.,;: ")
+
+
+class AnswerCache:
+    def __init__(self, path: str, ttl: int = 7 * 24 * 3600, max_entries: int = 10000):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        conn = connect(path)
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS answers (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                expires_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS answers_last_access ON answers (last_access)")
+        self.counters = Counters(path, table="answer_cache_counters")
+
+    @staticmethod
+    def context_hash(prompt: str, model: str) -> str:
+        return hashlib.sha256(f"{model}\0{prompt}".encode("utf-8")).hexdigest()[:16]
+
+    @classmethod
+    def make_key(cls, question: str, prompt: str, model: str) -> str:
+        """Clave = pregunta normalizada + hash del prompt y el modelo."""
+        digest = hashlib.sha256(normalize_question(question).encode("utf-8")).hexdigest()
+        return f"{cls.context_hash(prompt, model)}:{digest}"
+
+    def get(self, key: str, allow_expired: bool = False):
+        now = time.time()
+        conn = connect(self.path)
+        row = conn.execute(
+            "SELECT value, expires_at FROM answers WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or (row[1] < now and not allow_expired):
+            self.counters.incr("misses")
+            return None
+
+        conn.execute("UPDATE answers SET last_access = ? WHERE key = ?", (now, key))
+        self.counters.incr("hits")
+        return row[0]
+
+    def set(self, key: str, value: str) -> None:
+        now = time.time()
+        conn = connect(self.path)
+        conn.execute(
+            "INSERT OR REPLACE INTO answers (key, value, created_at, expires_at, last_access) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (key, value, now, now + self.ttl, now),
+        )
+        self._evict(conn)
+
+    def _evict(self, conn) -> None:
+        conn.execute(
+            "DELETE FROM answers WHERE key IN ("
+            " SELECT key FROM answers ORDER BY last_access"
+            " LIMIT max(0, (SELECT count(*) FROM answers) - ?))",
+            (self.max_entries,),
+        )
+
+    def clear(self) -> None:
+        connect(self.path).execute("DELETE FROM answers")
+
+    def stats(self) -> dict:
+        counts = self.counters.snapshot()
+        hits, misses = counts.get("hits", 0), counts.get("misses", 0)
+        entries = connect(self.path).execute("SELECT count(*) FROM answers").fetchone()[0]
+        return {
+            "hits": hits,
+            "misses": misses,
+            "entries": entries,
+            "hit_ratio": hits / (hits + misses) if hits + misses else 0.0,
+        }
@@ -1,21 +1,58 @@
+import asyncio
+import hmac
 import json
+import logging
+import mimetypes
 import re
 import os
+import secrets
+import time
+import click
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from html import escape
+from html.parser import HTMLParser
 from dotenv import load_dotenv
+from werkzeug.middleware.proxy_fix import ProxyFix
 
-from flask import Flask, render_template, request, redirect, url_for
-import google.generativeai as genai
+from flask import (Blueprint, Flask, Response, abort, current_app, g, has_request_context,
+                   render_template, request, redirect, send_from_directory, session,
+                   stream_with_context, url_for)
+from flask.cli import AppGroup, with_appcontext
+
+from aio import AsyncRunner, ModelSaturatedError, ModelSlots
+from answer_cache import AnswerCache, normalize_question
+from assets import FONTS_CSS, MANIFEST as ASSETS_MANIFEST, brotli, build as build_assets, load_manifest
+from images import (MANIFEST as IMAGES_MANIFEST, VARIANTS_DIR, build as build_images,
+                    load_manifest as load_image_manifest, picture_html, png_size)
+from circuit_breaker import CLOSED, CircuitBreaker, CircuitOpenError, LatencyTracker
+from json_salvage import salvage_questions, salvage_sets
+from jobs import DONE, FAILED, QUEUED, RUNNING, JobQueue, JobWorkerPool, QueueFullError
+from config import config
+from metrics import COUNTER, GAUGE, Metrics
+from models import ModelRegistry
+from page_cache import PageCache, files_version
+from profiler import ProfileBudget, SamplingProfiler, write_folded
+from prompts import PromptRegistry, compare as compare_prompts, parse_split, usage_tokens
+from question_bank import QuestionBank, dump, question_hash
+from question_index import QuestionIndex
+from quiz_pool import QUESTIONS_PER_SET, PoolRefiller, QuizPool
+from quiz_results import QuizResults
+from rate_limit import QuotaExceededError, TokenBuckets
+from routing import COMPLEX_KEYWORDS, ModelRouter, hedged, hedged_async
+from singleflight import SingleFlight
+from storage import Counters
+from warm import PopularQuestions, Throttle, run_throttled
 
 # Cargar variables de entorno
 load_dotenv()
 
-# Configurar la API de Gemini
-api_key = os.getenv("GEMINI_API_KEY")
-if not api_key:
-    raise ValueError("GEMINI_API_KEY no está configurada. Por favor, crea un archivo .env con tu API key.")
-genai.configure(api_key=api_key)
+bp = Blueprint("main", __name__)
+
+timing_logger = logging.getLogger("gatto.timing")
 
-app = Flask(__name__)
+TUTOR_MODEL = "gemini-2.5-flash"
+QUIZ_MODEL = "gemini-2.0-flash-exp"
 
 # Prompt base (rol de la IA) con el orden solicitado
 PROMPT_BASE = """
@@ -114,6 +151,110 @@ Respondé ÚNICAMENTE con un JSON válido siguiendo esta estructura exacta (sin
 Recordá devolver exactamente 10 preguntas.
 """
 
+# Las preguntas que le faltan a una tanda que llegó incompleta
+TEST_FOLLOWUP_PROMPT_TEMPLATE = """
+Sos un profesor creativo que diseña preguntas de opción múltiple para chicos y chicas de primaria (entre 8 y 12 años).
+Creá {count} preguntas súper claras sobre el tema "{subject}".
+Nivel solicitado: {level_text}
+
+Ya tenemos estas preguntas, no las repitas:
+{existing}
+
+Las instrucciones obligatorias son:
+- Escribí todo en ESPAÑOL neutro.
+- Los enunciados deben ser breves, amigables y situados en situaciones cotidianas infantiles.
+- Las opciones deben ser cortas (máx. 8 palabras) y diferentes entre sí.
+- Añadí una pista/mnemotecnia divertida ("tip") para que el alumno recuerde la idea.
+
+Respondé ÚNICAMENTE con un JSON válido con esta estructura exacta:
+{{
+  "subject": "{subject}",
+  "questions": [
+    {{
+      "question": "Enunciado breve",
+      "options": ["Opción A", "Opción B", "Opción C", "Opción D"],
+      "correct": "Texto idéntico a la opción correcta",
+      "tip": "Consejo o truco corto"
+    }}
+  ]
+}}
+
+Recordá devolver exactamente {count} preguntas.
+"""
+
+# Varias tandas de 10 (de uno o más niveles) en una sola llamada a Gemini
+TEST_BATCH_PROMPT_TEMPLATE = """
+Sos un profesor creativo que diseña preguntas de opción múltiple para chicos y chicas de primaria (entre 8 y 12 años).
+Creá tandas de 10 preguntas súper claras sobre el tema "{subject}", para estos niveles:
+{levels_text}
+
+Las instrucciones obligatorias son:
+- Escribí todo en ESPAÑOL neutro.
+- Los enunciados deben ser breves, amigables y situados en situaciones cotidianas infantiles.
+- Las opciones deben ser cortas (máx. 8 palabras) y diferentes entre sí.
+- Añadí una pista/mnemotecnia divertida ("tip") para que el alumno recuerde la idea.
+- Usá contenidos apropiados para primaria.
+- No repitas preguntas entre tandas ni entre niveles.
+
+Respondé ÚNICAMENTE con un JSON válido siguiendo esta estructura exacta (sin texto adicional, ni explicaciones, ni bloques Markdown):
+{{
+  "subject": "{subject}",
+  "levels": {{
+    "<nivel>": [
+      {{
+        "questions": [
+          {{
+            "question": "Enunciado breve",
+            "options": ["Opción A", "Opción B", "Opción C", "Opción D"],
+            "correct": "Texto idéntico a la opción correcta",
+            "tip": "Consejo o truco corto"
+          }}
+        ]
+      }}
+    ]
+  }}
+}}
+
+Recordá devolver exactamente la cantidad de tandas pedida por nivel, cada una con 10 preguntas.
+"""
+
+# Versiones compactas: mismas reglas y formato, sin el ejemplo resuelto ni el esquema
+# indentado, que se pagan como tokens de entrada en cada llamada
+PROMPT_TUTOR_COMPACT = """
+Sos un profesor paciente, divertido y claro para chicos de primaria (7 a 12 años).
+Respondé en español, solo con HTML (<h3>, <p>, <ul>, <li>), sin markdown ni asteriscos.
+Incluí al menos un emoji y resaltá con color alguna palabra clave.
+Usá exactamente estas cuatro secciones, en este orden:
+<h3>1) Respuesta para la carpeta:</h3> lista de 3 a 5 puntos técnicos breves.
+<h3>2) Explicación simple:</h3> un párrafo con frases cortas, como a un amigo.
+<h3>3) Ejemplos cotidianos dinámicos:</h3> lista de 2 o 3 ejemplos concretos.
+<h3>4) Desafío para practicar (divertido y creativo):</h3> una mini actividad para escribir, dibujar o experimentar (no opción múltiple).
+"""
+
+TEST_PROMPT_COMPACT = """
+Creá 10 preguntas de opción múltiple para primaria (8 a 12 años) sobre "{subject}". {level_text}
+Español neutro, enunciados breves y cotidianos, 4 opciones cortas y distintas, y un "tip" divertido.
+Respondé solo con JSON: {{"subject": "{subject}", "questions": [{{"question": "", "options": ["", "", "", ""], "correct": "texto de la opción correcta", "tip": ""}}]}}
+"""
+
+TEST_BATCH_PROMPT_COMPACT = """
+Creá tandas de 10 preguntas de opción múltiple para primaria (8 a 12 años) sobre "{subject}":
+{levels_text}
+Español neutro, enunciados breves y cotidianos, 4 opciones cortas y distintas, un "tip" divertido, sin repetir preguntas.
+Respondé solo con JSON: {{"subject": "{subject}", "levels": {{"<nivel>": [{{"questions": [{{"question": "", "options": ["", "", "", ""], "correct": "texto de la opción correcta", "tip": ""}}]}}]}}}}
+"""
+
+# La primera variante de cada ruta es la que se usa si PROMPT_SPLIT no dice otra cosa
+PROMPTS = PromptRegistry()
+PROMPTS.register("tutor", "completo", 1, PROMPT_BASE + "\n\nDuda del alumno: {duda}",
+                 "Reglas, estructura y un ejemplo resuelto (fotosíntesis)")
+PROMPTS.register("tutor", "compacto", 1, PROMPT_TUTOR_COMPACT + "\nDuda del alumno: {duda}",
+                 "Las mismas cuatro secciones, sin el ejemplo resuelto")
+PROMPTS.register("quiz", "completo", 1, TEST_PROMPT_TEMPLATE, "Esquema JSON indentado")
+PROMPTS.register("quiz", "compacto", 1, TEST_PROMPT_COMPACT, "Esquema JSON en una línea")
+PROMPTS.register("quiz_batch", "completo", 1, TEST_BATCH_PROMPT_TEMPLATE, "Esquema JSON indentado")
+PROMPTS.register("quiz_batch", "compacto", 1, TEST_BATCH_PROMPT_COMPACT, "Esquema JSON en una línea")
+
 DIFFICULTIES = {
     "facil": "Nivel fácil",
     "intermedio": "Nivel intermedio",
@@ -127,250 +268,63 @@ DIFFICULTY_DESCRIPTIONS = {
 }
 
 
-FALLBACK_TESTS = {
-    "Matemática": {
-        "facil": [
-            {"question": "¿Cuánto es 5 + 7?", "options": ["10", "11", "12", "13"], "correct": "12", "tip": "Sumá primero 5 + 5 y agregá 2."},
-            {"question": "Si tenés 9 caramelos y regalás 3, ¿cuántos quedan?", "options": ["3", "5", "6", "7"], "correct": "6", "tip": "Restá lo que regalaste."},
-            {"question": "¿Qué número es el doble de 4?", "options": ["6", "8", "10", "12"], "correct": "8", "tip": "Duplicar es sumar el mismo número."},
-            {"question": "Un paquete tiene 10 figuritas. Si comprás 2 paquetes, ¿cuántas figuritas tenés?", "options": ["10", "15", "20", "25"], "correct": "20", "tip": "Sumá 10 dos veces."},
-            {"question": "¿Qué número es mayor?", "options": ["23", "32", "19", "13"], "correct": "32", "tip": "Miramos primero las decenas."},
-            {"question": "Si una torta se corta en 4 partes iguales y comés 1, ¿qué fracción comiste?", "options": ["1/2", "1/3", "1/4", "2/4"], "correct": "1/4", "tip": "El denominador indica el total de partes."},
-            {"question": "¿Cuánto falta para llegar de 18 a 20?", "options": ["1", "2", "3", "4"], "correct": "2", "tip": "Contá cuántos saltos necesitás."},
-            {"question": "¿Cuál es la mitad de 12?", "options": ["4", "5", "6", "8"], "correct": "6", "tip": "Partí 12 en dos grupos iguales."},
-            {"question": "Si una caja trae 3 lápices y tenés 4 cajas, ¿cuántos lápices hay?", "options": ["7", "9", "10", "12"], "correct": "12", "tip": "Multiplicá 3 x 4."},
-            {"question": "¿Cuál es el resultado de 15 - 9?", "options": ["4", "5", "6", "7"], "correct": "6", "tip": "Restá primero 10 - 9 y luego sumá 5."}
-        ],
-        "intermedio": [
-            {"question": "¿Cuánto es 36 + 47?", "options": ["63", "73", "83", "93"], "correct": "83", "tip": "Sumá decenas (30 + 40) y luego unidades."},
-            {"question": "Si tenés 5 paquetes con 4 figuritas cada uno, ¿cuántas figuritas son?", "options": ["9", "16", "20", "25"], "correct": "20", "tip": "Multiplicá 5 x 4 para saber el total."},
-            {"question": "¿Cuál es el doble de 28?", "options": ["46", "54", "56", "58"], "correct": "56", "tip": "Duplicar es sumar el mismo número dos veces."},
-            {"question": "Una soga mide 1 metro. ¿Cuántos centímetros son?", "options": ["10 cm", "100 cm", "1000 cm", "10000 cm"], "correct": "100 cm", "tip": "1 metro equivale a 100 centímetros."},
-            {"question": "¿Qué número es mayor?", "options": ["0,45", "0,54", "0,405", "0,504"], "correct": "0,54", "tip": "Compará decenas, luego centésimas."},
-            {"question": "Si un triángulo tiene lados 3 cm, 4 cm y 5 cm, su perímetro es…", "options": ["7 cm", "9 cm", "10 cm", "12 cm"], "correct": "12 cm", "tip": "Sumá los tres lados para el perímetro."},
-            {"question": "¿Cuánto falta para llegar de 67 a 100?", "options": ["23", "33", "43", "53"], "correct": "33", "tip": "100 - 67 te da la diferencia."},
-            {"question": "Si una pizza se divide en 8 partes iguales y comés 3, ¿qué fracción comiste?", "options": ["3/5", "3/8", "5/8", "8/3"], "correct": "3/8", "tip": "El denominador es la cantidad total de partes."},
-            {"question": "¿Qué operación resuelve 6 x 7?", "options": ["42", "36", "28", "56"], "correct": "42", "tip": "Recordá la tabla del 7."},
-            {"question": "Si un número multiplicado por 10 es 470, ¿cuál era el número inicial?", "options": ["4,7", "47", "4700", "470"], "correct": "47", "tip": "Dividir por 10 corre la coma un lugar."}
-        ],
-        "desafiante": [
-            {"question": "¿Cuál es el resultado de 125 + 98?", "options": ["203", "213", "223", "233"], "correct": "223", "tip": "Sumá primero 100 + 90 y luego las unidades."},
-            {"question": "Si un rectángulo mide 6 cm por 9 cm, ¿cuál es su área?", "options": ["15 cm²", "45 cm²", "54 cm²", "60 cm²"], "correct": "54 cm²", "tip": "Área = base x altura."},
-            {"question": "Tenés 3/4 de litro de jugo y tomás 1/8. ¿Cuánto queda?", "options": ["5/8", "2/3", "1/2", "3/8"], "correct": "5/8", "tip": "Buscá fracciones con el mismo denominador."},
-            {"question": "¿Cuál es el promedio de 12, 14 y 16?", "options": ["12", "13", "14", "15"], "correct": "14", "tip": "Sumá todo y dividí por la cantidad de números."},
-            {"question": "Si una bici recorre 5 km en 10 min, ¿cuántos km hace en una hora manteniendo la velocidad?", "options": ["10 km", "20 km", "25 km", "30 km"], "correct": "30 km", "tip": "Una hora tiene 60 min, es decir seis veces más."},
-            {"question": "¿Qué número multiplicado por 9 da 324?", "options": ["18", "32", "34", "36"], "correct": "36", "tip": "Dividí 324 por 9."},
-            {"question": "Si un tanque se llena 1/3 por la mañana y 2/5 por la tarde, ¿cuánto se llenó en total?", "options": ["13/15", "7/15", "11/15", "1"], "correct": "11/15", "tip": "Usá denominador común 15."},
-            {"question": "Convertí 2,5 metros a centímetros.", "options": ["25 cm", "105 cm", "205 cm", "250 cm"], "correct": "250 cm", "tip": "Multiplicá metros x 100."},
-            {"question": "Si la base de un triángulo es 12 cm y su altura 7 cm, ¿cuál es el área?", "options": ["42 cm²", "68 cm²", "72 cm²", "84 cm²"], "correct": "42 cm²", "tip": "Área = (base x altura) / 2."},
-            {"question": "Un número es 8 más que otro. Si suman 46, ¿cuáles son?", "options": ["18 y 28", "19 y 27", "20 y 26", "21 y 25"], "correct": "19 y 27", "tip": "Restá 8 y dividí el resto en dos partes."}
-        ]
-    },
-    "PDL": {
-        "facil": [
-            {"question": "¿Qué texto cuenta una historia corta?", "options": ["Receta", "Cuento", "Nota", "Lista"], "correct": "Cuento", "tip": "Tiene inicio, nudo y final."},
-            {"question": "En una carta, ¿cómo saludás al empezar?", "options": ["Querido...", "Hola, chau", "Fin", "Gracias"], "correct": "Querido...", "tip": "Primero se saluda con cariño."},
-            {"question": "¿Cuál de estas palabras imita un sonido?", "options": ["Perro", "¡Boom!", "Grande", "Rápido"], "correct": "¡Boom!", "tip": "Las onomatopeyas hacen ruido."},
-            {"question": "¿Qué signo usamos para una pregunta?", "options": ["!", "¿?", ",", "."], "correct": "¿?", "tip": "En español las preguntas comienzan y terminan con el signo."},
-            {"question": "¿Qué texto explica ingredientes y pasos?", "options": ["Cuento", "Receta", "Poema", "Aviso"], "correct": "Receta", "tip": "Tiene lista y instrucciones."},
-            {"question": "¿Cómo se llama el que narra la historia?", "options": ["Autor", "Narrador", "Actor", "Director"], "correct": "Narrador", "tip": "Puede ser personaje o externo."},
-            {"question": "¿Qué texto informa sobre un hecho real de hoy?", "options": ["Cuento", "Poema", "Noticia", "Juego"], "correct": "Noticia", "tip": "Responde qué, quién, cuándo, dónde."},
-            {"question": "¿Qué parte de un cuento presenta a los personajes?", "options": ["Inicio", "Nudo", "Desenlace", "Título"], "correct": "Inicio", "tip": "Es el comienzo de la historia."},
-            {"question": "¿Cuál de estas palabras rima con 'sol'?", "options": ["Casa", "Col", "Perro", "Mesa"], "correct": "Col", "tip": "Buscá el mismo sonido final."},
-            {"question": "¿Qué texto tiene versos?", "options": ["Poema", "Receta", "Carta", "Instructivo"], "correct": "Poema", "tip": "Sus líneas se llaman versos."}
-        ],
-        "intermedio": [
-            {"question": "¿Qué tipo de texto tiene personajes y un narrador?", "options": ["Receta", "Cuento", "Instructivo", "Noticia"], "correct": "Cuento", "tip": "Pensá en historias con principio y final."},
-            {"question": "¿Qué parte de la carta dice adiós?", "options": ["Saludo", "Cuerpo", "Despedida", "Posdata"], "correct": "Despedida", "tip": "Se ubica antes de la firma."},
-            {"question": "En un instructivo, ¿qué indican los verbos en infinitivo?", "options": ["Lugar", "Acción", "Tiempo", "Personaje"], "correct": "Acción", "tip": "Son los pasos a seguir."},
-            {"question": "¿Cuál es un ejemplo de onomatopeya?", "options": ["Ruidoso", "¡Splash!", "Gigante", "Bella"], "correct": "¡Splash!", "tip": "Imita un sonido."},
-            {"question": "¿Qué texto informa sobre un hecho real?", "options": ["Poema", "Noticia", "Cuento", "Historieta"], "correct": "Noticia", "tip": "Responde a qué, quién, cuándo, dónde."},
-            {"question": "¿Qué signo de puntuación marca el final de una oración enunciativa?", "options": ["¿?", "!", ".", ","], "correct": ".", "tip": "Se usa para cerrar ideas."},
-            {"question": "¿Qué recurso repite sonidos similares al inicio de palabras?", "options": ["Aliteración", "Metáfora", "Comparación", "Personificación"], "correct": "Aliteración", "tip": "Repite letras como la L en 'luz lenta'."},
-            {"question": "¿Cómo se llama el que cuenta la historia?", "options": ["Protagonista", "Narrador", "Autor", "Lector"], "correct": "Narrador", "tip": "Puede ser un personaje o externo."},
-            {"question": "¿Qué parte de un cuento presenta el conflicto?", "options": ["Inicio", "Nudo", "Desenlace", "Epílogo"], "correct": "Nudo", "tip": "Allí aparece el problema principal."},
-            {"question": "¿Qué texto usa rimas y versos?", "options": ["Cuento", "Noticia", "Poema", "Receta"], "correct": "Poema", "tip": "Los versos se agrupan en estrofas."}
-        ],
-        "desafiante": [
-            {"question": "¿Qué recurso literario compara dos cosas sin usar 'como'?", "options": ["Metáfora", "Simil", "Onomatopeya", "Hipérbole"], "correct": "Metáfora", "tip": "Une ideas para que imagines mejor."},
-            {"question": "En una noticia, ¿qué información suele ir en el copete?", "options": ["Detalles mínimos", "Resumen del hecho", "Opinión personal", "Publicidad"], "correct": "Resumen del hecho", "tip": "Es lo primero que se lee."},
-            {"question": "¿Cuál es la diferencia entre argumento y trama?", "options": ["Son iguales", "El argumento es general y la trama detalla", "La trama es general", "Ninguna"], "correct": "El argumento es general y la trama detalla", "tip": "Pensá en un mapa (argumento) y el viaje (trama)."},
-            {"question": "¿Qué función cumplen las citas textuales en un informe?", "options": ["Decorar", "Aportar evidencia", "Hacer chistes", "Separar párrafos"], "correct": "Aportar evidencia", "tip": "Muestran que investigaste."},
-            {"question": "¿Qué indica la voz pasiva en un texto?", "options": ["Quién recibe la acción", "Quién actúa", "Un sonido", "Un diálogo"], "correct": "Quién recibe la acción", "tip": "Ej: 'El cuadro fue pintado por Ana'."},
-            {"question": "¿Cuál es la función de un organizador gráfico?", "options": ["Decorar", "Ordenar ideas", "Quitar datos", "Agregar chistes"], "correct": "Ordenar ideas", "tip": "Sirve para planificar antes de escribir."},
-            {"question": "¿Qué diferencia hay entre noticia y crónica?", "options": ["Ninguna", "La crónica agrega opinión y orden cronológico", "La noticia inventa", "La crónica es más corta"], "correct": "La crónica agrega opinión y orden cronológico", "tip": "La noticia solo informa."},
-            {"question": "¿Qué recurso permite exagerar una idea para darle fuerza?", "options": ["Metáfora", "Hipérbole", "Personificación", "Oxímoron"], "correct": "Hipérbole", "tip": "Ej: 'Te llamé un millón de veces'."},
-            {"question": "¿Qué parte de una reseña describe la opinión del autor?", "options": ["Introducción", "Cuerpo", "Evaluación", "Ficha técnica"], "correct": "Evaluación", "tip": "Allí recomendás o no la obra."},
-            {"question": "¿Por qué se usan conectores en un texto informativo?", "options": ["Para adornar", "Para unir ideas", "Para cambiar el tema", "Para borrar datos"], "correct": "Para unir ideas", "tip": "Palabras como 'además' guían al lector."}
-        ]
-    },
-    "Cs. Naturales": {
-        "facil": [
-            {"question": "¿Qué parte del cuerpo usamos para respirar?", "options": ["Pulmones", "Corazón", "Estómago", "Pies"], "correct": "Pulmones", "tip": "Se inflan como globos."},
-            {"question": "¿Cómo se llama el astro que nos da luz y calor?", "options": ["Luna", "Sol", "Tierra", "Marte"], "correct": "Sol", "tip": "Sale todos los días."},
-            {"question": "¿Qué animal pone huevos?", "options": ["Gato", "Gallina", "Perro", "Conejo"], "correct": "Gallina", "tip": "Vive en el gallinero."},
-            {"question": "¿Qué necesitamos las personas para vivir?", "options": ["Agua", "Arena", "Pintura", "Plástico"], "correct": "Agua", "tip": "Nuestro cuerpo es en gran parte agua."},
-            {"question": "¿Cómo se llama el proceso del agua que se convierte en vapor?", "options": ["Lluvia", "Evaporación", "Hielo", "Granizo"], "correct": "Evaporación", "tip": "Ocurre con el calor."},
-            {"question": "¿Qué parte de la planta absorbe agua?", "options": ["Flores", "Raíces", "Frutos", "Semillas"], "correct": "Raíces", "tip": "Están bajo tierra."},
-            {"question": "¿Qué animal vive en el mar?", "options": ["Delfín", "Vaca", "Caballo", "Gato"], "correct": "Delfín", "tip": "Respira aire pero nada."},
-            {"question": "¿Cómo se llama el gas que respiramos?", "options": ["Nitrógeno", "Oxígeno", "Helio", "Dióxido de carbono"], "correct": "Oxígeno", "tip": "Las plantas lo producen."},
-            {"question": "¿Cuál es un ejemplo de alimento saludable?", "options": ["Gaseosa", "Manzana", "Golocina", "Papas fritas"], "correct": "Manzana", "tip": "Las frutas tienen vitaminas."},
-            {"question": "¿Qué órgano late todo el tiempo?", "options": ["Pulmón", "Hígado", "Corazón", "Riñón"], "correct": "Corazón", "tip": "Bombea sangre."}
-        ],
-        "intermedio": [
-            {"question": "¿Qué órgano bombea la sangre?", "options": ["Pulmón", "Hígado", "Corazón", "Estómago"], "correct": "Corazón", "tip": "Late todo el tiempo."},
-            {"question": "¿Cómo se llama el proceso en el que las plantas producen su alimento?", "options": ["Respiración", "Fotosíntesis", "Digestión", "Evaporación"], "correct": "Fotosíntesis", "tip": "Usan luz del sol, agua y CO₂."},
-            {"question": "¿Cuál es la estrella más cercana a la Tierra?", "options": ["Sirio", "Sol", "Polaris", "Vega"], "correct": "Sol", "tip": "Nos da luz y calor."},
-            {"question": "¿Qué órgano nos permite respirar?", "options": ["Riñones", "Pulmones", "Huesos", "Piel"], "correct": "Pulmones", "tip": "Se inflan como globos."},
-            {"question": "¿Qué estado del agua vemos en el hielo?", "options": ["Líquido", "Sólido", "Gaseoso", "Plasma"], "correct": "Sólido", "tip": "Mantiene forma propia."},
-            {"question": "¿Cuál es un ejemplo de vertebrado?", "options": ["Caracol", "Gato", "Pulpo", "Mariposa"], "correct": "Gato", "tip": "Tienen columna vertebral."},
-            {"question": "¿Qué gas respiramos del aire?", "options": ["Dióxido de carbono", "Helio", "Oxígeno", "Nitrógeno"], "correct": "Oxígeno", "tip": "Las plantas lo liberan."},
-            {"question": "¿Cómo se llama el cambio de sólido a líquido?", "options": ["Condensación", "Fusión", "Sublimación", "Evaporación"], "correct": "Fusión", "tip": "Ocurre cuando el hielo se derrite."},
-            {"question": "¿Qué parte de la planta absorbe agua del suelo?", "options": ["Flores", "Raíces", "Frutos", "Hojas"], "correct": "Raíces", "tip": "Son como pajitas subterráneas."},
-            {"question": "¿Cuál es un ejemplo de mamífero acuático?", "options": ["Delfín", "Atún", "Medusa", "Tortuga"], "correct": "Delfín", "tip": "Respiran aire y amamantan a sus crías."}
-        ],
-        "desafiante": [
-            {"question": "¿Por qué las hojas son verdes?", "options": ["Por la clorofila", "Por el agua", "Por la savia", "Por el sol"], "correct": "Por la clorofila", "tip": "Es un pigmento que capta luz."},
-            {"question": "¿Qué parte del sistema respiratorio filtra el aire antes de llegar a los pulmones?", "options": ["Bronquios", "Tráquea", "Diafragma", "Clavícula"], "correct": "Tráquea", "tip": "Tiene pelitos que atrapan polvo."},
-            {"question": "¿Qué planeta es conocido como el 'planeta rojo'?", "options": ["Mercurio", "Venus", "Marte", "Júpiter"], "correct": "Marte", "tip": "Su suelo tiene óxido de hierro."},
-            {"question": "¿Cómo se llama el proceso en el que el agua pasa de gas a líquido?", "options": ["Sublimación", "Condensación", "Fusión", "Solidificación"], "correct": "Condensación", "tip": "Forma nubes y gotas."},
-            {"question": "¿Qué sistema del cuerpo se encarga de enviar mensajes rápidos?", "options": ["Digestivo", "Nervioso", "Circulatorio", "Óseo"], "correct": "Nervioso", "tip": "Funciona con neuronas."},
-            {"question": "¿Qué es un ecosistema?", "options": ["Un animal", "Un lugar donde interactúan seres vivos y ambiente", "Una planta", "Una nube"], "correct": "Un lugar donde interactúan seres vivos y ambiente", "tip": "Incluye clima, suelo, plantas y animales."},
-            {"question": "¿Cuál es la función de los glóbulos blancos?", "options": ["Transportar oxígeno", "Defender el cuerpo", "Formar huesos", "Producir energía"], "correct": "Defender el cuerpo", "tip": "Son los soldados del sistema inmune."},
-            {"question": "¿Qué ocurre en la mitosis?", "options": ["Respira la célula", "Se divide en dos células hijas", "Come la célula", "Se rompe el ADN"], "correct": "Se divide en dos células hijas", "tip": "Permite crecer y reparar tejidos."},
-            {"question": "¿Por qué el sonido viaja más rápido en el agua que en el aire?", "options": ["El agua es más fría", "Porque las partículas están más juntas", "Hay más luz", "Se refleja"], "correct": "Porque las partículas están más juntas", "tip": "El sonido necesita un medio para vibrar."},
-            {"question": "¿Cuál es la principal fuente de energía renovable en Argentina?", "options": ["Nuclear", "Eólica y solar", "Carbón", "Gas"], "correct": "Eólica y solar", "tip": "Aprovechan viento y sol sin agotarse."}
-        ]
-    },
-    "Cs. Sociales": {
-        "facil": [
-            {"question": "¿Cómo se llama el lugar donde vivimos?", "options": ["País", "Planeta", "Barrio", "Todo"], "correct": "Barrio", "tip": "Es la zona cerca de casa."},
-            {"question": "¿Qué símbolo patrio se canta?", "options": ["Bandera", "Himno", "Escudo", "Escarapela"], "correct": "Himno", "tip": "Tiene letra y música."},
-            {"question": "¿Quién dirige una escuela?", "options": ["Director", "Intendente", "Presidente", "Comerciante"], "correct": "Director", "tip": "Coordina a los docentes."},
-            {"question": "¿Qué usamos para orientarnos al norte, sur, este y oeste?", "options": ["Regla", "Brújula", "Libro", "Termómetro"], "correct": "Brújula", "tip": "Marca siempre el norte."},
-            {"question": "¿Qué continente está en Argentina?", "options": ["Asia", "Europa", "Oceanía", "América"], "correct": "América", "tip": "Compartimos con muchos países."},
-            {"question": "¿Qué profesión ayuda a curar a las personas?", "options": ["Médico", "Carpintero", "Piloto", "Actor"], "correct": "Médico", "tip": "Trabaja en hospitales o centros de salud."},
-            {"question": "¿Qué transporte va por las vías?", "options": ["Auto", "Barco", "Tren", "Avión"], "correct": "Tren", "tip": "Sigue una línea de metal."},
-            {"question": "¿Qué hacemos cuando votamos?", "options": ["Compramos", "Elegimos autoridades", "Jugamos", "Pintamos"], "correct": "Elegimos autoridades", "tip": "Es un derecho cívico."},
-            {"question": "¿Qué es un mapa?", "options": ["Un cuento", "Una representación de un lugar", "Un juego", "Una canción"], "correct": "Una representación de un lugar", "tip": "Muestra ríos, ciudades y montañas."},
-            {"question": "¿Qué fecha se celebra el Día de la Independencia en Argentina?", "options": ["25 de Mayo", "20 de Junio", "9 de Julio", "12 de Octubre"], "correct": "9 de Julio", "tip": "En 1816 declaramos ser libres."}
-        ],
-        "intermedio": [
-            {"question": "¿Qué documento establece las reglas de un país?", "options": ["Factura", "Constitución", "Receta", "Agenda"], "correct": "Constitución", "tip": "Es la ley más importante."},
-            {"question": "¿Cómo se llama a las personas que viven en un lugar?", "options": ["Vegetación", "Población", "Clima", "Relieve"], "correct": "Población", "tip": "Somos todos los habitantes."},
-            {"question": "¿Qué invento facilitó el transporte marítimo?", "options": ["Semáforo", "Brújula", "Ascensor", "Radio"], "correct": "Brújula", "tip": "Ayuda a orientarse en el mar."},
-            {"question": "¿Cuál es un ejemplo de recurso natural renovable?", "options": ["Carbón", "Petróleo", "Viento", "Hierro"], "correct": "Viento", "tip": "La naturaleza lo repone constantemente."},
-            {"question": "¿Qué estudia la geografía?", "options": ["Hechos del pasado", "Lenguas", "El espacio y sus paisajes", "Números"], "correct": "El espacio y sus paisajes", "tip": "Observa relieves, climas y personas."},
-            {"question": "¿Cómo se llama el poder que hace las leyes?", "options": ["Ejecutivo", "Judicial", "Legislativo", "Municipal"], "correct": "Legislativo", "tip": "Se reúne en el Congreso."},
-            {"question": "¿Qué continente está al sur de Europa?", "options": ["Asia", "África", "Oceanía", "América"], "correct": "África", "tip": "Los separa el Mediterráneo."},
-            {"question": "¿Cómo se llama el intercambio de productos entre regiones?", "options": ["Siembra", "Comercio", "Turismo", "Escritura"], "correct": "Comercio", "tip": "Puede ser local o internacional."},
-            {"question": "¿Qué grupo defendía la independencia en 1810?", "options": ["Realistas", "Patriotas", "Piratas", "Exploradores"], "correct": "Patriotas", "tip": "Querían autogobernarse."},
-            {"question": "¿Cuál es un ejemplo de símbolo patrio argentino?", "options": ["Escarapela", "Mate", "Asado", "Tango"], "correct": "Escarapela", "tip": "La usamos en fechas patrias."}
-        ],
-        "desafiante": [
-            {"question": "¿Qué característica tiene un gobierno republicano?", "options": ["Un solo gobernante", "División de poderes", "Mandato vitalicio", "No hay elecciones"], "correct": "División de poderes", "tip": "Poder Ejecutivo, Legislativo y Judicial."},
-            {"question": "¿Por qué la Revolución Industrial cambió la población urbana?", "options": ["No hubo cambios", "Porque generó trabajo en las ciudades", "Porque cerró las fábricas", "Porque prohibió el comercio"], "correct": "Porque generó trabajo en las ciudades", "tip": "Muchas personas migraron desde el campo."},
-            {"question": "¿Qué recurso natural no renovable se forma durante millones de años?", "options": ["Petróleo", "Viento", "Energía solar", "Agua"], "correct": "Petróleo", "tip": "Se usa para combustibles."},
-            {"question": "¿Qué es la globalización?", "options": ["Un deporte", "La conexión entre países a nivel económico y cultural", "Una fiesta", "Un río"], "correct": "La conexión entre países a nivel económico y cultural", "tip": "Permite que ideas y productos viajen rápido."},
-            {"question": "¿Cuál es una consecuencia de la deforestación?", "options": ["Más oxígeno", "Pérdida de biodiversidad", "Más lluvia", "Bosques saludables"], "correct": "Pérdida de biodiversidad", "tip": "Menos árboles = menos hábitats."},
-            {"question": "¿Qué describe un climograma?", "options": ["Animales", "Temperaturas y precipitaciones", "Transportes", "Lenguas"], "correct": "Temperaturas y precipitaciones", "tip": "Tiene barras y líneas."},
-            {"question": "¿Cuál fue la importancia de la Asamblea del Año XIII?", "options": ["Inventó la imprenta", "Declaró un himno y escudo, avanzó en libertad de vientres", "Fundó escuelas", "Organizó el fútbol"], "correct": "Declaró un himno y escudo, avanzó en libertad de vientres", "tip": "Fue un paso hacia la independencia completa."},
-            {"question": "¿Qué midió la Primera Junta al asumir en 1810?", "options": ["La población", "La cantidad de impuestos", "El valor del peso", "La producción agrícola"], "correct": "La cantidad de impuestos", "tip": "Necesitaban financiamiento para gobernar."},
-            {"question": "¿Qué significa soberanía popular?", "options": ["Gobierna el rey", "El poder reside en el pueblo", "Gobierna un ejército", "Gobierna otro país"], "correct": "El poder reside en el pueblo", "tip": "Las decisiones se toman por votación."},
-            {"question": "¿Cuál fue una causa económica de la independencia americana?", "options": ["Abundancia de oro", "Deseo de comerciar sin restricciones españolas", "Escasez de ideas", "La radio"], "correct": "Deseo de comerciar sin restricciones españolas", "tip": "Las colonias querían vender directamente."}
-        ]
-    },
-    "Ed. Física": {
-        "facil": [
-            {"question": "¿Qué parte del cuerpo movés cuando saltás?", "options": ["Piernas", "Orejas", "Pestañas", "Nariz"], "correct": "Piernas", "tip": "Te ayudan a despegar."},
-            {"question": "¿Qué debés hacer antes de correr?", "options": ["Estirar", "Dormir", "Comer golosinas", "Ver TV"], "correct": "Estirar", "tip": "Calentar evita lesiones."},
-            {"question": "¿Qué bebida hidrata mejor?", "options": ["Gaseosa", "Agua", "Jugo artificial", "Gaseosa de cola"], "correct": "Agua", "tip": "Siempre llevá tu botellita."},
-            {"question": "¿Qué objeto se usa para jugar al fútbol?", "options": ["Raqueta", "Pelota", "Red", "Disco"], "correct": "Pelota", "tip": "Se patea."},
-            {"question": "¿Qué valor practicás al esperar tu turno?", "options": ["Paciencia", "Ruido", "Tristeza", "Olvido"], "correct": "Paciencia", "tip": "Así todos juegan."},
-            {"question": "¿Qué postura es correcta al sentarse?", "options": ["Espalda recta", "Hombros caídos", "Cabeza colgando", "Sin apoyarse"], "correct": "Espalda recta", "tip": "Apoyá la espalda en el respaldo."},
-            {"question": "¿Qué elemento se usa para saltar la soga?", "options": ["Soga", "Pelota", "Palo", "Aro"], "correct": "Soga", "tip": "Coordiná brazos y piernas."},
-            {"question": "¿Qué sentido usamos para mantener el equilibrio?", "options": ["Vista", "Oído", "Tacto", "Todos ayudan"], "correct": "Todos ayudan", "tip": "El cuerpo trabaja en equipo."},
-            {"question": "¿Qué parte del cuerpo fortalece andar en bici?", "options": ["Manos", "Piernas", "Orejas", "Nariz"], "correct": "Piernas", "tip": "Pedalear es gran ejercicio."},
-            {"question": "¿Qué juego necesita una pelota chica y una red baja?", "options": ["Tenis", "Handball", "Ping pong", "Vóley"], "correct": "Ping pong", "tip": "Se juega con paletas."}
-        ],
-        "intermedio": [
-            {"question": "¿Cuál es una actividad aeróbica?", "options": ["Leer", "Correr", "Dormir", "Pintar"], "correct": "Correr", "tip": "Hace trabajar corazón y pulmones."},
-            {"question": "¿Qué parte se debe estirar antes de saltar?", "options": ["Dedos", "Piernas", "Orejas", "Ceja"], "correct": "Piernas", "tip": "Son las que impulsan el salto."},
-            {"question": "¿Cómo se llama el ejercicio de mantenerse en una sola pierna?", "options": ["Resistencia", "Equilibrio", "Velocidad", "Fuerza"], "correct": "Equilibrio", "tip": "Imaginá que sos un flamenco."},
-            {"question": "¿Cuál es una señal de que se debe hidratar el cuerpo?", "options": ["Cansancio", "Sueño", "Hambre", "Frío"], "correct": "Cansancio", "tip": "Tomá agua antes y después de jugar."},
-            {"question": "¿Qué objeto se usa para medir el tiempo en carreras?", "options": ["Brújula", "Cronómetro", "Linterna", "Pelota"], "correct": "Cronómetro", "tip": "Cuenta segundos con precisión."},
-            {"question": "¿Cuál es un ejemplo de juego cooperativo?", "options": ["Escondidas", "Carrera de postas", "Rayuela", "Saltar la soga"], "correct": "Carrera de postas", "tip": "Necesitás a tu equipo."},
-            {"question": "¿Qué músculo fortalece hacer abdominales?", "options": ["Cuádriceps", "Bíceps", "Abdomen", "Gemelos"], "correct": "Abdomen", "tip": "Protege la espalda."},
-            {"question": "¿Cuál es una postura correcta al sentarse?", "options": ["Espalda recta", "Hombros caídos", "Cabeza hacia abajo", "Piernas cruzadas"], "correct": "Espalda recta", "tip": "Apoyá toda la espalda en el respaldo."},
-            {"question": "¿Qué elemento se usa en vóley para separar los equipos?", "options": ["Arco", "Red", "Aro", "Paralelas"], "correct": "Red", "tip": "La pelota debe pasar por encima."},
-            {"question": "¿Qué valor se refuerza al respetar turnos en un juego?", "options": ["Paciencia", "Tristeza", "Ruido", "Olvido"], "correct": "Paciencia", "tip": "Esperar turno mantiene el juego ordenado."}
-        ],
-        "desafiante": [
-            {"question": "¿Qué capacidad mejora el entrenamiento interválico?", "options": ["Flexibilidad", "Resistencia aeróbica", "Reacción", "Ninguna"], "correct": "Resistencia aeróbica", "tip": "Alterna tramos rápidos y lentos."},
-            {"question": "¿Qué músculo trabaja el ejercicio de plancha?", "options": ["Abdominales", "Gemelos", "Trapecio", "Cuádriceps"], "correct": "Abdominales", "tip": "Mantiene el cuerpo firme como tabla."},
-            {"question": "¿Qué componente del entrenamiento desarrolla la agilidad?", "options": ["Series de velocidad", "Estiramiento suave", "Respiración", "Relajación"], "correct": "Series de velocidad", "tip": "Frena, gira y vuelve a arrancar."},
-            {"question": "¿Qué sucede si elongás solo 5 segundos cada músculo?", "options": ["Es suficiente", "No alcanza para relajar", "Mejora mucho", "Es peligroso"], "correct": "No alcanza para relajar", "tip": "Necesitás al menos 20 segundos."},
-            {"question": "¿Qué indica tu frecuencia cardíaca máxima aproximada?", "options": ["220 - edad", "Edad + 20", "Edad x 2", "120 fijo"], "correct": "220 - edad", "tip": "Sirve para medir el esfuerzo."},
-            {"question": "¿Cuál es un ejemplo de ejercicio pliométrico?", "options": ["Saltar cajones", "Marchar", "Caminar", "Balancearse"], "correct": "Saltar cajones", "tip": "Impulsa músculos enérgicamente."},
-            {"question": "¿Qué cualidad física trabaja una carrera de 60 metros?", "options": ["Fuerza máxima", "Velocidad", "Resistencia", "Flexibilidad"], "correct": "Velocidad", "tip": "Se corre lo más rápido posible."},
-            {"question": "¿Por qué se recomienda hidratarse con sorbos frecuentes?", "options": ["Para cansarse", "Para evitar calambres y reponer lo perdido", "Para enfriar los pies", "Para dormir"], "correct": "Para evitar calambres y reponer lo perdido", "tip": "El cuerpo elimina agua al sudar."},
-            {"question": "¿Qué cualidad desarrolla el trabajo con bandas elásticas?", "options": ["Fuerza", "Olfato", "Equilibrio", "Todos"], "correct": "Fuerza", "tip": "Podés graduar la intensidad."},
-            {"question": "¿Qué valor deportivo se fortalece al animar a tu equipo incluso si pierden?", "options": ["Respeto", "Desigualdad", "Tristeza", "Ruido"], "correct": "Respeto", "tip": "El juego limpio vale más que el resultado."}
-        ]
-    },
-    "Inglés": {
-        "facil": [
-            {"question": "¿Cómo se dice 'hola' en inglés?", "options": ["Bye", "Hello", "Thanks", "Dog"], "correct": "Hello", "tip": "Se pronuncia jeló."},
-            {"question": "¿Cuál es el color 'red'?", "options": ["Azul", "Rojo", "Verde", "Amarillo"], "correct": "Rojo", "tip": "Pensá en una manzana roja."},
-            {"question": "¿Cómo se dice 'gracias'?", "options": ["Please", "Thanks", "Sorry", "Hello"], "correct": "Thanks", "tip": "También podés decir Thank you."},
-            {"question": "¿Cuál es el plural de 'cat'?", "options": ["Cates", "Cats", "Catos", "Cat"], "correct": "Cats", "tip": "Solo agregá una s."},
-            {"question": "¿Qué palabra significa 'libro'?", "options": ["Book", "Bag", "Box", "Bike"], "correct": "Book", "tip": "Las cuatro empiezan igual."},
-            {"question": "¿Cómo se dice 'sí'?", "options": ["No", "Yes", "Good", "See"], "correct": "Yes", "tip": "Se pronuncia 'ies'."},
-            {"question": "¿Cuál es la traducción de 'house'?", "options": ["Casa", "Auto", "Árbol", "Silla"], "correct": "Casa", "tip": "Rima con mouse."},
-            {"question": "¿Qué pronombre usamos para hablar de nosotros?", "options": ["He", "She", "We", "They"], "correct": "We", "tip": "Incluye a quien habla."},
-            {"question": "¿Cómo se dice 'perro'?", "options": ["Cat", "Bird", "Dog", "Fish"], "correct": "Dog", "tip": "Suena a 'dog'."},
-            {"question": "¿Qué significa 'thank you'?", "options": ["Por favor", "Hola", "Gracias", "Adiós"], "correct": "Gracias", "tip": "Úsalo al recibir ayuda."}
-        ],
-        "intermedio": [
-            {"question": "¿Cómo se dice ""gato"" en inglés?", "options": ["Dog", "Cat", "Cow", "Duck"], "correct": "Cat", "tip": "Suena parecido a la palabra en español."},
-            {"question": "¿Cuál es el plural de ""bus""?", "options": ["Buses", "Buss", "Busies", "Busez"], "correct": "Buses", "tip": "Agregá -es cuando termina en s."},
-            {"question": "¿Cómo se traduce ""blue""?", "options": ["Rojo", "Azul", "Verde", "Amarillo"], "correct": "Azul", "tip": "Piénsalo como el color del cielo."},
-            {"question": "¿Qué pronombre reemplaza a ""María y yo""?", "options": ["We", "They", "She", "He"], "correct": "We", "tip": "Es la forma para nosotros."},
-            {"question": "¿Cómo se dice ""gracias"" en inglés?", "options": ["Please", "Hello", "Thanks", "Bye"], "correct": "Thanks", "tip": "También podés decir Thank you."},
-            {"question": "¿Cuál es el pasado de ""play""?", "options": ["Played", "Playd", "Plays", "Playsed"], "correct": "Played", "tip": "Los verbos regulares suman -ed."},
-            {"question": "¿Qué significa ""Good morning""?", "options": ["Buenas noches", "Buenos días", "Hola", "Chau"], "correct": "Buenos días", "tip": "Se usa por la mañana."},
-            {"question": "¿Cuál es la forma correcta para decir ""ella está feliz""?", "options": ["She is happy", "She are happy", "She happy", "She be happy"], "correct": "She is happy", "tip": "She va con el verbo is."},
-            {"question": "¿Cómo se dice ""libro"" en inglés?", "options": ["Book", "Box", "Bag", "Bike"], "correct": "Book", "tip": "Las cuatro empiezan con B, ¡leé bien!"},
-            {"question": "¿Qué palabra completa la frase ""I ___ pizza""?", "options": ["like", "likes", "liked", "liking"], "correct": "like", "tip": "Con I el verbo queda en su forma base."}
-        ],
-        "desafiante": [
-            {"question": "¿Cuál es el pasado de 'to eat'?", "options": ["Eat", "Eated", "Ate", "Eaten"], "correct": "Ate", "tip": "Es un verbo irregular."},
-            {"question": "¿Cómo traducís 'She has been studying'?", "options": ["Ella estudia", "Ella estuvo estudiando", "Ella estudió ayer", "Ella estudiará"], "correct": "Ella estuvo estudiando", "tip": "Es un presente perfecto continuo."},
-            {"question": "¿Cuál es el comparativo de 'happy'?", "options": ["More happy", "Happier", "Most happy", "Happyer"], "correct": "Happier", "tip": "Si termina en y, se cambia por ier."},
-            {"question": "Completá: 'If it rains, we ___ inside.'", "options": ["stay", "stays", "stayed", "staying"], "correct": "stay", "tip": "En condicional tipo 0 la forma es simple."},
-            {"question": "¿Cuál es el sinónimo de 'clever'?", "options": ["Smart", "Slow", "Angry", "Tall"], "correct": "Smart", "tip": "Ambas significan inteligente."},
-            {"question": "¿Qué significa 'by the way'?", "options": ["De todos modos", "Por cierto", "Sin embargo", "Porque sí"], "correct": "Por cierto", "tip": "Se usa para agregar un dato."},
-            {"question": "¿Qué tiempo verbal expresa acciones futuras planificadas?", "options": ["Past simple", "Present continuous", "Present perfect", "Past continuous"], "correct": "Present continuous", "tip": "Se usa con expresiones como 'tomorrow'."},
-            {"question": "¿Cómo se dice 'ella ha estado aquí desde las 8'?", "options": ["She is here since 8", "She has been here since 8", "She was here since 8", "She be here since 8"], "correct": "She has been here since 8", "tip": "Usá present perfect con since."},
-            {"question": "¿Qué phrasal verb significa 'investigar'?", "options": ["Look after", "Look up", "Look into", "Look for"], "correct": "Look into", "tip": "Se usa para examinar algo."},
-            {"question": "¿Cómo se forma el plural de 'child'?", "options": ["Childs", "Children", "Chields", "Childer"], "correct": "Children", "tip": "Es un plural irregular muy común."}
-        ]
-    }
-}
+MATERIAS = ("Matemática", "PDL", "Cs. Naturales", "Cs. Sociales", "Ed. Física", "Inglés")
 
+# Chips de la página de inicio; `flask warm` las deja siempre en la caché
+SUGERENCIAS = (
+    "¿Cuáles son las capitales de Argentina?",
+    "¿Cómo se alimentan las plantas?",
+    "¿Qué son el sujeto y el predicado?",
+    "¿Qué es una fracción?",
+)
 
-def _extract_json_payload(text: str) -> dict:
-    if not text:
-        return {}
+
+def _load_json(text: str):
+    """JSON de la respuesta, sin el bloque ```json si lo trae; lanza JSONDecodeError."""
     match = re.search(r"```(?:json)?(.*?)```", text, re.DOTALL)
     if match:
         text = match.group(1).strip()
+    return json.loads(text)
+
+
+def _extract_json_payload(text: str) -> dict:
+    if not text:
+        return {}
     try:
-        return json.loads(text)
+        return _load_json(text)
     except json.JSONDecodeError:
+        get_metrics().inc("gatto_json_parse_failures_total")
         return {}
 
 
+def _valid_raw_set(raw_set) -> bool:
+    """Si una tanda cruda trae 10 preguntas usables, sin tocar métricas (para el banco de pruebas)."""
+    questions = raw_set.get("questions") if isinstance(raw_set, dict) else None
+    return isinstance(questions, list) and sum(
+        isinstance(q, dict) and bool(str(q.get("question", "")).strip())
+        and isinstance(q.get("options"), list) and len(q["options"]) >= 2
+        and bool(str(q.get("correct", "")).strip())
+        for q in questions
+    ) >= QUESTIONS_PER_SET
+
+
+def _quiz_parse_ok(text: str) -> bool:
+    try:
+        return _valid_raw_set(_load_json(text or ""))
+    except json.JSONDecodeError:
+        return False
+
+
+def _quiz_batch_parse_ok(text: str) -> bool:
+    try:
+        levels = _load_json(text or "").get("levels")
+    except (json.JSONDecodeError, AttributeError):
+        return False
+    sets = [raw_set for raw_sets in levels.values() if isinstance(raw_sets, list) for raw_set in raw_sets] \
+        if isinstance(levels, dict) else []
+    return bool(sets) and all(_valid_raw_set(raw_set) for raw_set in sets)
+
+
 def _normalize_questions(raw_questions):
     normalized = []
     for item in raw_questions:
@@ -393,86 +347,1865 @@ def _normalize_questions(raw_questions):
             "tip": tip,
         })
 
+    dropped = len(raw_questions) - len(normalized)
+    if dropped:
+        get_metrics().inc("gatto_questions_dropped_total", dropped)
     return normalized
 
 
-def get_questions_for_subject(subject: str, level: str):
+def _split_sections(html: str):
+    """Divide la respuesta del tutor en bloques que empiezan con <h3>.
+
+    Devuelve (secciones_completas, resto): una sección está completa cuando
+    ya apareció el <h3> de la siguiente. Se descarta lo que haya antes del
+    primer <h3> si es solo un bloque ```html o espacios.
+    """
+    starts = [m.start() for m in re.finditer(r"<h3[\s>]", html, re.IGNORECASE)]
+    if not starts:
+        return [], html
+    preamble = re.sub(r"```(?:html)?", "", html[:starts[0]]).strip()
+    sections = [preamble] if preamble else []
+    sections.extend(html[a:b].strip() for a, b in zip(starts, starts[1:]))
+    return sections, html[starts[-1]:]
+
+
+def _all_sections(html: str) -> list:
+    """Todas las secciones de una respuesta ya terminada."""
+    sections, rest = _split_sections(html)
+    last = re.sub(r"```\s*$", "", rest).strip()
+    return sections + [last] if last else sections
+
+
+SECTION_KEYS = ("tecnica", "simple", "ejemplos", "desafio")
+
+# Palabras que identifican cada sección si el modelo no numeró los títulos
+_SECTION_HINTS = (
+    ("tecnica", re.compile(r"carpeta|t[eé]cnica", re.IGNORECASE)),
+    ("simple", re.compile(r"simple", re.IGNORECASE)),
+    ("ejemplos", re.compile(r"ejemplo", re.IGNORECASE)),
+    ("desafio", re.compile(r"desaf[ií]o|practic", re.IGNORECASE)),
+)
+
+# Emojis contextuales que antes agregaba el slider en cada vista
+_KEYWORD_EMOJIS = (
+    (re.compile(r"\b(número|suma|resta|multiplicación|división)\b", re.IGNORECASE), "🔢"),
+    (re.compile(r"\b(planeta|tierra|sol|luna)\b", re.IGNORECASE), "🌍"),
+    (re.compile(r"\b(animal|animales)\b", re.IGNORECASE), "🐾"),
+    (re.compile(r"\b(planta|plantas|árbol|árboles)\b", re.IGNORECASE), "🌱"),
+)
+
+_SAFE_STYLE = re.compile(r"^\s*color\s*:\s*[#\w(),.%\s-]+;?\s*$", re.IGNORECASE)
+
+
+class _AnswerSanitizer(HTMLParser):
+    """Deja solo etiquetas de texto seguras y decora el texto una sola vez."""
+
+    ALLOWED = {"p", "ul", "ol", "li", "strong", "b", "em", "i", "br", "span"}
+    DROP_CONTENT = {"script", "style", "iframe", "object", "h3"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self._dropping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.DROP_CONTENT:
+            self._dropping += 1
+        elif tag in self.ALLOWED and not self._dropping:
+            style = dict(attrs).get("style") if tag == "span" else None
+            if style and _SAFE_STYLE.match(style):
+                self.parts.append(f'<span style="{escape(style.strip())}">')
+            else:
+                self.parts.append(f"<{tag}>")
+
+    def handle_endtag(self, tag):
+        if tag in self.DROP_CONTENT:
+            self._dropping = max(0, self._dropping - 1)
+        elif tag in self.ALLOWED and tag != "br" and not self._dropping:
+            self.parts.append(f"</{tag}>")
+
+    def handle_data(self, data):
+        if self._dropping:
+            return
+        text = escape(data.replace("```html", "").replace("```", ""))
+        text = re.sub(r"\*\*(.*?)\*\*", r"<strong>\1</strong>", text)
+        text = re.sub(r"^[-•]\s+(.*)$", r'<div class="list-item">\1</div>', text, flags=re.MULTILINE)
+        for pattern, emoji in _KEYWORD_EMOJIS:
+            text = pattern.sub(lambda m: f"{emoji} {m.group(1)}", text)
+        self.parts.append(text)
+
+
+def _sanitize_answer_html(html: str) -> str:
+    sanitizer = _AnswerSanitizer()
+    sanitizer.feed(html)
+    sanitizer.close()
+    return "".join(sanitizer.parts).strip()
+
+
+def _parse_section(html: str):
+    """Devuelve (clave, html_saneado) de una sección que empieza con <h3>, o (None, ...)."""
+    match = re.match(r"\s*<h3[^>]*>(.*?)</h3>", html, re.IGNORECASE | re.DOTALL)
+    if match is None:
+        return None, _sanitize_answer_html(html)
+
+    title = re.sub(r"<[^>]+>", "", match.group(1))
+    body = _sanitize_answer_html(html[match.end():])
+    number = re.match(r"\s*([1-4])\s*[).]", title)
+    if number:
+        return SECTION_KEYS[int(number.group(1)) - 1], body
+    for key, pattern in _SECTION_HINTS:
+        if pattern.search(title):
+            return key, body
+    return None, body
+
+
+def _parse_answer(html: str) -> dict:
+    """Convierte la respuesta de Gemini en {tecnica, simple, ejemplos, desafio} con HTML saneado.
+
+    Si falta alguna sección se cuenta como error de parseo (para ajustar
+    PROMPT_BASE) y lo que no se pudo ubicar queda en la primera sección vacía.
+    """
+    secciones = {}
+    leftovers = []
+    for section in _all_sections(html):
+        key, body = _parse_section(section)
+        if not body:
+            continue
+        if key and key not in secciones:
+            secciones[key] = body
+        else:
+            leftovers.append(body)
+
+    missing = [key for key in SECTION_KEYS if key not in secciones]
+    if missing:
+        get_counters().incr("answer_parse_failures")
+        if leftovers:
+            secciones[missing[0]] = "".join(leftovers)
+    return {key: secciones[key] for key in SECTION_KEYS if key in secciones}
+
+
+def _answer_complete(html: str) -> bool:
+    """Si la respuesta trae las cuatro secciones (sin contar fallos, a diferencia de _parse_answer)."""
+    return {_parse_section(section)[0] for section in _all_sections(html or "")} >= set(SECTION_KEYS)
+
+
+def _answer_json(secciones: dict) -> str:
+    """JSON compacto que el slider lee directo; seguro para incrustar en <script>."""
+    return (
+        json.dumps(secciones, ensure_ascii=False, separators=(",", ":"))
+        .replace("<", "\\u003c").replace(">", "\\u003e").replace("&", "\\u0026")
+    )
+
+
+def _notice_json(message: str) -> str:
+    return _answer_json({"aviso": f"<p>{message}</p>"})
+
+
+def get_metrics() -> Metrics:
+    """Métricas para /metrics, acumuladas por worker y sumadas en SQLite."""
+    metrics = current_app.extensions.get("metrics")
+    if metrics is None:
+        metrics = Metrics(
+            os.path.join(current_app.config["DATA_DIR"], "metrics.sqlite3"),
+            flush_interval=current_app.config["METRICS_FLUSH_INTERVAL"],
+        )
+        for family, help_text in METRIC_HELP.items():
+            metrics.describe(family, help_text)
+        current_app.extensions["metrics"] = metrics
+    return metrics
+
+
+METRIC_HELP = {
+    "gatto_request_duration_seconds": "Duración de las peticiones por ruta (hasta el primer byte en streams)",
+    "gatto_requests_total": "Peticiones por ruta y código de estado",
+    "gatto_model_call_duration_seconds": "Duración de las llamadas a cada modelo",
+    "gatto_model_calls_total": "Llamadas a cada modelo por resultado (ok, timeout, error, rejected, throttled, saturated)",
+    "gatto_quiz_sets_served_total": "Tandas servidas por /api/quiz según el origen (pool, bank, error)",
+    "gatto_json_parse_failures_total": "Respuestas de Gemini que no se pudieron leer como JSON",
+    "gatto_questions_dropped_total": "Preguntas descartadas por _normalize_questions",
+    "gatto_answer_cache_hit_ratio": "Proporción de aciertos de la caché de respuestas",
+    "gatto_tutor_route_total": "Dudas enviadas a cada modelo del tutor según el motivo del ruteo",
+    "gatto_tutor_hedges_total": "Pedidos hedged al segundo modelo (sent) y cuántos respondieron primero (won)",
+    "gatto_tutor_latency_seconds": "Latencia del tutor: la servida (served) y la que habría tenido el primer modelo solo (primary)",
+    "gatto_rate_limit_total": "Decisiones del límite por alumno (session, ip) en cada ruta: allowed o throttled",
+    "gatto_upstream_budget_total": "Llamadas a cada modelo dentro (allowed) o fuera (throttled) del presupuesto por minuto",
+    "gatto_prompt_tokens_total": "Tokens de entrada (input) y salida (output) por ruta y variante de prompt",
+    "gatto_prompt_latency_seconds": "Latencia de Gemini por ruta y variante de prompt",
+    "gatto_prompt_calls_total": "Llamadas por ruta y variante de prompt, según si la respuesta se pudo leer (parsed)",
+}
+
+
+@contextmanager
+def phase(name: str):
+    """Mide una fase de la petición en curso (va al header Server-Timing y al log)."""
+    if not has_request_context():
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        phases = g.setdefault("phases", {})
+        phases[name] = phases.get(name, 0.0) + time.perf_counter() - started
+
+
+def response_source(source: str) -> None:
+    """Anota de dónde salió lo que se le muestra al alumno (encabezado X-Gatto-Source).
+
+    model/cache/pool son respuestas normales; stale, throttled y bank son respaldos;
+    notice y error son avisos de error, aunque la página salga con 200.
+    """
+    if has_request_context():
+        g.response_source = source
+
+
+def render_page(template: str, **context) -> str:
+    with phase("render"):
+        return render_template(template, **context)
+
+
+def get_page_cache() -> PageCache:
+    cache = current_app.extensions.get("page_cache")
+    if cache is None:
+        flask_app = current_app._get_current_object()
+        inputs = (
+            os.path.join(flask_app.root_path, flask_app.template_folder),
+            os.path.join(flask_app.config["ASSETS_DIST_DIR"], ASSETS_MANIFEST),
+            os.path.join(flask_app.root_path, "static", *VARIANTS_DIR.split("/"), IMAGES_MANIFEST),
+        )
+
+        def invalidate():
+            # Templates editados y builds nuevos de estáticos se toman sin reiniciar los workers
+            if flask_app.jinja_env.cache is not None:
+                flask_app.jinja_env.cache.clear()
+            for name in ("asset_manifest", "image_manifest", "image_sizes"):
+                flask_app.extensions.pop(name, None)
+
+        cache = PageCache(
+            lambda: files_version(*inputs),
+            check_interval=flask_app.config["PAGE_CACHE_CHECK_INTERVAL"],
+            on_invalidate=invalidate,
+        )
+        current_app.extensions["page_cache"] = cache
+    return cache
+
+
+def cached_page(key, template: str, **context):
+    """Página renderizada una vez por worker, con ETag; 304 si el navegador ya la tiene."""
+    if not current_app.config["PAGE_CACHE_ENABLED"]:
+        return render_page(template, **context)
+    body, etag = get_page_cache().get(key, lambda: render_page(template, **context))
+    response = Response(body, mimetype="text/html")
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
+def prerender_pages() -> None:
+    """Deja renderizadas las páginas cacheables (cada worker de Gunicorn al arrancar)."""
+    with current_app.test_request_context("/"):
+        home()
+    with current_app.test_request_context("/test"):
+        test()
+
+
+def get_profiler() -> SamplingProfiler:
+    profiler = current_app.extensions.get("profiler")
+    if profiler is None:
+        profiler = SamplingProfiler(interval=current_app.config["PROFILER_INTERVAL"])
+        current_app.extensions["profiler"] = profiler
+    return profiler
+
+
+def get_profile_budget() -> ProfileBudget:
+    budget = current_app.extensions.get("profile_budget")
+    if budget is None:
+        budget = ProfileBudget(os.path.join(current_app.config["DATA_DIR"], "profiler.sqlite3"))
+        current_app.extensions["profile_budget"] = budget
+    return budget
+
+
+def get_counters() -> Counters:
+    """Contadores generales de la app (errores de parseo, etc.)."""
+    counters = current_app.extensions.get("counters")
+    if counters is None:
+        counters = Counters(os.path.join(current_app.config["DATA_DIR"], "counters.sqlite3"))
+        current_app.extensions["counters"] = counters
+    return counters
+
+
+def get_answer_cache() -> AnswerCache:
+    """Caché de respuestas compartida por todos los workers (una instancia por app)."""
+    cache = current_app.extensions.get("answer_cache")
+    if cache is None:
+        cache = AnswerCache(
+            os.path.join(current_app.config["DATA_DIR"], "answers.sqlite3"),
+            ttl=current_app.config["ANSWER_CACHE_TTL"],
+            max_entries=current_app.config["ANSWER_CACHE_MAX_ENTRIES"],
+        )
+        current_app.extensions["answer_cache"] = cache
+    return cache
+
+
+def get_question_index() -> QuestionIndex:
+    """Índice de preguntas parecidas, persistido junto a la caché de respuestas."""
+    index = current_app.extensions.get("question_index")
+    if index is None:
+        index = QuestionIndex(
+            os.path.join(current_app.config["DATA_DIR"], "questions.sqlite3"),
+            threshold=current_app.config["QUESTION_SIMILARITY_THRESHOLD"],
+        )
+        current_app.extensions["question_index"] = index
+    return index
+
+
+def _cached_answer(duda: str, allow_expired: bool = False):
+    """Busca la respuesta exacta o la de una pregunta casi idéntica ya respondida.
+
+    Devuelve el JSON compacto de secciones listo para el slider, o None.
+    """
+    cache = get_answer_cache()
+    with phase("cache"):
+        context = answer_context(duda)
+        respuesta = cache.get(AnswerCache.make_key(duda, *context), allow_expired)
+    if respuesta is None:
+        with phase("similar"):
+            namespace = AnswerCache.context_hash(*context)
+            match = get_question_index().lookup(duda, namespace)
+            if match is not None:
+                respuesta = cache.get(match[0], allow_expired)
+
+    if respuesta is not None and not respuesta.startswith("{"):
+        # Entrada guardada antes de parsear en el servidor: HTML crudo de Gemini
+        respuesta = _answer_json(_parse_answer(respuesta))
+    return respuesta
+
+
+def prompt_for(route: str, key: str = None):
+    """Variante de prompt de la ruta según PROMPT_SPLIT; con `key`, siempre la misma para esa clave."""
+    return PROMPTS.choose(route, parse_split(current_app.config["PROMPT_SPLIT"]).get(route), key)
+
+
+def record_prompt_call(variant, prompt: str, response, text: str, seconds: float, parsed: bool) -> None:
+    """Tokens, latencia y parseo de una llamada por variante, en /metrics y en el log de la petición."""
+    input_tokens, output_tokens = usage_tokens(response, prompt, text)
+    labels = {"route": variant.route, "variant": variant.id}
+    metrics = get_metrics()
+    metrics.inc("gatto_prompt_tokens_total", input_tokens, kind="input", **labels)
+    metrics.inc("gatto_prompt_tokens_total", output_tokens, kind="output", **labels)
+    metrics.observe("gatto_prompt_latency_seconds", seconds, **labels)
+    metrics.inc("gatto_prompt_calls_total", parsed=str(bool(parsed)).lower(), **labels)
+    if has_request_context():
+        g.setdefault("prompts", []).append({
+            **labels,
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "ms": round(seconds * 1000, 1),
+        })
+
+
+def get_rate_limiter() -> TokenBuckets:
+    """Token buckets de alumnos y modelos, compartidos por todos los workers."""
+    buckets = current_app.extensions.get("rate_limiter")
+    if buckets is None:
+        buckets = TokenBuckets(os.path.join(current_app.config["DATA_DIR"], "rate_limit.sqlite3"))
+        current_app.extensions["rate_limiter"] = buckets
+    return buckets
+
+
+def _client_id() -> str:
+    """Identificador del alumno guardado en la cookie de sesión (se crea la primera vez)."""
+    cliente = session.get("cliente")
+    if cliente is None:
+        cliente = session["cliente"] = secrets.token_urlsafe(12)
+    return cliente
+
+
+def _client_keys():
+    """(alcance, clave, ráfaga, por minuto) de cada límite que aplica al alumno de la petición."""
+    config = current_app.config
+    # La sesión separa a los alumnos de una escuela que salen por la misma IP; la IP
+    # frena a quien no guarda la cookie y estrena sesión en cada pedido
+    return (
+        ("session", _client_id(), config["RATE_LIMIT_SESSION_BURST"], config["RATE_LIMIT_SESSION_PER_MINUTE"]),
+        ("ip", request.remote_addr or "-", config["RATE_LIMIT_IP_BURST"], config["RATE_LIMIT_IP_PER_MINUTE"]),
+    )
+
+
+def client_allowed(route: str) -> bool:
+    """Cobra una ficha al alumno antes de algo que puede terminar en una llamada a Gemini.
+
+    False si agotó su ráfaga: la ruta sirve entonces contenido ya guardado.
+    """
+    if not current_app.config["RATE_LIMIT_ENABLED"]:
+        return True
+    buckets, metrics = get_rate_limiter(), get_metrics()
+    for scope, key, burst, per_minute in _client_keys():
+        allowed = buckets.take(f"{scope}:{key}", burst, per_minute)
+        metrics.inc("gatto_rate_limit_total", scope=scope, route=route,
+                    decision="allowed" if allowed else "throttled")
+        if not allowed:
+            return False
+    return True
+
+
+def upstream_allowed(model_name: str) -> bool:
+    """Descuenta una llamada del presupuesto por minuto del modelo, común a todos los workers."""
+    config = current_app.config
+    per_minute = config["UPSTREAM_BUDGETS"].get(model_name, config["UPSTREAM_BUDGET_PER_MINUTE"])
+    if per_minute <= 0:
+        return True
+    allowed = get_rate_limiter().take(f"model:{model_name}", per_minute, per_minute)
+    get_metrics().inc("gatto_upstream_budget_total", model=model_name,
+                      decision="allowed" if allowed else "throttled")
+    return allowed
+
+
+def get_breaker(model_name: str) -> CircuitBreaker:
+    breakers = current_app.extensions.setdefault("breakers", {})
+    breaker = breakers.get(model_name)
+    if breaker is None:
+        config = current_app.config
+        breaker = CircuitBreaker(
+            os.path.join(config["DATA_DIR"], "breakers.sqlite3"),
+            model_name,
+            failure_threshold=config["BREAKER_FAILURE_THRESHOLD"],
+            recovery_time=config["BREAKER_RECOVERY_TIME"],
+            min_timeout=config["GEMINI_TIMEOUT_MIN"],
+            max_timeout=config["GEMINI_TIMEOUT_MAX"],
+            timeout_percentile=config["GEMINI_TIMEOUT_PERCENTILE"],
+            timeout_multiplier=config["GEMINI_TIMEOUT_MULTIPLIER"],
+        )
+        breakers[model_name] = breaker
+    return breaker
+
+
+def _model_registry(backend: str) -> ModelRegistry:
+    return ModelRegistry(
+        backend=backend,
+        api_key=current_app.config["GEMINI_API_KEY"],
+        stub_options={
+            "latency": current_app.config["STUB_LATENCY"],
+            "error_rate": current_app.config["STUB_ERROR_RATE"],
+            "malformed_rate": current_app.config["STUB_MALFORMED_RATE"],
+            "fenced_rate": current_app.config["STUB_FENCED_RATE"],
+            "seed": current_app.config["STUB_SEED"],
+        },
+    )
+
+
+def get_models() -> ModelRegistry:
+    """Clientes de los modelos, creados una vez por proceso (el SDK se carga recién acá)."""
+    models = current_app.extensions.get("models")
+    if models is None:
+        models = _model_registry(current_app.config["MODEL_BACKEND"])
+        current_app.extensions["models"] = models
+    return models
+
+
+def get_model_slots() -> ModelSlots:
+    slots = current_app.extensions.get("model_slots")
+    if slots is None:
+        slots = ModelSlots(current_app.config["MODEL_CONCURRENCY"], wait=current_app.config["MODEL_SLOT_WAIT"])
+        current_app.extensions["model_slots"] = slots
+    return slots
+
+
+def get_async_runner() -> AsyncRunner:
+    """Event loop de este worker para las llamadas con generate_content_async (ASYNC_MODE)."""
+    runner = current_app.extensions.get("async_runner")
+    if runner is None:
+        runner = current_app.extensions["async_runner"] = AsyncRunner()
+    return runner
+
+
+def _is_timeout(error: Exception) -> bool:
+    # El SDK de Gemini lanza DeadlineExceeded; requests y el stub, sus propios timeouts
+    name = type(error).__name__
+    return isinstance(error, TimeoutError) or name in ("DeadlineExceeded", "ReadTimeout", "Timeout")
+
+
+@contextmanager
+def model_call(model_name: str, slot=None):
+    """Circuit breaker y métricas alrededor de una llamada a un modelo; entrega el timeout.
+
+    `slot` es el lugar del modelo ya pedido (`ModelSlots.held`) cuando no se puede esperar
+    bloqueando, como en el event loop; por defecto se espera acá.
+    """
+    metrics = get_metrics()
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        if not upstream_allowed(model_name):
+            raise QuotaExceededError(f"Presupuesto por minuto de {model_name} agotado")
+        # El lugar se toma antes del breaker: esperar turno no es una falla del modelo
+        with slot or get_model_slots().take(model_name), get_breaker(model_name).guard() as timeout:
+            yield timeout
+        outcome = "ok"
+    except QuotaExceededError:
+        outcome = "throttled"
+        raise
+    except ModelSaturatedError:
+        outcome = "saturated"
+        raise
+    except CircuitOpenError:
+        outcome = "rejected"
+        raise
+    except GeneratorExit:
+        # El alumno cerró la página a mitad del stream
+        outcome = "cancelled"
+        raise
+    except Exception as e:
+        if _is_timeout(e):
+            outcome = "timeout"
+        raise
+    finally:
+        metrics.inc("gatto_model_calls_total", model=model_name, outcome=outcome)
+        if outcome not in ("rejected", "throttled", "saturated"):
+            metrics.observe("gatto_model_call_duration_seconds", time.perf_counter() - started,
+                            model=model_name)
+
+
+def call_model(model_name: str, prompt: str):
+    """Llama a Gemini detrás del circuit breaker del modelo, con timeout adaptativo.
+
+    Lanza CircuitOpenError al instante si el modelo viene fallando, QuotaExceededError
+    (una subclase) si se agotó su presupuesto de llamadas por minuto y ModelSaturatedError
+    (otra) si el proceso ya tiene MODEL_CONCURRENCY llamadas en vuelo a ese modelo.
+    En ASYNC_MODE la llamada corre en el event loop del worker con generate_content_async.
+    """
+    with phase("gemini"), model_call(model_name) as timeout:
+        client = get_models().get(model_name)
+        if current_app.config["ASYNC_MODE"]:
+            return get_async_runner().generate(client, prompt, timeout)
+        return client.generate_content(prompt, request_options={"timeout": timeout})
+
+
+async def call_model_async(model_name: str, prompt: str):
+    """`call_model` dentro del event loop del worker (ASYNC_MODE): necesita el app context.
+
+    El lugar del modelo se espera sin bloquear el loop; el resto (cuota, breaker,
+    métricas) son las mismas consultas cortas a SQLite que en el camino sync.
+    """
+    slots = get_model_slots()
+    acquired = await slots.acquire_async(model_name)
+    with model_call(model_name, slot=slots.held(model_name, acquired)) as timeout:
+        client = get_models().get(model_name)
+        return await asyncio.wait_for(
+            client.generate_content_async(prompt, request_options={"timeout": timeout}), timeout
+        )
+
+
+def get_router() -> ModelRouter:
+    router = current_app.extensions.get("router")
+    if router is None:
+        config = current_app.config
+        router = ModelRouter(
+            config["ROUTING_FAST_MODEL"],
+            TUTOR_MODEL,
+            max_simple_words=config["ROUTING_MAX_SIMPLE_WORDS"],
+            complex_keywords=config["ROUTING_KEYWORDS"] or COMPLEX_KEYWORDS,
+            strong_subjects=config["ROUTING_STRONG_SUBJECTS"],
+        )
+        current_app.extensions["router"] = router
+    return router
+
+
+def tutor_model_for(duda: str, record: bool = True) -> str:
+    """Modelo que responde la duda: el rápido para las simples, TUTOR_MODEL para el resto.
+
+    Con `record=False` no cuenta la decisión (para armar claves sin llamar al modelo).
+    """
+    if not current_app.config["ROUTING_ENABLED"]:
+        return TUTOR_MODEL
+    model, reason = get_router().choose(duda)
+    if record:
+        get_metrics().inc("gatto_tutor_route_total", model=model, reason=reason)
+        get_counters().incr(f"tutor_route_{reason}")
+    return model
+
+
+def tutor_variant(duda: str):
+    """Variante de prompt del tutor para la duda: siempre la misma para la misma pregunta."""
+    return prompt_for("tutor", normalize_question(duda))
+
+
+def answer_context(duda: str):
+    """(prompt, modelo) con que se responde la duda: arman la clave de la caché y del single-flight.
+
+    El prompt es la variante que le toca a la duda (id y template) y el modelo, el que
+    elige el ruteo: la respuesta del modelo fuerte no se comparte como si fuera la del
+    rápido (aunque un hedge la haya respondido el otro), ni la de `compacto@1` con quien
+    recibe `completo@1`, así la comparación entre variantes no se mezcla.
+    """
+    variant = tutor_variant(duda)
+    return f"{variant.id}\0{variant.template}", tutor_model_for(duda, record=False)
+
+
+def get_hedge_executor() -> ThreadPoolExecutor:
+    executor = current_app.extensions.get("hedge_executor")
+    if executor is None or executor.pid != os.getpid():
+        # Los hilos no sobreviven al fork: cada worker arma su propio pool
+        executor = ThreadPoolExecutor(max_workers=current_app.config["HEDGE_THREADS"],
+                                      thread_name_prefix="hedge")
+        executor.pid = os.getpid()
+        current_app.extensions["hedge_executor"] = executor
+    return executor
+
+
+def _tutor_latencies() -> dict:
+    return current_app.extensions.setdefault(
+        "tutor_latencies", {"served": LatencyTracker(), "primary": LatencyTracker()}
+    )
+
+
+def _hedge_delay(model_name: str) -> float:
+    """Segundos de espera antes del hedge: el p95 observado del modelo (o un valor fijo al arrancar)."""
+    config = current_app.config
+    latencies = get_breaker(model_name).latencies
+    if len(latencies) < get_breaker(model_name).min_samples:
+        return config["HEDGE_DEFAULT_DELAY"]
+    return max(config["HEDGE_MIN_DELAY"], latencies.percentile(config["HEDGE_PERCENTILE"]))
+
+
+def call_tutor(duda: str, prompt: str):
+    """Llama al modelo elegido para la duda; si tarda más que su p95, manda un hedge al otro.
+
+    Gana la primera respuesta; la otra llamada termina en segundo plano y se
+    descarta (solo se usa para medir la latencia que habría tenido el primer modelo).
+    """
+    model = tutor_model_for(duda)
+    config = current_app.config
+    if not (config["ROUTING_ENABLED"] and config["HEDGE_ENABLED"]):
+        return call_model(model, prompt)
+
+    flask_app = current_app._get_current_object()
+    metrics, counters, latencies = get_metrics(), get_counters(), _tutor_latencies()
+
+    def attempt(model_name: str, primary: bool = False):
+        def run():
+            started = time.perf_counter()
+            try:
+                with flask_app.app_context():
+                    return call_model(model_name, prompt)
+            finally:
+                if primary:
+                    elapsed = time.perf_counter() - started
+                    latencies["primary"].add(elapsed)
+                    metrics.observe("gatto_tutor_latency_seconds", elapsed, kind="primary")
+        return run
+
+    def attempt_async(model_name: str, primary: bool = False):
+        async def run():
+            started = time.perf_counter()
+            try:
+                with flask_app.app_context():
+                    return await call_model_async(model_name, prompt)
+            finally:
+                if primary:
+                    elapsed = time.perf_counter() - started
+                    latencies["primary"].add(elapsed)
+                    metrics.observe("gatto_tutor_latency_seconds", elapsed, kind="primary")
+        return run
+
+    async def hedge_in_loop(delay: float):
+        try:
+            return await hedged_async(attempt_async(model, primary=True), attempt_async(secondary), delay)
+        except CircuitOpenError:
+            return await attempt_async(secondary)(), "secondary", False
+
+    secondary = get_router().alternate(model)
+    started = time.perf_counter()
+    with phase("gemini"):
+        if config["ASYNC_MODE"]:
+            # Las dos llamadas esperan en el event loop: ningún hilo del pool de hedge queda
+            # bloqueado y la espera del hedge empieza cuando sale la llamada, no al tomar un hilo
+            response, winner, hedge_sent = get_async_runner().run(hedge_in_loop(_hedge_delay(model)))
+        else:
+            try:
+                response, winner, hedge_sent = hedged(
+                    attempt(model, primary=True), attempt(secondary), _hedge_delay(model), get_hedge_executor()
+                )
+            except CircuitOpenError:
+                # El primer modelo viene fallando: el otro responde directamente
+                response, winner, hedge_sent = call_model(secondary, prompt), "secondary", False
+    elapsed = time.perf_counter() - started
+    latencies["served"].add(elapsed)
+    metrics.observe("gatto_tutor_latency_seconds", elapsed, kind="served")
+    counters.incr("tutor_calls")
+    if hedge_sent:
+        metrics.inc("gatto_tutor_hedges_total", outcome="sent")
+        counters.incr("tutor_hedges_sent")
+        if winner == "secondary":
+            metrics.inc("gatto_tutor_hedges_total", outcome="won")
+            counters.incr("tutor_hedges_won")
+    return response
+
+
+def tutor_routing_stats() -> dict:
+    counters = get_counters().snapshot()
+    calls = counters.get("tutor_calls", 0)
+    sent = counters.get("tutor_hedges_sent", 0)
+    won = counters.get("tutor_hedges_won", 0)
+    stats = {
+        "routes": {
+            reason: counters.get(f"tutor_route_{reason}", 0)
+            for reason in ("simple", "length", "keyword", "subject")
+        },
+        "calls": calls,
+        "hedges_sent": sent,
+        "hedges_won": won,
+        "hedge_rate": sent / calls if calls else 0.0,
+        "hedge_win_rate": won / sent if sent else 0.0,
+    }
+    # Percentiles de este worker: el primer modelo solo vs. lo que vio el alumno
+    for kind, tracker in _tutor_latencies().items():
+        for p in (0.5, 0.95, 0.99):
+            value = tracker.percentile(p)
+            stats[f"{kind}_p{round(p * 100)}_ms"] = round(value * 1000, 1) if value is not None else None
+    if stats["primary_p99_ms"] is not None and stats["served_p99_ms"] is not None:
+        stats["p99_improvement_ms"] = round(stats["primary_p99_ms"] - stats["served_p99_ms"], 1)
+    return stats
+
+
+def _record_quiz_call(mode: str, seconds: float, sets: int, questions: int) -> None:
+    """Contadores para comparar la generación de a una tanda con la generación en lote."""
+    counters = get_counters()
+    counters.incr(f"quiz_{mode}_calls")
+    counters.incr(f"quiz_{mode}_sets", sets)
+    counters.incr(f"quiz_{mode}_questions", questions)
+    counters.incr(f"quiz_{mode}_ms", int(seconds * 1000))
+
+
+def _record_salvage(questions: int, sets: int) -> None:
+    """Contadores de las respuestas que no eran JSON válido y se leyeron con json_salvage."""
+    counters = get_counters()
+    counters.incr("quiz_salvage_responses")
+    if questions:
+        counters.incr("quiz_salvage_recovered")
+        counters.incr("quiz_salvage_questions", questions)
+        counters.incr("quiz_salvage_sets", sets)
+
+
+def _quiz_questions(text: str) -> list:
+    """Preguntas válidas de una respuesta de una tanda, rescatando lo que se pueda si el JSON está roto."""
+    payload = _extract_json_payload(text)
+    raw_questions = payload.get("questions") if isinstance(payload, dict) else None
+    if isinstance(raw_questions, list):
+        return _normalize_questions(raw_questions)
+    questions = _normalize_questions(salvage_questions(text))
+    _record_salvage(len(questions), int(len(questions) >= QUESTIONS_PER_SET))
+    return questions
+
+
+def _salvageable(questions: list) -> bool:
+    """Una tanda incompleta vale la pena completarla si le faltan pocas preguntas."""
+    missing = QUESTIONS_PER_SET - len(questions)
+    return 0 < missing <= current_app.config["QUIZ_SALVAGE_MAX_MISSING"]
+
+
+def _merge_questions(questions: list, extra: list) -> list:
+    """Agrega a la tanda las preguntas de `extra` que no repiten enunciado, hasta completar 10."""
+    seen = {question_hash(q["question"]) for q in questions}
+    merged = list(questions)
+    for question in extra:
+        if len(merged) >= QUESTIONS_PER_SET:
+            break
+        key = question_hash(question["question"])
+        if key not in seen:
+            seen.add(key)
+            merged.append(question)
+    return merged
+
+
+def _follow_up(subject: str, level_key: str, questions: list) -> list:
+    """Pide a Gemini solo las preguntas que le faltan a la tanda (una llamada chica)."""
+    count = QUESTIONS_PER_SET - len(questions)
+    prompt = TEST_FOLLOWUP_PROMPT_TEMPLATE.format(
+        count=count,
+        subject=subject,
+        level_text=DIFFICULTY_DESCRIPTIONS[level_key],
+        existing="\n".join(f"- {q['question']}" for q in questions),
+    )
+    counters = get_counters()
+    counters.incr("quiz_followup_calls")
+    try:
+        response = call_model(QUIZ_MODEL, prompt)
+    except Exception as e:
+        print(f"Error pidiendo las preguntas que faltan: {e}")
+        return questions
+    merged = _merge_questions(questions, _quiz_questions(getattr(response, "text", "")))
+    counters.incr("quiz_followup_questions", len(merged) - len(questions))
+    if len(merged) >= QUESTIONS_PER_SET:
+        counters.incr("quiz_sets_completed_followup")
+    return merged
+
+
+def _top_up_from_bank(subject: str, level_key: str, questions: list) -> list:
+    """Completa con el banco una tanda a la que le faltan pocas preguntas."""
+    if not _salvageable(questions):
+        return questions
+    missing = QUESTIONS_PER_SET - len(questions)
+    merged = _merge_questions(questions, get_question_bank().sample(subject, level_key, missing + len(questions)))
+    if len(merged) >= QUESTIONS_PER_SET:
+        get_counters().incr("quiz_sets_completed_bank")
+    return merged
+
+
+def generate_questions(subject: str, level: str):
+    """Pide a Gemini una tanda de preguntas; devuelve [] si no llegan 10 válidas.
+
+    Si la respuesta vino cortada o con pocas preguntas válidas, se rescata lo que
+    llegó entero y se completa: primero pidiendo a Gemini solo las que faltan y,
+    si no alcanza, con preguntas del banco.
+
+    No pasa por single-flight: solo la llaman el pool y `flask warm`, que piden
+    varias tandas iguales a la vez justamente para tener tandas distintas.
+    """
     level_key = level if level in DIFFICULTIES else "facil"
-    prompt = TEST_PROMPT_TEMPLATE.format(
+    variant = prompt_for("quiz")
+    prompt = variant.build(
         subject=subject,
         level_text=DIFFICULTY_DESCRIPTIONS[level_key]
     )
 
     try:
-        quiz_model = genai.GenerativeModel("gemini-2.0-flash-exp")
-        response = quiz_model.generate_content(prompt, timeout=30)
-        payload = _extract_json_payload(getattr(response, "text", ""))
-        questions = _normalize_questions(payload.get("questions", []))
+        started = time.perf_counter()
+        response = call_model(QUIZ_MODEL, prompt)
+        text = getattr(response, "text", "")
+        questions = _quiz_questions(text)
+        record_prompt_call(variant, prompt, response, text, time.perf_counter() - started,
+                           len(questions) >= QUESTIONS_PER_SET)
+        _record_quiz_call("single", time.perf_counter() - started,
+                          int(len(questions) >= QUESTIONS_PER_SET), len(questions))
+        if _salvageable(questions) and current_app.config["QUIZ_SALVAGE_FOLLOWUP"]:
+            questions = _follow_up(subject, level_key, questions)
+        get_question_bank().add(subject, level_key, questions)
+        questions = _top_up_from_bank(subject, level_key, questions)
     except Exception as e:
         print(f"Error generando preguntas: {e}")
         questions = []
 
-    if len(questions) >= 10:
-        return questions[:10]
+    if len(questions) >= QUESTIONS_PER_SET:
+        return questions[:QUESTIONS_PER_SET]
+    return []
+
+
+def _levels_text(levels: dict) -> str:
+    return "\n".join(
+        f'- "{level}": {n} tanda(s). {DIFFICULTY_DESCRIPTIONS[level]}' for level, n in levels.items()
+    )
+
+
+def generate_question_batch(subject: str, levels: dict) -> dict:
+    """Pide a Gemini varias tandas en una sola llamada.
+
+    `levels` es {nivel: cantidad de tandas}; devuelve {nivel: [tandas de 10 válidas]}.
+    Cada tanda se valida por separado, así una tanda mal armada no tira las demás;
+    si la respuesta vino cortada se rescatan las tandas enteras y las incompletas a
+    las que les faltan pocas preguntas se completan con el banco (sin otra llamada).
+    Como `generate_questions`, no pasa por single-flight.
+    """
+    levels = {level: n for level, n in levels.items() if level in DIFFICULTIES and n > 0}
+    if not levels:
+        return {}
+    variant = prompt_for("quiz_batch")
+    prompt = variant.build(subject=subject, levels_text=_levels_text(levels))
+
+    try:
+        started = time.perf_counter()
+        response = call_model(QUIZ_MODEL, prompt)
+        text = getattr(response, "text", "")
+        payload = _extract_json_payload(text)
+        raw_levels = payload.get("levels") if isinstance(payload, dict) else None
+        batch = {}
+        if isinstance(raw_levels, dict):
+            for level, n in levels.items():
+                raw_sets = raw_levels.get(level)
+                batch[level] = [
+                    _normalize_questions(raw_set.get("questions", []))
+                    for raw_set in (raw_sets if isinstance(raw_sets, list) else [])
+                    if isinstance(raw_set, dict)
+                ][:n]
+        else:
+            salvaged = salvage_sets(text, list(levels))
+            for level, n in levels.items():
+                batch[level] = [_normalize_questions(raw_set) for raw_set in salvaged[level]][:n]
+            _record_salvage(sum(len(q) for sets in batch.values() for q in sets),
+                            sum(len(q) >= QUESTIONS_PER_SET for sets in batch.values() for q in sets))
+        record_prompt_call(variant, prompt, response, text, time.perf_counter() - started,
+                           all(len(q) >= QUESTIONS_PER_SET for sets in batch.values() for q in sets)
+                           and sum(len(sets) for sets in batch.values()) == sum(levels.values()))
+        _record_quiz_call(
+            "batch", time.perf_counter() - started,
+            sum(len(q) >= QUESTIONS_PER_SET for sets in batch.values() for q in sets),
+            sum(len(q) for sets in batch.values() for q in sets),
+        )
+    except Exception as e:
+        print(f"Error generando preguntas en lote: {e}")
+        return {}
+
+    result = {}
+    bank = get_question_bank()
+    for level, sets in batch.items():
+        for questions in sets:
+            bank.add(subject, level, questions)
+        sets = [_top_up_from_bank(subject, level, questions) for questions in sets]
+        result[level] = [q[:QUESTIONS_PER_SET] for q in sets if len(q) >= QUESTIONS_PER_SET]
+    return result
+
+
+def quiz_generation_stats() -> dict:
+    counters = get_counters().snapshot()
+    stats = {}
+    for mode in ("single", "batch"):
+        calls = counters.get(f"quiz_{mode}_calls", 0)
+        questions = counters.get(f"quiz_{mode}_questions", 0)
+        stats[mode] = {
+            "calls": calls,
+            "sets": counters.get(f"quiz_{mode}_sets", 0),
+            "questions": questions,
+            "ms_per_call": counters.get(f"quiz_{mode}_ms", 0) / calls if calls else 0.0,
+            "ms_per_question": counters.get(f"quiz_{mode}_ms", 0) / questions if questions else 0.0,
+        }
+    # Cada tanda válida de un lote habría costado una llamada propia
+    stats["calls_saved"] = max(0, stats["batch"]["sets"] - stats["batch"]["calls"])
+    # Respuestas con JSON roto de las que se rescataron preguntas, y tandas incompletas
+    # que se completaron en vez de tirarlas y volver a pedir las 10
+    responses = counters.get("quiz_salvage_responses", 0)
+    recovered = counters.get("quiz_salvage_recovered", 0)
+    followup_calls = counters.get("quiz_followup_calls", 0)
+    completed = counters.get("quiz_sets_completed_followup", 0) + counters.get("quiz_sets_completed_bank", 0)
+    stats["salvage"] = {
+        "responses": responses,
+        "recovered": recovered,
+        "rate": recovered / responses if responses else 0.0,
+        "questions": counters.get("quiz_salvage_questions", 0),
+        "sets": counters.get("quiz_salvage_sets", 0),
+        "followup_calls": followup_calls,
+        "followup_questions": counters.get("quiz_followup_questions", 0),
+        "sets_completed_followup": counters.get("quiz_sets_completed_followup", 0),
+        "sets_completed_bank": counters.get("quiz_sets_completed_bank", 0),
+        "calls_saved": max(0, counters.get("quiz_salvage_sets", 0) + completed - followup_calls),
+    }
+    return stats
+
+
+def get_popular_questions() -> PopularQuestions:
+    popular = current_app.extensions.get("popular_questions")
+    if popular is None:
+        popular = PopularQuestions(
+            os.path.join(current_app.config["DATA_DIR"], "popular.sqlite3"),
+            flush_interval=current_app.config["POPULAR_FLUSH_INTERVAL"],
+        )
+        current_app.extensions["popular_questions"] = popular
+    return popular
+
+
+def get_single_flight() -> SingleFlight:
+    """Coalescencia de llamadas idénticas a Gemini, dentro y entre workers."""
+    flight = current_app.extensions.get("single_flight")
+    if flight is None:
+        flight = SingleFlight(os.path.join(current_app.config["DATA_DIR"], "singleflight.sqlite3"))
+        current_app.extensions["single_flight"] = flight
+    return flight
+
+
+def get_question_bank() -> QuestionBank:
+    """Banco de preguntas en disco; la primera vez se carga con las preguntas de ejemplo."""
+    bank = current_app.extensions.get("question_bank")
+    if bank is None:
+        bank = QuestionBank(os.path.join(current_app.config["DATA_DIR"], "question_bank.sqlite3"))
+        if not bank.count():
+            with open(current_app.config["QUESTION_BANK_SEED"], encoding="utf-8") as f:
+                bank.import_data(json.load(f))
+        current_app.extensions["question_bank"] = bank
+    return bank
+
+
+def get_quiz_results() -> QuizResults:
+    results = current_app.extensions.get("quiz_results")
+    if results is None:
+        results = QuizResults(
+            os.path.join(current_app.config["DATA_DIR"], "quiz_results.sqlite3"),
+            flush_interval=current_app.config["QUIZ_RESULTS_FLUSH_INTERVAL"],
+            max_pending=current_app.config["QUIZ_RESULTS_MAX_PENDING"],
+        )
+        current_app.extensions["quiz_results"] = results
+    return results
+
+
+def get_quiz_pool() -> QuizPool:
+    pool = current_app.extensions.get("quiz_pool")
+    if pool is None:
+        pool = QuizPool(
+            os.path.join(current_app.config["DATA_DIR"], "quiz_pool.sqlite3"),
+            max_age=current_app.config["QUIZ_POOL_MAX_AGE"],
+        )
+        current_app.extensions["quiz_pool"] = pool
+    return pool
+
+
+def start_quiz_refiller(flask_app) -> PoolRefiller:
+    """Arranca (una vez por proceso) el hilo que mantiene lleno el pool de tests."""
+    refiller = flask_app.extensions.get("quiz_refiller")
+    if refiller is not None and refiller.pid == os.getpid() and refiller.is_alive():
+        return refiller
+
+    def generate(materia, nivel):
+        with flask_app.app_context():
+            return generate_questions(materia, nivel)
+
+    def generate_batch(materia, niveles):
+        with flask_app.app_context():
+            return generate_question_batch(materia, niveles)
+
+    with flask_app.app_context():
+        pool = get_quiz_pool()
+    refiller = PoolRefiller(
+        pool,
+        generate,
+        keys=[(materia, nivel) for materia in MATERIAS for nivel in DIFFICULTIES],
+        lock_path=os.path.join(flask_app.config["DATA_DIR"], "quiz_pool.lock"),
+        low_water=flask_app.config["QUIZ_POOL_LOW_WATER"],
+        refill_size=flask_app.config["QUIZ_POOL_REFILL_SIZE"],
+        concurrency=flask_app.config["QUIZ_POOL_CONCURRENCY"],
+        interval=flask_app.config["QUIZ_POOL_INTERVAL"],
+        generate_batch=generate_batch if flask_app.config["QUIZ_POOL_BATCH"] else None,
+        batch_sets=flask_app.config["QUIZ_POOL_BATCH_SETS"],
+    )
+    refiller.pid = os.getpid()
+    refiller.start()
+    flask_app.extensions["quiz_refiller"] = refiller
+    return refiller
+
+
+def _generate_answer(duda: str) -> str:
+    """Pide la respuesta a Gemini; peticiones idénticas simultáneas comparten la llamada."""
+    def generate():
+        variant = tutor_variant(duda)
+        with phase("prompt"):
+            full_prompt = variant.build(duda=duda)
+        started = time.perf_counter()
+        response = call_tutor(duda, full_prompt)
+        text = getattr(response, 'text', '')
+        record_prompt_call(variant, full_prompt, response, text, time.perf_counter() - started,
+                           _answer_complete(text))
+        return text
+
+    flight_key = "tutor:" + AnswerCache.make_key(duda, *answer_context(duda))
+    return get_single_flight().do(flight_key, generate)
+
+
+def _store_answer(duda: str, respuesta: str) -> str:
+    """Parsea la respuesta cruda una sola vez y cachea el JSON de secciones."""
+    with phase("parse"):
+        secciones_json = _answer_json(_parse_answer(respuesta))
+    with phase("store"):
+        context = answer_context(duda)
+        cache_key = AnswerCache.make_key(duda, *context)
+        get_answer_cache().set(cache_key, secciones_json)
+        get_question_index().add(duda, cache_key, AnswerCache.context_hash(*context))
+    return secciones_json
+
+
+def get_job_queue() -> JobQueue:
+    queue = current_app.extensions.get("job_queue")
+    if queue is None:
+        queue = JobQueue(
+            os.path.join(current_app.config["DATA_DIR"], "jobs.sqlite3"),
+            max_queue=current_app.config["JOBS_MAX_QUEUE"],
+            concurrency=current_app.config["JOBS_CONCURRENCY"],
+        )
+        current_app.extensions["job_queue"] = queue
+    return queue
+
+
+def start_job_workers(flask_app) -> JobWorkerPool:
+    """Arranca (una vez por proceso) los hilos que responden las dudas encoladas."""
+    workers = flask_app.extensions.get("job_workers")
+    if workers is not None and workers.pid == os.getpid() and workers.is_alive():
+        return workers
+
+    def handle(payload):
+        with flask_app.app_context():
+            duda = payload["duda"]
+            return {"respuesta": _cached_answer(duda) or _answer_or_error(duda)}
+
+    with flask_app.app_context():
+        queue = get_job_queue()
+    workers = JobWorkerPool(queue, handle, threads=flask_app.config["JOBS_CONCURRENCY"])
+    workers.pid = os.getpid()
+    workers.start()
+    flask_app.extensions["job_workers"] = workers
+    return workers
+
+
+def get_questions_for_subject(subject: str, level: str, use_pool: bool = True):
+    """Saca una tanda lista del pool; si está vacío, 10 preguntas al azar del banco.
+
+    Con `use_pool=False` (alumno que superó su límite) va directo al banco, para no
+    vaciar el pool y obligar a reponerlo con más llamadas a Gemini.
+    """
+    level_key = level if level in DIFFICULTIES else "facil"
+    preguntas = None
+    if use_pool:
+        with phase("pool"):
+            preguntas = get_quiz_pool().pop(subject, level_key)
+    if preguntas:
+        get_metrics().inc("gatto_quiz_sets_served_total", source="pool")
+        response_source("pool")
+        return preguntas
+
+    get_metrics().inc("gatto_quiz_sets_served_total", source="bank")
+    response_source("bank")
+    with phase("bank"):
+        return get_question_bank().sample(subject, level_key, QUESTIONS_PER_SET)
+
+
+@click.group("bank", cls=AppGroup)
+def bank_cli():
+    """Importa y exporta el banco de preguntas."""
+
+
+@bank_cli.command("import")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+def bank_import(path):
+    """Agrega al banco las preguntas de un JSON {materia: {nivel: [preguntas]}}."""
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    bank = get_question_bank()
+    added = bank.import_data({
+        materia: {nivel: _normalize_questions(preguntas) for nivel, preguntas in niveles.items()}
+        for materia, niveles in data.items()
+    })
+    click.echo(f"{added} preguntas nuevas ({bank.count()} en total)")
+
+
+@bank_cli.command("export")
+@click.argument("path", type=click.Path(dir_okay=False, writable=True))
+def bank_export(path):
+    """Guarda todo el banco en un JSON con el mismo formato que `bank import`."""
+    bank = get_question_bank()
+    with open(path, "w", encoding="utf-8") as f:
+        dump(bank.export_data(), f)
+    click.echo(f"{bank.count()} preguntas exportadas a {path}")
+
+
+def warm_questions(top: int) -> list:
+    """Sugerencias de la página de inicio y las `top` dudas más frecuentes, sin repetir."""
+    window = current_app.config["POPULAR_WINDOW_DAYS"] * 24 * 3600
+    questions, seen = [], set()
+    candidates = list(SUGERENCIAS) + [q for q, _ in get_popular_questions().top(top, window)]
+    for question in candidates:
+        key = AnswerCache.make_key(question, *answer_context(question))
+        if key not in seen:
+            seen.add(key)
+            questions.append(question)
+    return questions
+
+
+@click.command("warm")
+@click.option("--top", type=int, default=None, help="Dudas frecuentes a pre-generar (WARM_TOP)")
+@click.option("--quiz-sets", type=int, default=None,
+              help="Tandas listas por materia y nivel (QUIZ_POOL_LOW_WATER); 0 para no generar tests")
+@click.option("--concurrency", type=int, default=None, help="Llamadas simultáneas a Gemini (WARM_CONCURRENCY)")
+@click.option("--rate", type=float, default=None, help="Máximo de llamadas por segundo (WARM_RATE)")
+@click.option("--force", is_flag=True, help="Regenerar también las respuestas que ya están en la caché")
+@with_appcontext
+def warm_command(top, quiz_sets, concurrency, rate, force):
+    """Llena la caché de respuestas y el pool de tests antes de la hora pico."""
+    config = current_app.config
+    top = config["WARM_TOP"] if top is None else top
+    quiz_sets = config["QUIZ_POOL_LOW_WATER"] if quiz_sets is None else quiz_sets
+    concurrency = concurrency or config["WARM_CONCURRENCY"]
+    throttle = Throttle(config["WARM_RATE"] if rate is None else rate)
+    flask_app = current_app._get_current_object()
+    started = time.perf_counter()
+
+    questions = warm_questions(top)
+    pending = questions if force else [q for q in questions if _cached_answer(q) is None]
+
+    def answer(question):
+        with flask_app.app_context():
+            respuesta = _generate_answer(question)
+            if not respuesta:
+                raise ValueError("respuesta vacía")
+            _store_answer(question, respuesta)
+
+    results = run_throttled(answer, pending, concurrency, throttle)
+    failed = sum(1 for result in results.values() if isinstance(result, Exception))
+    click.echo(f"Respuestas: {len(pending) - failed} generadas, {len(questions) - len(pending)} ya "
+               f"estaban en la caché, {failed} con error")
+
+    if quiz_sets > 0:
+        def generate(materia, nivel):
+            throttle.wait()
+            with flask_app.app_context():
+                return generate_questions(materia, nivel)
+
+        def generate_batch(materia, niveles):
+            throttle.wait()
+            with flask_app.app_context():
+                return generate_question_batch(materia, niveles)
+
+        refiller = PoolRefiller(
+            get_quiz_pool(),
+            generate,
+            keys=[(materia, nivel) for materia in MATERIAS for nivel in DIFFICULTIES],
+            lock_path=os.path.join(config["DATA_DIR"], "quiz_pool.lock"),
+            low_water=quiz_sets,
+            refill_size=quiz_sets,
+            concurrency=concurrency,
+            generate_batch=generate_batch if config["QUIZ_POOL_BATCH"] else None,
+            batch_sets=config["QUIZ_POOL_BATCH_SETS"],
+        )
+        click.echo(f"Tests: {refiller.refill_once()} tandas nuevas en el pool")
+    click.echo(f"Listo en {time.perf_counter() - started:.1f} s")
+
+
+@click.group("prompts", cls=AppGroup)
+def prompts_cli():
+    """Variantes de prompt registradas y comparación offline."""
+
+
+@prompts_cli.command("list")
+def prompts_list():
+    """Muestra las variantes de cada ruta, su tamaño y el reparto configurado."""
+    split = parse_split(current_app.config["PROMPT_SPLIT"])
+    for route in PROMPTS.routes():
+        weights = split.get(route) or {prompt_for(route).id: 100.0}
+        total = sum(weights.values()) or 1.0
+        for variant in PROMPTS.variants(route):
+            share = weights.get(variant.id, 0.0) / total
+            click.echo(f"{route:<11} {variant.id:<12} {len(variant.template):>6} caracteres  "
+                       f"{share:>5.0%}  {variant.description}")
+
+
+def _harness_cases(route: str, corpus: str, limit: int) -> list:
+    if route == "tutor":
+        with open(corpus, encoding="utf-8") as f:
+            cases = [{"duda": line.strip()} for line in f if line.strip() and not line.startswith("#")]
+    elif route == "quiz":
+        cases = [{"subject": materia, "level_text": DIFFICULTY_DESCRIPTIONS[nivel]}
+                 for materia in MATERIAS for nivel in DIFFICULTIES]
+    else:
+        cases = [{"subject": materia, "levels_text": _levels_text({nivel: 1 for nivel in DIFFICULTIES})}
+                 for materia in MATERIAS]
+    return cases[:limit] if limit else cases
 
-    subject_data = FALLBACK_TESTS.get(subject, FALLBACK_TESTS["Matemática"])
-    return subject_data[level_key]
 
-@app.route("/", methods=["GET"]) 
+@prompts_cli.command("compare")
+@click.option("--route", type=click.Choice(["tutor", "quiz", "quiz_batch"]), default=None,
+              help="Ruta a comparar (por defecto, todas)")
+@click.option("--corpus", default=None, help="Dudas del tutor, una por línea (por defecto PROMPT_CORPUS)")
+@click.option("--backend", default="stub", show_default=True, help="Backend de modelos: stub o gemini")
+@click.option("--limit", default=0, help="Máximo de casos por ruta (0 = todos)")
+@click.option("--out", default=None, help="Guarda el resultado en JSON")
+def prompts_compare(route, corpus, backend, limit, out):
+    """Corre un corpus contra cada variante y compara tamaño, tokens, latencia y parseo.
+
+    No pasa por el circuit breaker, la cuota ni las métricas de la app: con el stub no
+    gasta nada y con --backend gemini sirve para medir antes de cambiar PROMPT_SPLIT.
+    """
+    models = _model_registry(backend)
+    checks = {"tutor": _answer_complete, "quiz": _quiz_parse_ok, "quiz_batch": _quiz_batch_parse_ok}
+    results = {}
+    for name in [route] if route else PROMPTS.routes():
+        model = models.get(TUTOR_MODEL if name == "tutor" else QUIZ_MODEL)
+        cases = _harness_cases(name, corpus or current_app.config["PROMPT_CORPUS"], limit)
+        results[name] = compare_prompts(PROMPTS.variants(name), cases, model.generate_content, checks[name])
+        click.echo(f"{name} ({len(cases)} casos)")
+        for row in results[name]:
+            click.echo(f"  {row['variant']:<12} {row['prompt_chars']:>6} caracteres  "
+                       f"{row['input_tokens']:>5} tokens in  {row['output_tokens']:>5} out  "
+                       f"{row['ms']:>8.1f} ms  parseo {row['parse_rate']:.0%}  errores {row['errors']}")
+    if out:
+        with open(out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+
+
+@click.group("assets", cls=AppGroup)
+def assets_cli():
+    """Build de los archivos estáticos."""
+
+
+@assets_cli.command("images")
+def assets_images():
+    """Genera las variantes WebP/AVIF/PNG de static/img (solo las que cambiaron)."""
+    result = build_images(os.path.join(current_app.root_path, "static"), current_app.config["IMAGE_WIDTHS"])
+    current_app.extensions.pop("image_manifest", None)
+    click.echo(f"{result['generated']} imágenes procesadas, {result['skipped']} sin cambios")
+
+
+@assets_cli.command("build")
+@click.option("--images/--no-images", default=True, help="Generar antes las variantes de las imágenes")
+@click.pass_context
+def assets_build(ctx, images):
+    """Genera static/dist: archivos con hash en el nombre, .gz/.br y manifest.json."""
+    if images:
+        try:
+            ctx.invoke(assets_images)
+        except RuntimeError as e:
+            click.echo(f"⚠️  Sin variantes de imágenes (pip install -r requirements.txt): {e}", err=True)
+    if brotli is None:
+        click.echo("⚠️  brotli no está instalado (pip install -r requirements.txt): no se generan .br "
+                   "y las fuentes salen en woff en lugar de woff2", err=True)
+    out = current_app.config["ASSETS_DIST_DIR"]
+    manifest = build_assets(os.path.join(current_app.root_path, "static"), out)
+    current_app.extensions.pop("asset_manifest", None)
+    original = compressed = 0
+    for hashed, encodings in manifest["encodings"].items():
+        path = os.path.join(out, *hashed.split("/"))
+        original += os.path.getsize(path)
+        compressed += min(os.path.getsize(path + (".br" if e == "br" else ".gz")) for e in encodings)
+    click.echo(f"{len(manifest['files'])} archivos en {out}; "
+               f"comprimibles: {original} -> {compressed} bytes")
+
+
+def get_asset_manifest() -> dict:
+    manifest = current_app.extensions.get("asset_manifest")
+    if manifest is None:
+        manifest = load_manifest(current_app.config["ASSETS_DIST_DIR"])
+        current_app.extensions["asset_manifest"] = manifest
+    return manifest
+
+
+@bp.app_url_defaults
+def _fingerprint_static(endpoint, values):
+    """url_for('static', ...) apunta a la copia con hash cuando hay build."""
+    if endpoint == "static" and current_app.config["ASSETS_FINGERPRINT"]:
+        hashed = get_asset_manifest()["files"].get(values.get("filename"))
+        if hashed:
+            values["filename"] = "dist/" + hashed
+
+
+def get_image_manifest() -> dict:
+    manifest = current_app.extensions.get("image_manifest")
+    if manifest is None:
+        manifest = load_image_manifest(os.path.join(current_app.root_path, "static"))
+        current_app.extensions["image_manifest"] = manifest
+    return manifest
+
+
+@bp.app_template_global("picture")
+def picture(filename: str, alt: str, **attrs):
+    """`{{ picture('img/gatito.png', 'Gatito', sizes='340px') }}`: <picture> con WebP/AVIF y srcset."""
+    entry = get_image_manifest().get(filename)
+    size = None
+    if entry is None:
+        # Sin variantes igual damos width/height, leídos del encabezado del PNG
+        sizes = current_app.extensions.setdefault("image_sizes", {})
+        if filename not in sizes:
+            try:
+                sizes[filename] = png_size(os.path.join(current_app.root_path, "static", filename))
+            except OSError:
+                sizes[filename] = None
+        size = sizes[filename]
+    return picture_html(lambda name: url_for("static", filename=name), filename, alt,
+                        entry=entry, size=size, **attrs)
+
+
+@bp.app_context_processor
+def _asset_context():
+    return {"self_hosted_fonts": current_app.config["ASSETS_FINGERPRINT"]
+            and FONTS_CSS in get_asset_manifest()["files"]}
+
+
+def static_file(filename):
+    """Sirve /static; lo de dist/ va precomprimido según Accept-Encoding y cacheable por un año."""
+    if not filename.startswith("dist/"):
+        return send_from_directory(os.path.join(current_app.root_path, "static"), filename)
+    hashed = filename[len("dist/"):]
+    available = get_asset_manifest()["encodings"].get(hashed, ())
+    encoding = next((e for e in ("br", "gzip") if e in available and request.accept_encodings[e]), None)
+    suffix = {"br": ".br", "gzip": ".gz"}.get(encoding, "")
+    response = send_from_directory(
+        current_app.config["ASSETS_DIST_DIR"], hashed + suffix,
+        mimetype=mimetypes.guess_type(hashed)[0] or "application/octet-stream",
+        max_age=current_app.config["ASSETS_MAX_AGE"],
+    )
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    if available:
+        response.vary.add("Accept-Encoding")
+    if encoding:
+        response.content_encoding = encoding
+    return response
+
+
+@bp.before_app_request
+def _start_background_workers():
+    flask_app = current_app._get_current_object()
+    if flask_app.config["QUIZ_POOL_ENABLED"]:
+        start_quiz_refiller(flask_app)
+    if flask_app.config["BUSCAR_ASYNC"]:
+        start_job_workers(flask_app)
+
+
+@bp.before_app_request
+def _start_request_timer():
+    g.request_started = time.perf_counter()
+    if get_profile_budget().claim():
+        get_profiler().start()
+        g.profiling = True
+
+
+@bp.after_app_request
+def _record_request(response):
+    started = g.pop("request_started", None)
+    if started is None:
+        return response
+    total = time.perf_counter() - started
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    metrics = get_metrics()
+    metrics.observe("gatto_request_duration_seconds", total, route=route, method=request.method)
+    metrics.inc("gatto_requests_total", route=route, status=response.status_code)
+
+    phases = g.get("phases", {})
+    response.headers["Server-Timing"] = ", ".join(
+        [f"{name};dur={seconds * 1000:.1f}" for name, seconds in phases.items()]
+        + [f"total;dur={total * 1000:.1f}"]
+    )
+    if "response_source" in g:
+        response.headers["X-Gatto-Source"] = g.response_source
+    timing_logger.info(json.dumps({
+        "route": route,
+        "method": request.method,
+        "status": response.status_code,
+        "total_ms": round(total * 1000, 1),
+        "phases_ms": {name: round(seconds * 1000, 1) for name, seconds in phases.items()},
+        **({"prompts": g.prompts} if "prompts" in g else {}),
+    }))
+    return response
+
+
+@bp.teardown_app_request
+def _stop_profiler(exc):
+    # En teardown y no en after_request: así un stream se perfila completo
+    if not g.pop("profiling", False):
+        return
+    samples = get_profiler().stop()
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    name = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{re.sub(r'[^A-Za-z0-9]+', '_', route).strip('_') or 'root'}"
+    write_folded(os.path.join(current_app.config["DATA_DIR"], "profiles", name + ".folded"), samples)
+
+
+def _require_admin():
+    token = current_app.config["ADMIN_TOKEN"]
+    if not token:
+        abort(404)
+    sent = request.headers.get("X-Admin-Token", "")
+    if not hmac.compare_digest(sent.encode(), token.encode()):
+        abort(403)
+
+
+@bp.route("/admin/profile", methods=["GET", "POST"])
+def admin_profile():
+    """POST arma el profiler para las próximas `requests` peticiones; GET muestra el estado."""
+    _require_admin()
+    budget = get_profile_budget()
+    if request.method == "POST":
+        requests_to_profile = request.values.get("requests", 10, type=int)
+        budget.arm(max(0, min(requests_to_profile, current_app.config["PROFILER_MAX_REQUESTS"])))
+    directory = os.path.join(current_app.config["DATA_DIR"], "profiles")
+    profiles = sorted(os.listdir(directory), reverse=True)[:50] if os.path.isdir(directory) else []
+    return {"remaining": budget.remaining(), "profiles": profiles}
+
+
+@bp.route("/admin/profile/<name>", methods=["GET"])
+def admin_profile_download(name):
+    """Descarga un perfil en formato collapsed (flamegraph.pl, speedscope)."""
+    _require_admin()
+    return send_from_directory(os.path.join(current_app.config["DATA_DIR"], "profiles"), name,
+                               mimetype="text/plain")
+
+
+@bp.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    """Métricas en formato de texto de Prometheus, sumadas entre todos los workers."""
+    cache = get_answer_cache().stats()
+    extra = [
+        ("gatto_answer_cache_hits_total", COUNTER, (), cache["hits"]),
+        ("gatto_answer_cache_misses_total", COUNTER, (), cache["misses"]),
+        ("gatto_answer_cache_hit_ratio", GAUGE, (), cache["hit_ratio"]),
+        ("gatto_answer_cache_entries", GAUGE, (), cache["entries"]),
+        ("gatto_answer_parse_failures_total", COUNTER, (),
+         get_counters().get("answer_parse_failures")),
+    ]
+    for name, value in sorted(get_single_flight().stats().items()):
+        extra.append(("gatto_singleflight_total", COUNTER, (("kind", name),), value))
+    for model in (TUTOR_MODEL, current_app.config["ROUTING_FAST_MODEL"], QUIZ_MODEL):
+        state = get_breaker(model).state
+        extra.append(("gatto_breaker_open", GAUGE, (("model", model),), int(state != CLOSED)))
+    if current_app.config["BUSCAR_ASYNC"]:
+        jobs = get_job_queue().stats()
+        extra.append(("gatto_jobs", GAUGE, (("status", QUEUED),), jobs["queued"]))
+        extra.append(("gatto_jobs", GAUGE, (("status", RUNNING),), jobs["running"]))
+    return Response(get_metrics().render(extra), mimetype="text/plain; version=0.0.4")
+
+@bp.route("/", methods=["GET"]) 
 def home():
-    return render_template("index.html")
+    return cached_page("home", "index.html", sugerencias=SUGERENCIAS)
 
 
-@app.route("/buscar", methods=["POST"]) 
-def buscar():
-    duda = request.form.get("duda", "").strip()
-    if not duda:
-        return redirect(url_for('home'))
-    
-    # Validación básica
-    if len(duda) < 3 or len(duda) > 500:
-        return redirect(url_for('home'))
+def _answer_or_error(duda: str) -> str:
+    """Genera (y cachea) la respuesta, o devuelve el aviso de error para el alumno.
 
+    En ambos casos devuelve el JSON de secciones que consume el slider.
+    """
     try:
-        full_prompt = PROMPT_BASE + "\n\nDuda del alumno: " + duda
-        tutor_model = genai.GenerativeModel("gemini-2.5-flash")
-        response = tutor_model.generate_content(full_prompt, timeout=30)
-        respuesta = getattr(response, 'text', '')
+        respuesta = _generate_answer(duda)
         
-        if not respuesta:
-            respuesta = "<p>⚠️ No pude generar una respuesta. Intenta reformular tu pregunta.</p>"
+        if respuesta:
+            response_source("model")
+            return _store_answer(duda, respuesta)
+        response_source("notice")
+        return _notice_json("⚠️ No pude generar una respuesta. Intenta reformular tu pregunta.")
+    except CircuitOpenError:
+        # Gemini viene fallando o se agotó su cuota: mejor una respuesta vencida que hacer esperar al alumno
+        stale = _cached_answer(duda, allow_expired=True)
+        response_source("stale" if stale else "notice")
+        return stale or _notice_json(
+            "⚠️ GATTO está muy ocupado en este momento. Probá de nuevo en unos minutos."
+        )
     except Exception as e:
         print(f"Error al procesar búsqueda: {e}")
-        respuesta = "<p>⚠️ Ocurrió un error al procesar tu pregunta. Por favor, intenta más tarde.</p>"
+        response_source("notice")
+        return _notice_json("⚠️ Ocurrió un error al procesar tu pregunta. Por favor, intenta más tarde.")
+
 
-    return render_template("respuesta.html", duda=duda, respuesta=respuesta)
+def _throttled_answer(duda: str) -> str:
+    """Respuesta para un alumno que superó su límite: lo ya cacheado (aunque esté vencido) o un aviso."""
+    response_source("throttled")
+    return _cached_answer(duda, allow_expired=True) or _notice_json(
+        "⚠️ Estás preguntando muy rápido. Esperá un minuto y probá de nuevo."
+    )
 
 
-@app.route("/test")
-def test():
-    materia = request.args.get("materia", "Matemática")
-    if materia not in FALLBACK_TESTS:
+def _duda_valida(duda: str) -> bool:
+    # Validación básica
+    return 3 <= len(duda) <= 500
+
+
+@bp.route("/buscar", methods=["POST"]) 
+def buscar():
+    duda = request.form.get("duda", "").strip()
+    if not duda or not _duda_valida(duda):
+        return redirect(url_for('main.home'))
+    get_popular_questions().record(duda)
+
+    secciones_json = _cached_answer(duda)
+    if secciones_json is not None:
+        response_source("cache")
+        return render_page("respuesta.html", duda=duda, secciones_json=secciones_json)
+
+    # Modo streaming: se envía la página enseguida y las secciones llegan por SSE.
+    # "modo=completo" es el fallback que usa el navegador si el stream falla.
+    streaming = (not current_app.config["BUSCAR_ASYNC"] and current_app.config["BUSCAR_STREAMING"]
+                 and request.form.get("modo") != "completo")
+    # En modo streaming el límite lo cobra /buscar/stream, que es quien llama a Gemini
+    if not streaming and not client_allowed("buscar"):
+        return render_page("respuesta.html", duda=duda, secciones_json=_throttled_answer(duda))
+
+    # Modo asíncrono: se encola la duda y la página consulta el resultado
+    if current_app.config["BUSCAR_ASYNC"]:
+        try:
+            job_id = get_job_queue().submit({"duda": duda})
+        except QueueFullError:
+            return _busy_page(duda)
+        return redirect(url_for("main.buscar_job", job_id=job_id), code=303)
+
+    if streaming:
+        # La cookie tiene que salir con esta página: el stream ya no puede mandar encabezados
+        _client_id()
+        return render_page(
+            "respuesta.html",
+            duda=duda,
+            secciones_json="{}",
+            stream_url=url_for("main.buscar_stream", duda=duda),
+        )
+
+    return render_page("respuesta.html", duda=duda, secciones_json=_answer_or_error(duda))
+
+
+def _busy_page(duda: str):
+    retry_after = current_app.config["JOBS_RETRY_AFTER"]
+    response = Response(
+        render_page("espera.html", duda=duda, ocupado=True, retry_after=retry_after),
+        status=503,
+    )
+    response.headers["Retry-After"] = str(retry_after)
+    return response
+
+
+@bp.route("/buscar/job/<job_id>", methods=["GET"])
+def buscar_job(job_id):
+    """Página de espera del modo asíncrono; cuando el trabajo termina muestra la respuesta."""
+    job = get_job_queue().get(job_id)
+    if job is None:
+        return redirect(url_for('main.home'))
+    duda = job["payload"]["duda"]
+    if job["status"] == DONE:
+        return render_page("respuesta.html", duda=duda, secciones_json=job["result"]["respuesta"])
+    if job["status"] == FAILED:
+        response_source("notice")
+        return render_page(
+            "respuesta.html",
+            duda=duda,
+            secciones_json=_notice_json(
+                "⚠️ Ocurrió un error al procesar tu pregunta. Por favor, intenta más tarde."
+            ),
+        )
+    return render_page("espera.html", duda=duda, job=job,
+                           status_url=url_for("main.job_status", job_id=job_id))
+
+
+@bp.route("/api/jobs/<job_id>", methods=["GET"])
+def job_status(job_id):
+    job = get_job_queue().get(job_id)
+    if job is None:
+        return {"error": "not found"}, 404
+    return {"id": job_id, "status": job["status"], "position": job.get("position")}
+
+
+@bp.route("/api/jobs/stats", methods=["GET"])
+def job_stats():
+    """Profundidad de la cola, espera media y rechazos, para planificar capacidad."""
+    return get_job_queue().stats()
+
+
+@bp.route("/api/quiz/stats", methods=["GET"])
+def quiz_stats():
+    """Llamadas a Gemini, tandas y latencia por pregunta: de a una tanda vs. en lote."""
+    return quiz_generation_stats()
+
+
+@bp.route("/api/quiz/results", methods=["POST"])
+def quiz_results():
+    """Recibe si se acertó cada pregunta de un test terminado (se guarda en segundo plano)."""
+    data = request.get_json(silent=True) or {}
+    materia, nivel, answers = data.get("materia"), data.get("nivel"), data.get("answers")
+    if materia not in MATERIAS or nivel not in DIFFICULTIES or not isinstance(answers, list):
+        return {"error": "materia, nivel o answers inválidos"}, 400
+    outcomes = [
+        (answer["question"], answer["correct"])
+        for answer in answers[:current_app.config["QUIZ_RESULTS_MAX_ANSWERS"]]
+        if isinstance(answer, dict) and isinstance(answer.get("question"), str)
+        and 0 < len(answer["question"]) <= 500 and isinstance(answer.get("correct"), bool)
+    ]
+    if not outcomes:
+        return {"error": "sin respuestas válidas"}, 400
+    return {"recorded": get_quiz_results().record(materia, nivel, outcomes)}, 202
+
+
+@bp.route("/api/quiz/results/stats", methods=["GET"])
+def quiz_results_stats():
+    """Aciertos por (materia, nivel) y las preguntas más difíciles, leídos de los agregados."""
+    results = get_quiz_results()
+    materias = [request.args["materia"]] if request.args.get("materia") else list(MATERIAS)
+    niveles = [request.args["nivel"]] if request.args.get("nivel") else list(DIFFICULTIES)
+    if not set(materias) <= set(MATERIAS) or not set(niveles) <= set(DIFFICULTIES):
+        return {"error": "materia o nivel inválidos"}, 400
+    hardest = request.args.get("hardest", 5, type=int)
+    stats = []
+    for materia in materias:
+        for nivel in niveles:
+            entry = {"materia": materia, "nivel": nivel, **results.level_stats(materia, nivel)}
+            if hardest > 0:
+                entry["hardest"] = results.hardest(
+                    materia, nivel, min(hardest, 50), current_app.config["QUIZ_RESULTS_MIN_ANSWERS"]
+                )
+            stats.append(entry)
+    return {"stats": stats}
+
+
+@bp.route("/api/tutor/stats", methods=["GET"])
+def tutor_stats():
+    """Ruteo de dudas por modelo, tasa de hedge y p99 con y sin hedge."""
+    return tutor_routing_stats()
+
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@bp.route("/buscar/stream", methods=["GET"])
+def buscar_stream():
+    """Server-Sent Events: una sección de la respuesta por evento apenas se completa."""
+    duda = request.args.get("duda", "").strip()
+    if not duda or not _duda_valida(duda):
+        return Response(_sse("error", {"message": "Pregunta inválida"}), mimetype="text/event-stream")
+
+    def events():
+        cached = _cached_answer(duda)
+        if cached is not None:
+            yield from replay(cached)
+            return
+        if not client_allowed("stream"):
+            yield from replay(_throttled_answer(duda))
+            return
+
+        flight_key = "tutor:" + AnswerCache.make_key(duda, *answer_context(duda))
+        with get_single_flight().leading(flight_key) as publish:
+            if publish is None:
+                # Otra petición ya está generando esta misma duda: esperamos su resultado
+                yield from follow()
+                return
+            yield from lead(publish)
+
+    def replay(secciones_json):
+        for key, html in json.loads(secciones_json).items():
+            yield _sse("section", {"key": key, "html": html})
+        yield _sse("done", {})
+
+    def follow():
+        try:
+            respuesta = _generate_answer(duda)
+        except Exception as e:
+            print(f"Error al procesar búsqueda (stream): {e}")
+            respuesta = ""
+        if not respuesta:
+            yield _sse("error", {"message": "No pude generar una respuesta."})
+            return
+        # El líder ya guardó la versión parseada en la caché
+        yield from replay(_cached_answer(duda) or _answer_json(_parse_answer(respuesta)))
+
+    def section_event(html, sent_keys):
+        key, body = _parse_section(html)
+        if not body:
+            return None
+        if key is None or key in sent_keys:
+            key = next((k for k in SECTION_KEYS if k not in sent_keys), None)
+        if key is None:
+            return None
+        sent_keys.add(key)
+        return _sse("section", {"key": key, "html": body})
+
+    def lead(publish):
+        try:
+            variant = tutor_variant(duda)
+            full_prompt = variant.build(duda=duda)
+            buffer, sent, sent_keys, last_chunk = "", 0, set(), None
+            started = time.perf_counter()
+            # En el stream no hay hedge: lo que importa es el primer fragmento, no el total
+            model_name = tutor_model_for(duda)
+            with model_call(model_name) as timeout:
+                tutor_model = get_models().get(model_name)
+                if current_app.config["ASYNC_MODE"]:
+                    # El stream corre en el event loop; este hilo solo recibe los fragmentos
+                    response = get_async_runner().stream(
+                        lambda: tutor_model.generate_content_async(
+                            full_prompt, stream=True, request_options={"timeout": timeout}
+                        ),
+                        timeout,
+                    )
+                else:
+                    response = tutor_model.generate_content(
+                        full_prompt, stream=True, request_options={"timeout": timeout}
+                    )
+                for chunk in response:
+                    # El último fragmento trae el uso de tokens de toda la respuesta
+                    last_chunk = chunk
+                    buffer += getattr(chunk, "text", "")
+                    sections, _ = _split_sections(buffer)
+                    for html in sections[sent:]:
+                        event = section_event(html, sent_keys)
+                        if event:
+                            yield event
+                    sent = len(sections)
+        except Exception as e:
+            print(f"Error al procesar búsqueda (stream): {e}")
+            yield _sse("error", {"message": "Ocurrió un error al procesar tu pregunta."})
+            return
+
+        publish(buffer)
+        record_prompt_call(variant, full_prompt, last_chunk, buffer, time.perf_counter() - started,
+                           _answer_complete(buffer))
+        if not buffer.strip():
+            yield _sse("error", {"message": "No pude generar una respuesta."})
+            return
+
+        for html in _all_sections(buffer)[sent:]:
+            event = section_event(html, sent_keys)
+            if event:
+                yield event
+        _store_answer(duda, buffer)
+        yield _sse("done", {})
+
+    return Response(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _quiz_params(args):
+    materia = args.get("materia", "Matemática")
+    if materia not in MATERIAS:
         materia = "Matemática"
 
-    nivel = request.args.get("nivel", "facil").lower()
+    nivel = args.get("nivel", "facil").lower()
     if nivel not in DIFFICULTIES:
         nivel = "facil"
+    return materia, nivel
+
+
+@bp.route("/test")
+def test():
+    """Cascarón de la página de tests, igual para toda materia y nivel (cacheado, con ETag).
+
+    El navegador lee materia y nivel de la URL y pide las preguntas a /api/quiz.
+    """
+    return cached_page("test", "test.html", materias=list(MATERIAS), niveles=DIFFICULTIES)
 
+
+@bp.route("/api/quiz", methods=["GET"])
+def quiz_api():
+    """Una tanda de 10 preguntas en JSON; la página pide también la siguiente de antemano."""
+    materia, nivel = _quiz_params(request.args)
     try:
-        preguntas = get_questions_for_subject(materia, nivel)
+        preguntas = get_questions_for_subject(materia, nivel, use_pool=client_allowed("test"))
     except Exception as e:
         print(f"Error cargando preguntas: {e}")
-        preguntas = FALLBACK_TESTS[materia][nivel]
-
-    return render_template(
-        "test.html",
-        materia=materia,
-        materias=list(FALLBACK_TESTS.keys()),
-        preguntas=preguntas,
-        nivel=nivel,
-        nivel_label=DIFFICULTIES[nivel],
+        get_metrics().inc("gatto_quiz_sets_served_total", source="error")
+        response_source("error")
+        preguntas = []
+
+    # Cada tanda sale una sola vez del pool: guardarla haría repetir preguntas
+    return (
+        {"materia": materia, "nivel": nivel, "nivel_label": DIFFICULTIES[nivel], "preguntas": preguntas},
+        200,
+        {"Cache-Control": "no-store"},
     )
 
+
+def create_app(config_name: str = None) -> Flask:
+    """Crea la app con la configuración de config.py (por defecto, según FLASK_ENV)."""
+    # /static lo sirve static_file(), que entiende los archivos con hash de `flask assets build`
+    flask_app = Flask(__name__, static_folder=None)
+    flask_app.add_url_rule("/static/<path:filename>", endpoint="static", view_func=static_file)
+    config_name = config_name or os.getenv("FLASK_ENV", "default")
+    flask_app.config.from_object(config.get(config_name, config["default"]))
+    flask_app.register_blueprint(bp)
+    flask_app.cli.add_command(bank_cli)
+    flask_app.cli.add_command(assets_cli)
+    flask_app.cli.add_command(prompts_cli)
+    flask_app.cli.add_command(warm_command)
+    if flask_app.config["PROXY_COUNT"]:
+        # Detrás de nginx la IP del alumno llega en X-Forwarded-For (la usa el límite por IP)
+        flask_app.wsgi_app = ProxyFix(flask_app.wsgi_app, x_for=flask_app.config["PROXY_COUNT"])
+    if flask_app.config["TIMING_LOG"] and not timing_logger.handlers:
+        # Una línea JSON por petición con la duración de cada fase
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(asctime)s %(name)s %(message)s"))
+        timing_logger.addHandler(handler)
+        timing_logger.setLevel(logging.INFO)
+    return flask_app
+
+
+app = create_app()
+
 if __name__ == "__main__":
     # Configuración para desarrollo
     app.run(debug=os.getenv("FLASK_DEBUG", "False").lower() == "true")
@@ -0,0 +1,176 @@
+"""
+Build de los archivos estáticos: nombres con hash de contenido y versiones comprimidas.
+
+`build(src, out)` copia cada archivo de `static/` a `static/dist/` como
+`nombre.<hash>.ext`, junto con `.gz` y `.br` (brotli, si está instalado) de
+los tipos que comprimen bien, y escribe `manifest.json` con la ruta original
+-> ruta con hash. Como el nombre cambia con el contenido, el navegador puede
+guardarlos un año sin volver a preguntar, y el servidor no comprime nada al
+responder: elige el archivo ya comprimido según Accept-Encoding.
+
+Las fuentes de `static/fonts/` (por ejemplo Chewy-Regular.ttf o Nunito-Bold.ttf)
+se recortan a los caracteres del español con fontTools, si está instalado, y se
+genera `css/fonts.css` con sus @font-face, así las páginas no dependen de Google
+Fonts.
+"""
+import gzip
+import hashlib
+import io
+import json
+import os
+import posixpath
+import re
+import shutil
+
+try:
+    import brotli
+except ImportError:  # opcional: sin brotli solo se generan las versiones .gz
+    brotli = None
+
+MANIFEST = "manifest.json"
+FONTS_DIR = "fonts"
+FONTS_CSS = "css/fonts.css"
+COMPRESSIBLE = (".css", ".js", ".svg", ".json", ".txt", ".html", ".ttf", ".otf")
+FONT_EXTENSIONS = (".woff2", ".woff", ".ttf", ".otf")
+# Latín básico, Latin-1 (tildes, ñ, ¿, ¡), rayas, comillas tipográficas y puntos suspensivos
+FONT_UNICODES = "U+0020-007E,U+00A0-00FF,U+2013-2014,U+2018-201D,U+2026"
+FONT_WEIGHTS = {
+    "thin": 100, "extralight": 200, "light": 300, "regular": 400, "medium": 500,
+    "semibold": 600, "bold": 700, "extrabold": 800, "black": 900,
+}
+
+_CSS_URL = re.compile(r"""url\(\s*(['"]?)([^'")]+)\1\s*\)""")
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:10]
+
+
+def hashed_name(path: str, data: bytes) -> str:
+    root, ext = posixpath.splitext(path)
+    return f"{root}.{content_hash(data)}{ext}"
+
+
+def compress(data: bytes) -> dict:
+    """Versiones comprimidas que ocupan menos que el original, por encoding."""
+    variants = {"gzip": gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants["br"] = brotli.compress(data, quality=11)
+    return {encoding: body for encoding, body in variants.items() if len(body) < len(data)}
+
+
+def _subset_font(data: bytes, ext: str):
+    """Recorta la fuente a FONT_UNICODES; devuelve (bytes, extensión) o la fuente tal cual."""
+    try:
+        from fontTools import subset
+    except ImportError:
+        return data, ext
+    options = subset.Options()
+    # woff2 necesita brotli; si no está, woff (zlib) igual es mucho más chico que ttf
+    options.flavor = "woff2" if brotli is not None else "woff"
+    font = subset.load_font(io.BytesIO(data), options)
+    subsetter = subset.Subsetter(options)
+    subsetter.populate(unicodes=subset.parse_unicodes(FONT_UNICODES))
+    subsetter.subset(font)
+    out = io.BytesIO()
+    subset.save_font(font, out, options)
+    return out.getvalue(), "." + options.flavor
+
+
+def _font_face(filename: str, url: str) -> str:
+    family, _, style = posixpath.splitext(filename)[0].partition("-")
+    style = style.lower()
+    italic = style.endswith("italic")
+    weight = FONT_WEIGHTS.get(style.replace("italic", "") or "regular", 400)
+    font_format = {"woff2": "woff2", "woff": "woff", "ttf": "truetype", "otf": "opentype"}[url.rsplit(".", 1)[1]]
+    return (
+        "@font-face {\n"
+        f"  font-family: '{family}';\n"
+        f"  font-style: {'italic' if italic else 'normal'};\n"
+        f"  font-weight: {weight};\n"
+        "  font-display: swap;\n"
+        f"  src: url('{url}') format('{font_format}');\n"
+        f"  unicode-range: {FONT_UNICODES};\n"
+        "}\n"
+    )
+
+
+def _rewrite_css(css: str, css_path: str, files: dict) -> str:
+    """Apunta los url() relativos del CSS a los archivos con hash."""
+    base = posixpath.dirname(css_path)
+
+    def replace(match):
+        url = match.group(2)
+        target = posixpath.normpath(posixpath.join(base, url.split("?")[0].split("#")[0]))
+        hashed = files.get(target)
+        if hashed is None or "://" in url or url.startswith(("data:", "/")):
+            return match.group(0)
+        return f"url('{posixpath.relpath(hashed, base)}')"
+
+    return _CSS_URL.sub(replace, css)
+
+
+def _sources(src: str, out: str):
+    for root, dirs, names in os.walk(src):
+        dirs[:] = sorted(d for d in dirs if os.path.join(root, d) != out)
+        for name in sorted(names):
+            path = os.path.join(root, name)
+            yield os.path.relpath(path, src).replace(os.sep, "/"), path
+
+
+def build(src: str, out: str) -> dict:
+    """Regenera `out` a partir de `src` y devuelve el manifiesto."""
+    out = os.path.abspath(out)
+    if os.path.isdir(out):
+        shutil.rmtree(out)
+    files, encodings = {}, {}
+
+    def emit(path: str, data: bytes) -> str:
+        hashed = hashed_name(path, data)
+        target = os.path.join(out, *hashed.split("/"))
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, "wb") as f:
+            f.write(data)
+        if path.endswith(COMPRESSIBLE):
+            variants = compress(data)
+            for encoding, body in variants.items():
+                with open(target + (".br" if encoding == "br" else ".gz"), "wb") as f:
+                    f.write(body)
+            if variants:
+                encodings[hashed] = sorted(variants)
+        files[path] = hashed
+        return hashed
+
+    stylesheets, font_faces = [], []
+    for path, full_path in _sources(src, out):
+        with open(full_path, "rb") as f:
+            data = f.read()
+        if path.endswith(".css"):
+            stylesheets.append((path, data))
+        elif path.startswith(FONTS_DIR + "/") and path.endswith(FONT_EXTENSIONS):
+            data, ext = _subset_font(data, posixpath.splitext(path)[1])
+            hashed = emit(posixpath.splitext(path)[0] + ext, data)
+            font_faces.append(_font_face(posixpath.basename(path), posixpath.relpath(hashed, "css")))
+        else:
+            emit(path, data)
+
+    # Los CSS van al final para poder apuntar a las imágenes y fuentes ya renombradas
+    for path, data in stylesheets:
+        emit(path, _rewrite_css(data.decode("utf-8"), path, files).encode("utf-8"))
+    if font_faces and FONTS_CSS not in files:
+        emit(FONTS_CSS, "".join(font_faces).encode("utf-8"))
+
+    manifest = {"files": files, "encodings": encodings}
+    with open(os.path.join(out, MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True, ensure_ascii=False)
+        f.write("\n")
+    return manifest
+
+
+def load_manifest(out: str) -> dict:
+    """Manifiesto del último build, o vacío si nunca se corrió (se sirven los originales)."""
+    try:
+        with open(os.path.join(out, MANIFEST), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"files": {}, "encodings": {}}
@@ -0,0 +1,240 @@
+#!/usr/bin/env python
+"""
+Benchmark de carga para GATTO.
+
+Levanta `wsgi:app` con el backend stub en un servidor local multihilo (o usa
+una URL ya levantada, por ejemplo Gunicorn) y le pega a `/`, `/buscar`, `/test`
+y `/api/quiz` con N clientes concurrentes. Informa throughput y latencias p50/p95/p99
+por escenario y guarda los resultados en JSON para comparar entre commits.
+
+Una respuesta cuenta como éxito según el encabezado `X-Gatto-Source` de la app,
+no solo por el código HTTP: /buscar muestra los errores de Gemini, el circuito
+abierto y el límite por alumno como páginas 200 con un aviso. Los avisos (notice,
+error) cuentan como errores y los respaldos (respuesta vencida, alumno limitado,
+preguntas del banco) se informan aparte.
+
+Uso:
+    python benchmark.py --clients 20 --requests 500 --out bench.json
+    STUB_LATENCY=lognormal:1.5,0.4 python benchmark.py --compare bench.json
+    python benchmark.py --url http://localhost:5000 --clients 50
+"""
+import argparse
+import json
+import logging
+import os
+import subprocess
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+MATERIAS = ("Matemática", "PDL", "Cs. Naturales", "Cs. Sociales", "Ed. Física", "Inglés")
+NIVELES = ("facil", "intermedio", "desafiante")
+
+
+def percentile(samples, p: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(p * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def scenarios(distinct_questions: int):
+    """Cada escenario arma la petición i-ésima como (método, ruta, datos del form)."""
+    def home(i):
+        return "GET", "/", None
+
+    def buscar(i):
+        # modo=completo: se mide la respuesta entera, no solo la página del stream
+        duda = f"¿Pregunta de prueba número {i % distinct_questions}?"
+        return "POST", "/buscar", {"duda": duda, "modo": "completo"}
+
+    def params(i):
+        materia = MATERIAS[i % len(MATERIAS)]
+        nivel = NIVELES[(i // len(MATERIAS)) % len(NIVELES)]
+        return urllib.parse.urlencode({"materia": materia, "nivel": nivel})
+
+    def test(i):
+        return "GET", "/test?" + params(i), None
+
+    def quiz(i):
+        return "GET", "/api/quiz?" + params(i), None
+
+    return {"home": home, "buscar": buscar, "test": test, "quiz": quiz}
+
+
+# Resultado de cada valor de X-Gatto-Source; sin encabezado (páginas fijas) es "ok"
+OUTCOMES = {
+    "model": "ok", "cache": "ok", "pool": "ok",
+    "stale": "stale", "throttled": "throttled", "bank": "fallback",
+    "notice": "errors", "error": "errors",
+}
+
+
+def _request(base_url: str, method: str, path: str, data):
+    """Devuelve (código HTTP, X-Gatto-Source)."""
+    body = urllib.parse.urlencode(data).encode() if data else None
+    req = urllib.request.Request(base_url + path, data=body, method=method)
+    try:
+        with urllib.request.urlopen(req, timeout=120) as response:
+            response.read()
+            return response.status, response.headers.get("X-Gatto-Source")
+    except urllib.error.HTTPError as e:
+        return e.code, e.headers.get("X-Gatto-Source")
+
+
+def outcome(status, source) -> str:
+    if status is None or status >= 500:
+        return "errors"
+    if status == 429:
+        return "throttled"
+    return OUTCOMES.get(source, "ok")
+
+
+def run_scenario(base_url: str, build, clients: int, requests: int) -> dict:
+    latencies = []
+    counts = dict.fromkeys(("ok", "stale", "throttled", "fallback", "errors"), 0)
+    lock = threading.Lock()
+
+    def one(i):
+        method, path, data = build(i)
+        started = time.perf_counter()
+        try:
+            status, source = _request(base_url, method, path, data)
+        except Exception:
+            status, source = None, None
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+            counts[outcome(status, source)] += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        list(executor.map(one, range(requests)))
+    duration = time.perf_counter() - started
+
+    return {
+        "requests": requests,
+        **counts,
+        "duration_s": round(duration, 3),
+        "throughput_rps": round(requests / duration, 2) if duration else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+    }
+
+
+def start_local_server():
+    """Sirve wsgi:app (backend stub, datos en una carpeta temporal) en un puerto libre."""
+    os.environ.setdefault("MODEL_BACKEND", "stub")
+    os.environ.setdefault("DATA_DIR", tempfile.mkdtemp(prefix="gatto-bench-"))
+    os.environ.setdefault("QUIZ_POOL_ENABLED", "False")
+    # Todos los clientes del benchmark comparten IP: sin límites por alumno ni cuota
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "False")
+    os.environ.setdefault("UPSTREAM_BUDGET_PER_MINUTE", "0")
+    from werkzeug.serving import make_server
+
+    from wsgi import app
+
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except Exception:
+        return ""
+
+
+def run_benchmark(base_url: str, clients: int, requests: int, distinct_questions: int,
+                  only=None) -> dict:
+    results = {}
+    for name, build in scenarios(distinct_questions).items():
+        if only and name not in only:
+            continue
+        results[name] = run_scenario(base_url, build, clients, requests)
+    return {
+        "commit": _git_commit(),
+        "timestamp": time.time(),
+        "clients": clients,
+        "requests": requests,
+        "distinct_questions": distinct_questions,
+        "env": {
+            key: os.environ[key]
+            for key in ("MODEL_BACKEND", "STUB_LATENCY", "STUB_ERROR_RATE",
+                        "STUB_MALFORMED_RATE", "STUB_FENCED_RATE", "STUB_SEED",
+                        "RATE_LIMIT_ENABLED", "UPSTREAM_BUDGET_PER_MINUTE", "ASYNC_MODE",
+                        "HEDGE_ENABLED")
+            if key in os.environ
+        },
+        "scenarios": results,
+    }
+
+
+def print_report(report: dict, baseline: dict = None) -> None:
+    if report.get("url"):
+        print(f"Servidor externo {report['url']}: usa su propia configuración. Si tiene el límite "
+              "por alumno (RATE_LIMIT_ENABLED) o la cuota de Gemini (UPSTREAM_BUDGET_PER_MINUTE) "
+              "activos, todos los clientes comparten IP y aparecen como 'limit.' o 'vencidas'.")
+    print(f"{'escenario':<10} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'ok':>6} "
+          f"{'vencidas':>9} {'limit.':>7} {'respaldo':>9} {'errores':>8}")
+    for name, r in report["scenarios"].items():
+        print(f"{name:<10} {r['throughput_rps']:>9} {r['p50_ms']:>9} {r['p95_ms']:>9} "
+              f"{r['p99_ms']:>9} {r.get('ok', ''):>6} {r.get('stale', ''):>9} "
+              f"{r.get('throttled', ''):>7} {r.get('fallback', ''):>9} {r['errors']:>8}")
+        before = (baseline or {}).get("scenarios", {}).get(name)
+        if before:
+            for key in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms"):
+                if before[key]:
+                    change = (r[key] - before[key]) / before[key] * 100
+                    print(f"{'':<10} {key}: {before[key]} -> {r[key]} ({change:+.1f}%)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="URL de un servidor ya levantado (por defecto, uno local con stub)")
+    parser.add_argument("--clients", type=int, default=10, help="clientes concurrentes")
+    parser.add_argument("--requests", type=int, default=200, help="peticiones por escenario")
+    parser.add_argument("--distinct", type=int, default=50, help="dudas distintas en /buscar")
+    parser.add_argument("--only", nargs="*", choices=("home", "buscar", "test", "quiz"))
+    parser.add_argument("--out", help="archivo JSON donde guardar los resultados")
+    parser.add_argument("--compare", help="JSON de una corrida anterior para comparar")
+    args = parser.parse_args(argv)
+
+    server = None
+    base_url = args.url
+    if not base_url:
+        server, base_url = start_local_server()
+    try:
+        report = run_benchmark(base_url, args.clients, args.requests, args.distinct, args.only)
+        if args.url:
+            report["url"] = args.url
+    finally:
+        if server is not None:
+            server.shutdown()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""
+Circuit breaker por modelo y timeouts adaptativos para las llamadas a Gemini.
+
+Cuando Gemini está degradado, después de `failure_threshold` errores seguidos
+el circuito se abre y las llamadas fallan al instante (CircuitOpenError) en
+vez de colgar un worker hasta el timeout. Pasado `recovery_time`, una sola
+petición de prueba (half-open) decide si se vuelve a cerrar. El estado vive
+en SQLite para que los 4 workers de Gunicorn se enteren a la vez.
+
+El timeout de cada llamada se calcula a partir de la latencia observada
+(percentil configurable x multiplicador), acotado entre un mínimo y un máximo.
+"""
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from storage import Counters, connect
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(Exception):
+    """El circuito del modelo está abierto: no se llama a la API."""
+
+
+class LatencyTracker:
+    """Ventana de latencias recientes (en segundos) de un proceso."""
+
+    def __init__(self, size: int = 200):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, p: float):
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        index = min(len(samples) - 1, int(round(p * (len(samples) - 1))))
+        return samples[index]
+
+
+class CircuitBreaker:
+    def __init__(self, path: str, name: str, failure_threshold: int = 5,
+                 recovery_time: float = 30.0, min_timeout: float = 5.0,
+                 max_timeout: float = 30.0, timeout_percentile: float = 0.99,
+                 timeout_multiplier: float = 2.0, min_samples: int = 20):
+        self.path = path
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_time = recovery_time
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.timeout_percentile = timeout_percentile
+        self.timeout_multiplier = timeout_multiplier
+        self.min_samples = min_samples
+        self.latencies = LatencyTracker()
+        conn = connect(path)
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS breakers (
+                name TEXT PRIMARY KEY,
+                state TEXT NOT NULL,
+                failures INTEGER NOT NULL,
+                changed_at REAL NOT NULL
+            )
+            """
+        )
+        conn.execute(
+            "INSERT OR IGNORE INTO breakers (name, state, failures, changed_at) VALUES (?, ?, 0, ?)",
+            (name, CLOSED, time.time()),
+        )
+        self.counters = Counters(path, table="breaker_counters")
+
+    @property
+    def state(self) -> str:
+        return self._row()[0]
+
+    def timeout(self) -> float:
+        """Timeout adaptativo: percentil de latencia x multiplicador, acotado."""
+        if len(self.latencies) < self.min_samples:
+            return self.max_timeout
+        observed = self.latencies.percentile(self.timeout_percentile) * self.timeout_multiplier
+        return max(self.min_timeout, min(self.max_timeout, observed))
+
+    @contextmanager
+    def guard(self):
+        """Protege una llamada: entrega el timeout a usar y registra el resultado.
+
+        Lanza CircuitOpenError sin llamar a la API si el circuito está abierto.
+        """
+        self._before_call()
+        started = time.perf_counter()
+        try:
+            yield self.timeout()
+        except Exception:
+            self._on_failure()
+            raise
+        self.latencies.add(time.perf_counter() - started)
+        self._on_success()
+
+    def stats(self) -> dict:
+        state, failures, changed_at = self._row()
+        return {
+            "state": state,
+            "failures": failures,
+            "changed_at": changed_at,
+            "timeout": self.timeout(),
+            "p50": self.latencies.percentile(0.5),
+            "p99": self.latencies.percentile(0.99),
+        }
+
+    def _row(self):
+        return connect(self.path).execute(
+            "SELECT state, failures, changed_at FROM breakers WHERE name = ?", (self.name,)
+        ).fetchone()
+
+    def _before_call(self) -> None:
+        state, _, changed_at = self._row()
+        if state == CLOSED:
+            return
+
+        now = time.time()
+        if state == OPEN and now - changed_at >= self.recovery_time:
+            # Solo una petición (de cualquier worker) hace de prueba
+            if self._transition(OPEN, HALF_OPEN, changed_at=now):
+                return
+        elif state == HALF_OPEN and now - changed_at >= self.max_timeout:
+            # La prueba anterior quedó colgada: tomamos su lugar
+            if self._transition(HALF_OPEN, HALF_OPEN, changed_at=now, expected_changed_at=changed_at):
+                return
+
+        self.counters.incr(f"{self.name}:rejected")
+        raise CircuitOpenError(f"Circuito de {self.name} abierto")
+
+    def _on_success(self) -> None:
+        state, failures, _ = self._row()
+        if state != CLOSED:
+            self._transition(state, CLOSED)
+        elif failures:
+            connect(self.path).execute(
+                "UPDATE breakers SET failures = 0 WHERE name = ?", (self.name,)
+            )
+
+    def _on_failure(self) -> None:
+        self.counters.incr(f"{self.name}:failures")
+        state, failures = connect(self.path).execute(
+            "UPDATE breakers SET failures = failures + 1 WHERE name = ? RETURNING state, failures",
+            (self.name,),
+        ).fetchone()
+        if state == HALF_OPEN or (state == CLOSED and failures >= self.failure_threshold):
+            self._transition(state, OPEN)
+
+    def _transition(self, from_state: str, to_state: str, changed_at: float = None,
+                    expected_changed_at: float = None) -> bool:
+        """Cambia de estado solo si nadie lo cambió antes (compare-and-set)."""
+        changed_at = time.time() if changed_at is None else changed_at
+        failures = "0" if to_state == CLOSED else "failures"
+        sql = (
+            f"UPDATE breakers SET state = ?, changed_at = ?, failures = {failures} "
+            "WHERE name = ? AND state = ?"
+        )
+        params = [to_state, changed_at, self.name, from_state]
+        if expected_changed_at is not None:
+            sql += " AND changed_at = ?"
+            params.append(expected_changed_at)
+        cur = connect(self.path).execute(sql, params)
+        if cur.rowcount != 1:
+            return False
+        if from_state != to_state:
+            self.counters.incr(f"{self.name}:{from_state}->{to_state}")
+            logger.warning("Circuito %s: %s -> %s", self.name, from_state, to_state)
+        return True
@@ -3,10 +3,140 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
 class Config:
     """Configuración base"""
     SECRET_KEY = os.getenv('SECRET_KEY', 'dev-key-change-in-production')
     FLASK_ENV = os.getenv('FLASK_ENV', 'development')
+    # Backend de los modelos: "gemini" (API real) o "stub" (respuestas locales, sin red)
+    MODEL_BACKEND = os.getenv('MODEL_BACKEND', 'gemini')
+    GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
+    # Backend stub: latencia ("0.2", "uniform:0.1,0.5", "lognormal:mediana,sigma"),
+    # proporción de errores, de JSON cortado y de JSON en bloque Markdown, y semilla
+    STUB_LATENCY = os.getenv('STUB_LATENCY', '0')
+    STUB_ERROR_RATE = float(os.getenv('STUB_ERROR_RATE', 0))
+    STUB_MALFORMED_RATE = float(os.getenv('STUB_MALFORMED_RATE', 0))
+    STUB_FENCED_RATE = float(os.getenv('STUB_FENCED_RATE', 0))
+    STUB_SEED = int(os.getenv('STUB_SEED', 0))
+    # Archivos estáticos con hash (`flask assets build`): carpeta del build, si url_for los
+    # usa y segundos de caché en el navegador (el nombre cambia cuando cambia el contenido)
+    ASSETS_DIST_DIR = os.getenv('ASSETS_DIST_DIR', os.path.join(BASE_DIR, 'static', 'dist'))
+    ASSETS_FINGERPRINT = os.getenv('ASSETS_FINGERPRINT', 'True').lower() == 'true'
+    ASSETS_MAX_AGE = int(os.getenv('ASSETS_MAX_AGE', 365 * 24 * 3600))
+    # Anchos (px) de las variantes WebP/AVIF/PNG de static/img, además del original
+    IMAGE_WIDTHS = [int(w) for w in os.getenv('IMAGE_WIDTHS', '170,340').split(',') if w.strip()]
+    # Páginas pre-renderizadas con ETag (inicio) y cada cuántos segundos se revisa si
+    # cambiaron los templates o el build de estáticos
+    PAGE_CACHE_ENABLED = os.getenv('PAGE_CACHE_ENABLED', 'True').lower() == 'true'
+    PAGE_CACHE_CHECK_INTERVAL = float(os.getenv('PAGE_CACHE_CHECK_INTERVAL', 1))
+    # Carpeta local donde se guardan las bases SQLite compartidas entre workers
+    DATA_DIR = os.getenv('DATA_DIR', os.path.join(BASE_DIR, 'instance'))
+    # Caché de respuestas del tutor (segundos / cantidad máxima de entradas)
+    ANSWER_CACHE_TTL = int(os.getenv('ANSWER_CACHE_TTL', 7 * 24 * 3600))
+    ANSWER_CACHE_MAX_ENTRIES = int(os.getenv('ANSWER_CACHE_MAX_ENTRIES', 10000))
+    # Similitud mínima (0 a 1) para reutilizar la respuesta de una pregunta parecida
+    QUESTION_SIMILARITY_THRESHOLD = float(os.getenv('QUESTION_SIMILARITY_THRESHOLD', 0.8))
+    # Pool de tests pre-generados: tandas mínimas por (materia, nivel), tandas por
+    # pasada, llamadas simultáneas a Gemini, segundos entre pasadas y vencimiento
+    QUIZ_POOL_ENABLED = os.getenv('QUIZ_POOL_ENABLED', 'True').lower() == 'true'
+    QUIZ_POOL_LOW_WATER = int(os.getenv('QUIZ_POOL_LOW_WATER', 3))
+    QUIZ_POOL_REFILL_SIZE = int(os.getenv('QUIZ_POOL_REFILL_SIZE', 2))
+    QUIZ_POOL_CONCURRENCY = int(os.getenv('QUIZ_POOL_CONCURRENCY', 2))
+    QUIZ_POOL_INTERVAL = float(os.getenv('QUIZ_POOL_INTERVAL', 30))
+    QUIZ_POOL_MAX_AGE = int(os.getenv('QUIZ_POOL_MAX_AGE', 24 * 3600))
+    # Reposición en lote: varias tandas de una materia (de uno o más niveles) por llamada
+    QUIZ_POOL_BATCH = os.getenv('QUIZ_POOL_BATCH', 'True').lower() == 'true'
+    QUIZ_POOL_BATCH_SETS = int(os.getenv('QUIZ_POOL_BATCH_SETS', 3))
+    # Variantes de prompt por ruta (tutor, quiz, quiz_batch) y porcentaje de tráfico de cada una:
+    # "tutor=completo@1:90,compacto@1:10;quiz=compacto@1". Vacío = la primera de cada ruta
+    PROMPT_SPLIT = os.getenv('PROMPT_SPLIT', '')
+    PROMPT_CORPUS = os.getenv('PROMPT_CORPUS', os.path.join(BASE_DIR, 'data', 'prompt_corpus.txt'))
+    # Tandas incompletas (JSON cortado o preguntas inválidas): se completan si faltan hasta
+    # QUIZ_SALVAGE_MAX_MISSING, pidiendo a Gemini solo las que faltan y si no con el banco
+    QUIZ_SALVAGE_MAX_MISSING = int(os.getenv('QUIZ_SALVAGE_MAX_MISSING', 6))
+    QUIZ_SALVAGE_FOLLOWUP = os.getenv('QUIZ_SALVAGE_FOLLOWUP', 'True').lower() == 'true'
+    # /buscar responde la página al instante y envía las secciones por SSE
+    BUSCAR_STREAMING = os.getenv('BUSCAR_STREAMING', 'True').lower() == 'true'
+    # Circuit breaker por modelo: errores seguidos para abrir y segundos hasta reintentar
+    BREAKER_FAILURE_THRESHOLD = int(os.getenv('BREAKER_FAILURE_THRESHOLD', 5))
+    BREAKER_RECOVERY_TIME = float(os.getenv('BREAKER_RECOVERY_TIME', 30))
+    # Timeout adaptativo de Gemini: percentil de latencia x multiplicador, entre MIN y MAX
+    GEMINI_TIMEOUT_MIN = float(os.getenv('GEMINI_TIMEOUT_MIN', 5))
+    GEMINI_TIMEOUT_MAX = float(os.getenv('GEMINI_TIMEOUT_MAX', 30))
+    GEMINI_TIMEOUT_PERCENTILE = float(os.getenv('GEMINI_TIMEOUT_PERCENTILE', 0.99))
+    GEMINI_TIMEOUT_MULTIPLIER = float(os.getenv('GEMINI_TIMEOUT_MULTIPLIER', 2))
+    # Preguntas con las que arranca el banco de preguntas de /test
+    QUESTION_BANK_SEED = os.getenv('QUESTION_BANK_SEED', os.path.join(BASE_DIR, 'data', 'question_bank.json'))
+    # Segundos entre volcados de las métricas de cada worker a SQLite
+    METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', 5))
+    # Log estructurado (una línea JSON por petición) con las fases de Server-Timing
+    TIMING_LOG = os.getenv('TIMING_LOG', 'True').lower() == 'true'
+    # Token para /admin/* (sin token, las rutas de admin no existen)
+    ADMIN_TOKEN = os.getenv('ADMIN_TOKEN')
+    # Profiler por muestreo: segundos entre muestras y tope de peticiones por armado
+    PROFILER_INTERVAL = float(os.getenv('PROFILER_INTERVAL', 0.005))
+    PROFILER_MAX_REQUESTS = int(os.getenv('PROFILER_MAX_REQUESTS', 100))
+    # Resultados de los tests: segundos entre volcados a SQLite, respuestas acumuladas que
+    # fuerzan un volcado antes, tope por test y respuestas mínimas para "preguntas difíciles"
+    QUIZ_RESULTS_FLUSH_INTERVAL = float(os.getenv('QUIZ_RESULTS_FLUSH_INTERVAL', 5))
+    QUIZ_RESULTS_MAX_PENDING = int(os.getenv('QUIZ_RESULTS_MAX_PENDING', 1000))
+    QUIZ_RESULTS_MAX_ANSWERS = int(os.getenv('QUIZ_RESULTS_MAX_ANSWERS', 50))
+    QUIZ_RESULTS_MIN_ANSWERS = int(os.getenv('QUIZ_RESULTS_MIN_ANSWERS', 5))
+    # Ruteo de dudas: las cortas y simples van al modelo rápido, el resto a gemini-2.5-flash.
+    # Palabras máximas de una duda "simple", palabras que piden razonar (separadas por
+    # coma; vacío = las de routing.py) y materias cuyos temas van al modelo fuerte
+    ROUTING_ENABLED = os.getenv('ROUTING_ENABLED', 'True').lower() == 'true'
+    ROUTING_FAST_MODEL = os.getenv('ROUTING_FAST_MODEL', 'gemini-2.0-flash')
+    ROUTING_MAX_SIMPLE_WORDS = int(os.getenv('ROUTING_MAX_SIMPLE_WORDS', 12))
+    ROUTING_KEYWORDS = [k.strip() for k in os.getenv('ROUTING_KEYWORDS', '').split(',') if k.strip()]
+    ROUTING_STRONG_SUBJECTS = [s.strip() for s in os.getenv(
+        'ROUTING_STRONG_SUBJECTS', 'Matemática,Cs. Naturales,Cs. Sociales').split(',') if s.strip()]
+    # Hedge: si el modelo no respondió en su percentil de latencia, se pide también al otro.
+    # Hasta juntar muestras se espera HEDGE_DEFAULT_DELAY; nunca menos que HEDGE_MIN_DELAY
+    HEDGE_ENABLED = os.getenv('HEDGE_ENABLED', 'True').lower() == 'true'
+    HEDGE_PERCENTILE = float(os.getenv('HEDGE_PERCENTILE', 0.95))
+    HEDGE_DEFAULT_DELAY = float(os.getenv('HEDGE_DEFAULT_DELAY', 8))
+    HEDGE_MIN_DELAY = float(os.getenv('HEDGE_MIN_DELAY', 0.5))
+    HEDGE_THREADS = int(os.getenv('HEDGE_THREADS', 16))
+    # Dudas frecuentes: segundos entre volcados a SQLite y días que se tienen en cuenta
+    POPULAR_FLUSH_INTERVAL = float(os.getenv('POPULAR_FLUSH_INTERVAL', 5))
+    POPULAR_WINDOW_DAYS = float(os.getenv('POPULAR_WINDOW_DAYS', 30))
+    # `flask warm`: dudas frecuentes a pre-generar, llamadas simultáneas y por segundo
+    WARM_TOP = int(os.getenv('WARM_TOP', 50))
+    WARM_CONCURRENCY = int(os.getenv('WARM_CONCURRENCY', 2))
+    WARM_RATE = float(os.getenv('WARM_RATE', 1))
+    # Límite por alumno (token bucket compartido entre workers): ráfaga y fichas por minuto,
+    # por sesión y por IP. La IP es más generosa porque una escuela entera sale por una sola
+    RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', 'True').lower() == 'true'
+    RATE_LIMIT_SESSION_BURST = float(os.getenv('RATE_LIMIT_SESSION_BURST', 10))
+    RATE_LIMIT_SESSION_PER_MINUTE = float(os.getenv('RATE_LIMIT_SESSION_PER_MINUTE', 6))
+    RATE_LIMIT_IP_BURST = float(os.getenv('RATE_LIMIT_IP_BURST', 120))
+    RATE_LIMIT_IP_PER_MINUTE = float(os.getenv('RATE_LIMIT_IP_PER_MINUTE', 60))
+    # Presupuesto de llamadas por minuto a cada modelo entre todos los workers (0 = sin tope);
+    # UPSTREAM_BUDGETS lo cambia por modelo: "gemini-2.5-flash=60,gemini-2.0-flash=200"
+    UPSTREAM_BUDGET_PER_MINUTE = float(os.getenv('UPSTREAM_BUDGET_PER_MINUTE', 120))
+    UPSTREAM_BUDGETS = {
+        name.strip(): float(value)
+        for name, _, value in (
+            item.partition('=') for item in os.getenv('UPSTREAM_BUDGETS', '').split(',') if '=' in item
+        )
+    }
+    # Proxies delante de la app (nginx = 1): cuántos saltos de X-Forwarded-For son confiables
+    PROXY_COUNT = int(os.getenv('PROXY_COUNT', 0))
+    # Modo asíncrono: las llamadas a Gemini van al event loop de cada worker con
+    # generate_content_async. Las peticiones siguen ocupando un hilo cada una: Gunicorn
+    # usa workers gthread con WORKER_THREADS hilos (ver gunicorn.conf.py).
+    # MODEL_CONCURRENCY acota las llamadas en vuelo por modelo y por proceso (0 = sin tope);
+    # si no se libera un lugar en MODEL_SLOT_WAIT segundos se usa el respaldo
+    ASYNC_MODE = os.getenv('ASYNC_MODE', 'False').lower() == 'true'
+    MODEL_CONCURRENCY = int(os.getenv('MODEL_CONCURRENCY', 100))
+    MODEL_SLOT_WAIT = float(os.getenv('MODEL_SLOT_WAIT', 2))
+    # Modo asíncrono de /buscar: cola acotada + pool de hilos con tope global
+    BUSCAR_ASYNC = os.getenv('BUSCAR_ASYNC', 'False').lower() == 'true'
+    JOBS_MAX_QUEUE = int(os.getenv('JOBS_MAX_QUEUE', 200))
+    JOBS_CONCURRENCY = int(os.getenv('JOBS_CONCURRENCY', 4))
+    JOBS_RETRY_AFTER = int(os.getenv('JOBS_RETRY_AFTER', 15))
     
 class DevelopmentConfig(Config):
     """Configuración para desarrollo"""
@@ -22,6 +152,8 @@ class TestingConfig(Config):
     """Configuración para testing"""
     DEBUG = True
     TESTING = True
+    QUIZ_POOL_ENABLED = False
+    MODEL_BACKEND = 'stub'
 
 # Seleccionar configuración según el ambiente
 config = {
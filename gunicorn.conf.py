@@ -0,0 +1,29 @@
+"""
+Configuración de Gunicorn (se carga sola al correr `gunicorn wsgi:app` desde esta carpeta).
+"""
+import os
+
+# Workers gthread: un pool de WORKER_THREADS hilos por worker. No es un worker asíncrono:
+# cada petición ocupa un hilo del sistema mientras espera. Con ASYNC_MODE las llamadas a
+# Gemini corren en el event loop del worker (aio.py) y el hilo solo espera el resultado
+_async_mode = os.getenv("ASYNC_MODE", "False").lower() == "true"
+_threads = int(os.getenv("WORKER_THREADS", 64 if _async_mode else 1))
+if _threads > 1:
+    worker_class = "gthread"
+    threads = _threads
+
+
+def post_worker_init(worker):
+    # Cada worker arma sus clientes de Gemini después del fork, antes de la primera petición
+    from app import QUIZ_MODEL, TUTOR_MODEL, get_async_runner, get_models, prerender_pages
+
+    with worker.wsgi.app_context():
+        try:
+            get_models().warm((TUTOR_MODEL, worker.wsgi.config["ROUTING_FAST_MODEL"], QUIZ_MODEL))
+        except Exception as e:
+            worker.log.warning("No se pudieron crear los clientes de los modelos: %s", e)
+        if worker.wsgi.config["ASYNC_MODE"]:
+            # El event loop de las llamadas a Gemini arranca con el worker, no en la primera duda
+            get_async_runner().loop()
+        # La página de inicio queda renderizada antes de la primera visita
+        prerender_pages()
@@ -0,0 +1,182 @@
+"""
+Variantes responsive de las imágenes de static/img (WebP, AVIF y PNG a varios anchos).
+
+`build(static_dir, widths)` genera en `static/img/variants/` cada imagen a los
+anchos pedidos (más el original), en AVIF y WebP si Pillow los soporta y en
+PNG como respaldo, y anota en `images.json` el hash de cada original. Es
+incremental: una imagen cuyo hash no cambió no se vuelve a procesar. Después,
+`flask assets build` les pone hash en el nombre como al resto de los estáticos.
+
+`picture_html()` arma el `<picture>` con un `<source>` por formato, `srcset`
+por ancho, `width`/`height` explícitos (evitan saltos de layout) y
+`loading="lazy"`. Sin variantes generadas devuelve un `<img>` común.
+"""
+import hashlib
+import json
+import os
+import posixpath
+import struct
+
+from markupsafe import Markup, escape
+
+IMAGE_DIR = "img"
+VARIANTS_DIR = "img/variants"
+MANIFEST = "images.json"
+SOURCE_EXTENSIONS = (".png", ".jpg", ".jpeg")
+# Del más liviano al más compatible: el navegador usa el primer <source> que entiende
+FORMATS = (
+    ("avif", "image/avif", {"quality": 55}),
+    ("webp", "image/webp", {"quality": 80, "method": 6}),
+)
+FALLBACK = ("png", "image/png", {"optimize": True})
+
+
+def _load_pillow():
+    try:
+        from PIL import Image, features
+    except ImportError:
+        return None, ()
+    formats = tuple(name for name, _, _ in FORMATS if features.check(name))
+    return Image, formats
+
+
+def png_size(path: str):
+    """(ancho, alto) leyendo solo el encabezado del PNG, sin Pillow; None si no es PNG."""
+    with open(path, "rb") as f:
+        header = f.read(24)
+    if header[:8] != b"\x89PNG\r\n\x1a\n" or header[12:16] != b"IHDR":
+        return None
+    return struct.unpack(">II", header[16:24])
+
+
+def _file_hash(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def load_manifest(static_dir: str) -> dict:
+    try:
+        with open(os.path.join(static_dir, *VARIANTS_DIR.split("/"), MANIFEST), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def _sources(static_dir: str):
+    root = os.path.join(static_dir, IMAGE_DIR)
+    variants = os.path.join(static_dir, *VARIANTS_DIR.split("/"))
+    for current, dirs, names in os.walk(root):
+        dirs[:] = sorted(d for d in dirs if os.path.join(current, d) != variants)
+        for name in sorted(names):
+            if name.lower().endswith(SOURCE_EXTENSIONS):
+                path = os.path.join(current, name)
+                yield os.path.relpath(path, static_dir).replace(os.sep, "/"), path
+
+
+def _variant_name(source: str, width: int, ext: str) -> str:
+    stem = posixpath.splitext(posixpath.relpath(source, IMAGE_DIR))[0]
+    return f"{VARIANTS_DIR}/{stem}-{width}.{ext}"
+
+
+def build(static_dir: str, widths=(170, 340)) -> dict:
+    """Genera las variantes que falten o cuyo original cambió.
+
+    Devuelve {"images": manifiesto, "generated": n, "skipped": n}.
+
+    Lanza RuntimeError si Pillow no está instalado.
+    """
+    Image, formats = _load_pillow()
+    if Image is None:
+        raise RuntimeError("Pillow no está instalado: pip install Pillow")
+    previous = load_manifest(static_dir)
+    manifest, generated = {}, 0
+    for source, path in _sources(static_dir):
+        digest = _file_hash(path)
+        entry = previous.get(source)
+        if entry and entry["hash"] == digest and all(
+            os.path.exists(os.path.join(static_dir, *name.split("/")))
+            for variants in entry["variants"].values() for _, name in variants
+        ):
+            manifest[source] = entry
+            continue
+        manifest[source] = _build_image(Image, formats, static_dir, source, path, digest, widths)
+        generated += 1
+
+    # Variantes de imágenes que ya no existen
+    for source, entry in previous.items():
+        if source not in manifest:
+            for variants in entry["variants"].values():
+                for _, name in variants:
+                    if not name.startswith(VARIANTS_DIR + "/"):
+                        continue
+                    try:
+                        os.remove(os.path.join(static_dir, *name.split("/")))
+                    except FileNotFoundError:
+                        pass
+
+    with open(os.path.join(static_dir, *VARIANTS_DIR.split("/"), MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True, ensure_ascii=False)
+        f.write("\n")
+    return {"images": manifest, "generated": generated, "skipped": len(manifest) - generated}
+
+
+def _build_image(Image, formats, static_dir, source, path, digest, widths) -> dict:
+    with Image.open(path) as original:
+        original.load()
+        width, height = original.size
+        targets = sorted({w for w in widths if w < width} | {width})
+        variants = {}
+        for ext, _, options in [f for f in FORMATS if f[0] in formats] + [FALLBACK]:
+            variants[ext] = []
+            for target in targets:
+                if ext == FALLBACK[0] and target == width:
+                    # El respaldo a tamaño completo es el original tal cual
+                    variants[ext].append((target, source))
+                    continue
+                size = (target, max(1, round(height * target / width)))
+                image = original if size == original.size else original.resize(size, Image.LANCZOS)
+                if ext != FALLBACK[0] and image.mode == "P":
+                    image = image.convert("RGBA")
+                name = _variant_name(source, target, ext)
+                out = os.path.join(static_dir, *name.split("/"))
+                os.makedirs(os.path.dirname(out), exist_ok=True)
+                image.save(out, format=ext.upper(), **options)
+                if ext == FALLBACK[0] and os.path.getsize(out) >= os.path.getsize(path):
+                    # Un PNG reescalado puede pesar más que el original optimizado: no sirve
+                    os.remove(out)
+                    continue
+                variants[ext].append((target, name))
+    return {"hash": digest, "width": width, "height": height, "variants": variants}
+
+
+def _attrs(**attrs) -> str:
+    return "".join(
+        f' {name.rstrip("_").replace("_", "-")}="{escape(value)}"'
+        for name, value in attrs.items() if value is not None
+    )
+
+
+def picture_html(url_for, filename: str, alt: str, entry: dict = None, size=None,
+                 sizes: str = "100vw", loading: str = "lazy", **attrs) -> Markup:
+    """`<picture>` con las variantes de `entry` (del manifiesto) o un `<img>` si no hay.
+
+    `url_for(nombre)` devuelve la URL de un estático; `size` es (ancho, alto) del
+    original cuando no hay manifiesto. Los demás argumentos van al `<img>`
+    (`class_="cat-hero"`, `fetchpriority="high"`).
+    """
+    width, height = (entry["width"], entry["height"]) if entry else (size or (None, None))
+    img_attrs = dict(width=width, height=height, alt=alt, loading=loading, decoding="async", **attrs)
+    if not entry:
+        return Markup(f"<img{_attrs(src=url_for(filename), **img_attrs)}>")
+
+    def srcset(variants):
+        return ", ".join(f"{url_for(name)} {w}w" for w, name in variants)
+
+    lines = ["<picture>"]
+    for ext, mimetype, _ in FORMATS:
+        if entry["variants"].get(ext):
+            lines.append(f"<source{_attrs(type=mimetype, srcset=srcset(entry['variants'][ext]), sizes=sizes)}>")
+    fallback = entry["variants"][FALLBACK[0]]
+    lines.append(f"<img{_attrs(src=url_for(fallback[-1][1]), srcset=srcset(fallback), sizes=sizes, **img_attrs)}>")
+    lines.append("</picture>")
+    return Markup("".join(lines))
@@ -0,0 +1,197 @@
+"""
+Cola de trabajos para el modo asíncrono de /buscar.
+
+POST /buscar encola la duda y devuelve enseguida un ID; un pool de hilos en
+cada worker de Gunicorn va tomando trabajos de la cola (SQLite compartido),
+respetando un tope global de trabajos en ejecución. Si la cola está llena se
+rechaza la petición (QueueFullError) para no tirar abajo el sitio.
+"""
+import json
+import logging
+import threading
+import time
+import uuid
+
+from storage import Counters, connect
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(Exception):
+    """La cola alcanzó su tamaño máximo."""
+
+
+class JobQueue:
+    def __init__(self, path: str, max_queue: int = 200, concurrency: int = 4,
+                 job_timeout: float = 120.0, keep_finished: float = 3600.0):
+        self.path = path
+        self.max_queue = max_queue
+        self.concurrency = concurrency
+        self.job_timeout = job_timeout
+        self.keep_finished = keep_finished
+        conn = connect(path)
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                result TEXT,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+        self.counters = Counters(path, table="job_counters")
+
+    def submit(self, payload: dict) -> str:
+        job_id = uuid.uuid4().hex
+        cur = connect(self.path).execute(
+            "INSERT INTO jobs (id, status, payload, created_at) "
+            "SELECT ?, ?, ?, ? WHERE (SELECT count(*) FROM jobs WHERE status = ?) < ?",
+            (job_id, QUEUED, json.dumps(payload, ensure_ascii=False), time.time(),
+             QUEUED, self.max_queue),
+        )
+        if cur.rowcount != 1:
+            self.counters.incr("rejected")
+            raise QueueFullError("La cola de preguntas está llena")
+        self.counters.incr("submitted")
+        return job_id
+
+    def claim(self):
+        """Toma el trabajo más viejo si no se superó el tope de concurrencia."""
+        row = connect(self.path).execute(
+            "UPDATE jobs SET status = ?, started_at = ? WHERE id = ("
+            " SELECT id FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1)"
+            " AND (SELECT count(*) FROM jobs WHERE status = ?) < ?"
+            " RETURNING id, payload, started_at - created_at",
+            (RUNNING, time.time(), QUEUED, RUNNING, self.concurrency),
+        ).fetchone()
+        if row is None:
+            return None
+        job_id, payload, waited = row
+        self.counters.incr("wait_ms_total", int(waited * 1000))
+        self.counters.incr("started")
+        return job_id, json.loads(payload)
+
+    def finish(self, job_id: str, result) -> None:
+        self._close(job_id, DONE, result)
+
+    def fail(self, job_id: str, error: str) -> None:
+        self._close(job_id, FAILED, error)
+
+    def get(self, job_id: str):
+        conn = connect(self.path)
+        row = conn.execute(
+            "SELECT status, payload, result, created_at FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        status, payload, result, created_at = row
+        job = {
+            "id": job_id,
+            "status": status,
+            "payload": json.loads(payload),
+            "result": json.loads(result) if result else None,
+        }
+        if status == QUEUED:
+            job["position"] = conn.execute(
+                "SELECT count(*) FROM jobs WHERE status = ? AND created_at <= ?", (QUEUED, created_at)
+            ).fetchone()[0]
+        return job
+
+    def requeue_stale(self) -> int:
+        """Vuelve a encolar trabajos de workers que murieron a mitad de camino."""
+        conn = connect(self.path)
+        now = time.time()
+        cur = conn.execute(
+            "UPDATE jobs SET status = ?, started_at = NULL WHERE status = ? AND started_at < ?",
+            (QUEUED, RUNNING, now - self.job_timeout),
+        )
+        conn.execute(
+            "DELETE FROM jobs WHERE status IN (?, ?) AND finished_at < ?",
+            (DONE, FAILED, now - self.keep_finished),
+        )
+        return cur.rowcount
+
+    def stats(self) -> dict:
+        counts = dict(connect(self.path).execute(
+            "SELECT status, count(*) FROM jobs GROUP BY status"
+        ).fetchall())
+        counters = self.counters.snapshot()
+        started = counters.get("started", 0)
+        return {
+            "queued": counts.get(QUEUED, 0),
+            "running": counts.get(RUNNING, 0),
+            "max_queue": self.max_queue,
+            "concurrency": self.concurrency,
+            "submitted": counters.get("submitted", 0),
+            "rejected": counters.get("rejected", 0),
+            "failed": counters.get("failed", 0),
+            "avg_wait_ms": counters.get("wait_ms_total", 0) / started if started else 0.0,
+        }
+
+    def _close(self, job_id: str, status: str, result) -> None:
+        connect(self.path).execute(
+            "UPDATE jobs SET status = ?, result = ?, finished_at = ? WHERE id = ?",
+            (status, json.dumps(result, ensure_ascii=False), time.time(), job_id),
+        )
+        if status == FAILED:
+            self.counters.incr("failed")
+
+
+class JobWorkerPool:
+    """Hilos que ejecutan `handler(payload)` para cada trabajo de la cola."""
+
+    def __init__(self, queue: JobQueue, handler, threads: int = 4, poll_interval: float = 0.5):
+        self.queue = queue
+        self.handler = handler
+        self.poll_interval = poll_interval
+        self._stop_event = threading.Event()
+        self._threads = [
+            threading.Thread(target=self._run, name=f"buscar-job-{i}", daemon=True)
+            for i in range(threads)
+        ]
+
+    def start(self) -> None:
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+    def is_alive(self) -> bool:
+        return any(thread.is_alive() for thread in self._threads)
+
+    def run_once(self) -> bool:
+        claimed = self.queue.claim()
+        if claimed is None:
+            return False
+        job_id, payload = claimed
+        try:
+            self.queue.finish(job_id, self.handler(payload))
+        except Exception as e:
+            logger.warning("Error en el trabajo %s: %s", job_id, e)
+            self.queue.fail(job_id, str(e))
+        return True
+
+    def _run(self) -> None:
+        last_maintenance = 0.0
+        while not self._stop_event.is_set():
+            if time.time() - last_maintenance > self.queue.job_timeout / 2:
+                self.queue.requeue_stale()
+                last_maintenance = time.time()
+            try:
+                worked = self.run_once()
+            except Exception as e:
+                logger.warning("Error leyendo la cola de trabajos: %s", e)
+                worked = False
+            if not worked:
+                self._stop_event.wait(self.poll_interval)
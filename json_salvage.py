@@ -0,0 +1,94 @@
+"""
+Lectura tolerante del JSON de las tandas de preguntas.
+
+Gemini a veces devuelve el JSON cortado (se quedó sin tokens), envuelto en un
+bloque ```json o con texto antes o después. `json.loads` falla con todo eso y
+se perdía la respuesta entera. Acá se recorre el texto buscando cada objeto
+`{...}` que sí se pueda leer completo, con `JSONDecoder.raw_decode`: si el
+objeto de afuera está cortado se sigue con los de adentro, así se rescatan las
+tandas y preguntas que llegaron enteras.
+"""
+import json
+import re
+
+_decoder = json.JSONDecoder()
+
+
+def iter_objects(text: str):
+    """Objetos JSON completos del texto, como (posición, dict), sin meterse en los ya leídos."""
+    start = text.find("{")
+    while start != -1:
+        try:
+            value, end = _decoder.raw_decode(text, start)
+        except json.JSONDecodeError:
+            # Cortado o mal formado: probamos con el próximo objeto, que puede estar adentro
+            start = text.find("{", start + 1)
+            continue
+        if isinstance(value, dict):
+            yield start, value
+        start = text.find("{", end)
+
+
+def _is_question(value) -> bool:
+    return isinstance(value, dict) and "question" in value
+
+
+def salvage_questions(text: str) -> list:
+    """Preguntas completas (dicts crudos, sin validar) de una respuesta de una sola tanda."""
+    questions = []
+    for _, value in iter_objects(text or ""):
+        if isinstance(value.get("questions"), list):
+            questions.extend(q for q in value["questions"] if _is_question(q))
+        elif _is_question(value):
+            questions.append(value)
+    return questions
+
+
+def salvage_sets(text: str, levels) -> dict:
+    """Tandas de una respuesta en lote: {nivel: [listas de preguntas crudas]}.
+
+    El nivel de cada tanda es la última clave `"<nivel>":` que aparece antes de
+    ella. Las preguntas sueltas seguidas (de una tanda cortada) forman una tanda
+    incompleta.
+    """
+    text = text or ""
+    marks = [
+        (match.start(), match.group(1))
+        for match in re.finditer(r'"(%s)"\s*:' % "|".join(map(re.escape, levels)), text)
+    ]
+
+    def level_at(position):
+        level = None
+        for mark, name in marks:
+            if mark > position:
+                break
+            level = name
+        return level
+
+    sets = {level: [] for level in levels}
+    loose = None
+    for position, value in iter_objects(text):
+        by_level = value.get("levels") if isinstance(value.get("levels"), dict) else value
+        if any(isinstance(by_level.get(level), list) for level in sets):
+            # Llegó entero el payload (con texto alrededor) o al menos su "levels"
+            for level, raw_sets in by_level.items():
+                if level in sets and isinstance(raw_sets, list):
+                    sets[level].extend(
+                        [q for q in raw_set.get("questions", []) if _is_question(q)]
+                        for raw_set in raw_sets if isinstance(raw_set, dict)
+                        and isinstance(raw_set.get("questions"), list)
+                    )
+            loose = None
+            continue
+        level = level_at(position)
+        if level is None:
+            continue
+        if isinstance(value.get("questions"), list):
+            sets[level].append([q for q in value["questions"] if _is_question(q)])
+            loose = None
+        elif _is_question(value):
+            if loose is None or loose[0] != level:
+                loose = (level, [])
+                sets[level].append(loose[1])
+            loose[1].append(value)
+    return sets
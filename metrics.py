@@ -0,0 +1,171 @@
+"""
+Métricas en formato de texto de Prometheus, sumadas entre workers de Gunicorn.
+
+Cada worker acumula contadores e histogramas en memoria (un lock y un dict:
+casi gratis en el camino caliente) y cada `flush_interval` segundos los suma
+en una tabla SQLite compartida. /metrics vuelca lo pendiente del worker que
+atiende el scrape y lee el total de la tabla, así Prometheus ve la suma de
+todos los workers sin importar cuál responda.
+"""
+import atexit
+import bisect
+import logging
+import os
+import threading
+import time
+
+from storage import connect
+
+# Segundos: cubre desde una página cacheada hasta un timeout de Gemini
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+COUNTER = "counter"
+HISTOGRAM = "histogram"
+GAUGE = "gauge"
+
+logger = logging.getLogger(__name__)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_labels(labels) -> str:
+    return ",".join(f'{key}="{_escape(value)}"' for key, value in labels)
+
+
+def _format_le(bound: float) -> str:
+    return "+Inf" if bound == float("inf") else repr(bound)
+
+
+def _format_value(value) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Metrics:
+    def __init__(self, path: str, buckets=DEFAULT_BUCKETS, flush_interval: float = 5.0):
+        self.path = path
+        self.buckets = tuple(buckets) + (float("inf"),)
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._help = {}
+        self._reset_pending()
+        connect(path).execute(
+            """
+            CREATE TABLE IF NOT EXISTS metrics (
+                family TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                labels TEXT NOT NULL,
+                suffix TEXT NOT NULL,
+                le TEXT NOT NULL,
+                value REAL NOT NULL,
+                PRIMARY KEY (family, labels, suffix, le)
+            )
+            """
+        )
+        atexit.register(self.flush)
+
+    def describe(self, family: str, help_text: str) -> None:
+        self._help[family] = help_text
+
+    def inc(self, family: str, amount: float = 1, **labels) -> None:
+        key = (family, tuple(sorted(labels.items())))
+        with self._lock:
+            self._check_pid()
+            self._counters[key] = self._counters.get(key, 0) + amount
+        self._maybe_flush()
+
+    def observe(self, family: str, value: float, **labels) -> None:
+        key = (family, tuple(sorted(labels.items())))
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._check_pid()
+            series = self._histograms.get(key)
+            if series is None:
+                series = self._histograms[key] = [[0] * len(self.buckets), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+        self._maybe_flush()
+
+    def flush(self) -> None:
+        """Suma en SQLite lo acumulado en este worker desde el último flush."""
+        with self._lock:
+            self._check_pid()
+            counters, histograms = self._counters, self._histograms
+            self._reset_pending()
+        rows = [
+            (family, COUNTER, format_labels(labels), "", "", value)
+            for (family, labels), value in counters.items()
+        ]
+        for (family, labels), (buckets, total, count) in histograms.items():
+            text = format_labels(labels)
+            rows.extend(
+                (family, HISTOGRAM, text, "bucket", _format_le(bound), n)
+                for bound, n in zip(self.buckets, buckets) if n
+            )
+            rows.append((family, HISTOGRAM, text, "sum", "", total))
+            rows.append((family, HISTOGRAM, text, "count", "", count))
+        if rows:
+            connect(self.path).executemany(
+                "INSERT INTO metrics (family, kind, labels, suffix, le, value) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(family, labels, suffix, le) DO UPDATE SET value = value + excluded.value",
+                rows,
+            )
+
+    def render(self, extra=()) -> str:
+        """Texto para Prometheus; `extra` son (familia, tipo, etiquetas, valor) calculados al vuelo."""
+        self.flush()
+        rows = connect(self.path).execute(
+            "SELECT family, kind, labels, suffix, le, value FROM metrics ORDER BY family, labels"
+        ).fetchall()
+
+        families = {}
+        for family, kind, labels, suffix, le, value in rows:
+            families.setdefault((family, kind), {}).setdefault(labels, []).append((suffix, le, value))
+        for family, kind, labels, value in extra:
+            families.setdefault((family, kind), {})[format_labels(labels)] = [("", "", value)]
+
+        lines = []
+        for (family, kind), series in sorted(families.items()):
+            if family in self._help:
+                lines.append(f"# HELP {family} {self._help[family]}")
+            lines.append(f"# TYPE {family} {kind}")
+            for labels, samples in series.items():
+                if kind == HISTOGRAM:
+                    lines.extend(self._histogram_lines(family, labels, samples))
+                else:
+                    value = _format_value(samples[0][2])
+                    lines.append(f"{family}{{{labels}}} {value}" if labels else f"{family} {value}")
+        return "\n".join(lines) + "\n"
+
+    def _histogram_lines(self, family: str, labels: str, samples) -> list:
+        prefix = labels + "," if labels else ""
+        braces = f"{{{labels}}}" if labels else ""
+        counts = {le: value for suffix, le, value in samples if suffix == "bucket"}
+        lines, cumulative = [], 0
+        for bound in self.buckets:
+            cumulative += counts.get(_format_le(bound), 0)
+            lines.append(f'{family}_bucket{{{prefix}le="{_format_le(bound)}"}} {_format_value(cumulative)}')
+        for suffix, _, value in samples:
+            if suffix in ("sum", "count"):
+                lines.append(f"{family}_{suffix}{braces} {_format_value(value)}")
+        return lines
+
+    def _reset_pending(self) -> None:
+        self._counters = {}
+        self._histograms = {}
+        self._pid = os.getpid()
+        self._last_flush = time.monotonic()
+
+    def _check_pid(self) -> None:
+        if self._pid != os.getpid():
+            # Lo heredado del proceso padre ya lo cuenta el padre
+            self._reset_pending()
+
+    def _maybe_flush(self) -> None:
+        if time.monotonic() - self._last_flush >= self.flush_interval:
+            try:
+                self.flush()
+            except Exception as e:
+                logger.warning("No se pudieron guardar las métricas: %s", e)
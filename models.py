@@ -0,0 +1,248 @@
+"""
+Registro de clientes de modelos de lenguaje, uno por modelo y por proceso.
+
+El SDK de Gemini se importa y se configura recién cuando hace falta el primer
+cliente, así importar la app (workers de Gunicorn, tests, comandos `flask`) no
+paga ese costo ni exige la API key. Los clientes se reutilizan entre peticiones
+y se descartan después de un fork: cada worker arma los suyos.
+
+Con el backend "stub" no se llama a ninguna API: sirve para desarrollo local,
+para los tests y para el benchmark (latencia, errores y JSON roto configurables).
+Otros backends se agregan con `register_backend(nombre, fábrica)`, donde la
+fábrica recibe (nombre del modelo, opciones) y devuelve un objeto con
+`generate_content(prompt, stream=False, request_options=None)` y, para el modo
+asíncrono, `generate_content_async(prompt, stream=False, request_options=None)` (con
+`stream=True` devuelve algo que se recorre con `async for`).
+"""
+import asyncio
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+
+_genai_lock = threading.Lock()
+_genai = None
+
+
+def _configured_genai(api_key: str):
+    """Importa y configura google.generativeai una sola vez por proceso."""
+    global _genai
+    with _genai_lock:
+        if _genai is None:
+            if not api_key:
+                raise ValueError(
+                    "GEMINI_API_KEY no está configurada. Por favor, crea un archivo .env con tu API key."
+                )
+            import google.generativeai as genai
+
+            genai.configure(api_key=api_key)
+            _genai = genai
+        return _genai
+
+
+class StubResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class StubError(Exception):
+    """Error simulado por el backend local."""
+
+
+def parse_latency(spec: str):
+    """Convierte "0.2", "uniform:0.1,0.5" o "lognormal:mediana,sigma" en un sorteo de segundos."""
+    kind, _, args = (spec or "0").partition(":")
+    if not args:
+        seconds = float(kind)
+        return lambda rng: seconds
+    params = [float(x) for x in args.split(",")]
+    if kind == "uniform":
+        return lambda rng: rng.uniform(*params)
+    if kind == "lognormal":
+        median, sigma = params
+        return lambda rng: rng.lognormvariate(math.log(median), sigma)
+    raise ValueError(f"Distribución de latencia desconocida: {spec}")
+
+
+class StubModel:
+    """Modelo local con el formato de respuesta que espera la app.
+
+    Es determinístico para una misma semilla y secuencia de llamadas. Puede
+    simular latencia, errores, timeouts (si la latencia supera el timeout de
+    la llamada) y respuestas JSON rotas o envueltas en bloques Markdown.
+    """
+
+    def __init__(self, model_name: str, latency: str = "0", error_rate: float = 0.0,
+                 malformed_rate: float = 0.0, fenced_rate: float = 0.0, seed: int = 0):
+        self.model_name = model_name
+        self.latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.malformed_rate = malformed_rate
+        self.fenced_rate = fenced_rate
+        self._rng = random.Random(f"{seed}:{model_name}")
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt, stream=False, request_options=None):
+        rng, delay, timeout = self._draw(request_options)
+        if timeout is not None and delay > timeout:
+            time.sleep(timeout)
+            raise TimeoutError(f"{self.model_name}: sin respuesta en {timeout:.1f} s")
+        failed, text = self._result(prompt, rng)
+
+        if stream:
+            return self._stream(text, delay, failed)
+        time.sleep(delay)
+        if failed:
+            raise StubError(f"{self.model_name}: error simulado")
+        return StubResponse(text)
+
+    async def generate_content_async(self, prompt, stream=False, request_options=None):
+        # Mismos sorteos que generate_content, pero la espera no bloquea el hilo
+        rng, delay, timeout = self._draw(request_options)
+        if timeout is not None and delay > timeout:
+            await asyncio.sleep(timeout)
+            raise TimeoutError(f"{self.model_name}: sin respuesta en {timeout:.1f} s")
+        failed, text = self._result(prompt, rng)
+        if stream:
+            return self._stream_async(text, delay, failed)
+        await asyncio.sleep(delay)
+        if failed:
+            raise StubError(f"{self.model_name}: error simulado")
+        return StubResponse(text)
+
+    def _draw(self, request_options):
+        with self._lock:
+            rng = random.Random(self._rng.random())
+        return rng, self.latency(rng), (request_options or {}).get("timeout")
+
+    def _result(self, prompt: str, rng: random.Random):
+        failed = rng.random() < self.error_rate
+        if '"questions"' in prompt:
+            return failed, self._quiz(prompt, rng)
+        return failed, self._answer(prompt)
+
+    def _stream(self, text: str, delay: float, failed: bool):
+        chunks = [chunk for chunk in re.split(r"(?=<h3>)", text) if chunk]
+        for chunk in chunks:
+            time.sleep(delay / len(chunks))
+            if failed:
+                raise StubError(f"{self.model_name}: error simulado")
+            yield StubResponse(chunk)
+
+    async def _stream_async(self, text: str, delay: float, failed: bool):
+        chunks = [chunk for chunk in re.split(r"(?=<h3>)", text) if chunk]
+        for chunk in chunks:
+            await asyncio.sleep(delay / len(chunks))
+            if failed:
+                raise StubError(f"{self.model_name}: error simulado")
+            yield StubResponse(chunk)
+
+    def _answer(self, prompt: str) -> str:
+        duda = prompt.rsplit("Duda del alumno:", 1)[-1].strip() or "tu pregunta"
+        return (
+            f"<h3>1) Respuesta para la carpeta:</h3><p>Respuesta de prueba sobre: {duda}</p>"
+            "<h3>2) Explicación simple:</h3><p>Una explicación simple de prueba.</p>"
+            "<h3>3) Ejemplos cotidianos:</h3><ul><li>Un ejemplo de prueba.</li></ul>"
+            "<h3>4) Desafío para practicar:</h3><p>Un desafío de prueba.</p>"
+        )
+
+    def _quiz(self, prompt: str, rng: random.Random) -> str:
+        subject = re.search(r'"subject": "([^"]*)"', prompt)
+        subject = subject.group(1) if subject else ""
+        levels = re.findall(r'^- "(\w+)": (\d+) tanda', prompt, re.MULTILINE)
+        if not levels:
+            count = re.search(r"Creá (\d+) preguntas", prompt)
+            payload = {"subject": subject, "questions": self._questions(rng, int(count.group(1)) if count else 10)}
+        else:
+            payload = {
+                "subject": subject,
+                "levels": {
+                    level: [{"questions": self._questions(rng)} for _ in range(int(n))]
+                    for level, n in levels
+                },
+            }
+        text = json.dumps(payload, ensure_ascii=False)
+        if rng.random() < self.malformed_rate:
+            # Respuesta cortada a la mitad, como cuando el modelo se queda sin tokens
+            text = text[: len(text) // 2]
+        if rng.random() < self.fenced_rate:
+            text = f"```json\n{text}\n```"
+        return text
+
+    @staticmethod
+    def _questions(rng: random.Random, n: int = 10) -> list:
+        questions = []
+        for _ in range(n):
+            a, b = rng.randint(1, 500), rng.randint(1, 500)
+            options = [str(a + b + delta) for delta in (0, 1, -1, 10)]
+            rng.shuffle(options)
+            questions.append({
+                "question": f"¿Cuánto es {a} + {b}?",
+                "options": options,
+                "correct": str(a + b),
+                "tip": "Sumá primero las unidades.",
+            })
+        return questions
+
+
+def _gemini_backend(name: str, options: dict):
+    return _configured_genai(options.get("api_key")).GenerativeModel(name)
+
+
+def _stub_backend(name: str, options: dict):
+    return StubModel(name, **options.get("stub", {}))
+
+
+BACKENDS = {
+    "gemini": _gemini_backend,
+    "stub": _stub_backend,
+}
+
+
+def register_backend(name: str, factory) -> None:
+    BACKENDS[name] = factory
+
+
+class ModelRegistry:
+    def __init__(self, backend: str = "gemini", api_key: str = None, stub_options: dict = None):
+        if backend not in BACKENDS:
+            raise ValueError(f"Backend de modelos desconocido: {backend}")
+        self.backend = backend
+        self.options = {"api_key": api_key, "stub": stub_options or {}}
+        self._lock = threading.Lock()
+        self._clients = {}
+        self._pid = os.getpid()
+
+    def get(self, name: str):
+        """Devuelve el cliente del modelo, creándolo la primera vez en este proceso."""
+        clients = self._process_clients()
+        client = clients.get(name)
+        if client is None:
+            with self._lock:
+                client = clients.get(name)
+                if client is None:
+                    client = clients[name] = self._build(name)
+        return client
+
+    def register(self, name: str, client) -> None:
+        """Usa un cliente ya armado (por ejemplo, un modelo falso en los tests)."""
+        with self._lock:
+            self._process_clients()[name] = client
+
+    def warm(self, names) -> None:
+        """Crea de antemano los clientes, para no hacerlo en la primera petición."""
+        for name in names:
+            self.get(name)
+
+    def _process_clients(self) -> dict:
+        if self._pid != os.getpid():
+            # Los clientes heredados del proceso padre no son seguros después del fork
+            self._clients = {}
+            self._pid = os.getpid()
+        return self._clients
+
+    def _build(self, name: str):
+        return BACKENDS[self.backend](name, self.options)
@@ -0,0 +1,83 @@
+"""
+Caché de páginas ya renderizadas, con ETag fuerte.
+
+Para páginas cuyo HTML depende solo de los templates y de datos que cambian
+poco (la página de inicio), se renderiza una vez por worker y se guarda el
+cuerpo junto con un ETag (hash del contenido). Las visitas siguientes no pasan
+por Jinja y, si el navegador manda `If-None-Match` con el mismo ETag, se
+responde 304 sin cuerpo.
+
+`version()` resume de qué depende lo cacheado (por ejemplo, fechas de
+modificación de los templates); se consulta a lo sumo cada `check_interval`
+segundos y, si cambió, se descarta todo lo guardado.
+"""
+import hashlib
+import os
+import threading
+import time
+
+
+def _stat(path: str) -> str:
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return f"{path}:-"
+    return f"{path}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def files_version(*paths) -> str:
+    """Resumen de tamaños y fechas de modificación de archivos o de todo lo que hay en carpetas."""
+    parts = []
+    for path in paths:
+        if not os.path.isdir(path):
+            parts.append(_stat(path))
+            continue
+        for root, dirs, names in os.walk(path):
+            dirs.sort()
+            parts.extend(_stat(os.path.join(root, name)) for name in sorted(names))
+    return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+
+
+class PageCache:
+    def __init__(self, version, check_interval: float = 1.0, on_invalidate=None):
+        self.version = version
+        self.check_interval = check_interval
+        self.on_invalidate = on_invalidate
+        self._lock = threading.Lock()
+        self._pages = {}
+        self._version = version()
+        self._checked_at = time.monotonic()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, render):
+        """Devuelve (cuerpo en bytes, etag) de la página `key`, renderizándola con `render()` si hace falta."""
+        self._check_version()
+        page = self._pages.get(key)
+        if page is not None:
+            self.hits += 1
+            return page
+        self.misses += 1
+        body = render()
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        page = (body, hashlib.sha256(body).hexdigest()[:32])
+        with self._lock:
+            self._pages[key] = page
+        return page
+
+    def clear(self) -> None:
+        with self._lock:
+            self._pages = {}
+
+    def _check_version(self) -> None:
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+        version = self.version()
+        if version != self._version:
+            self._version = version
+            if self.on_invalidate is not None:
+                self.on_invalidate()
+            self.clear()
@@ -0,0 +1,122 @@
+"""
+Profiler por muestreo para unas pocas peticiones a pedido.
+
+Un admin arma el profiler para las próximas N peticiones (el cupo vive en
+SQLite, así lo respetan todos los workers). Mientras haya peticiones
+perfiladas, un hilo toma la pila de sus hilos cada `interval` segundos con
+`sys._current_frames()` y, al terminar cada petición, guarda las pilas en
+formato "collapsed" (una línea `f1;f2;f3 muestras`), listo para flamegraph.pl
+o speedscope. Sin peticiones perfiladas el hilo no corre y el costo es nulo.
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+from storage import connect
+
+
+def collapse(frame) -> str:
+    """Convierte una pila en `raíz;...;hoja` con `función (archivo:línea)` por frame."""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+def write_folded(path: str, samples: Counter) -> None:
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        for stack, count in samples.most_common():
+            f.write(f"{stack} {count}\n")
+
+
+class SamplingProfiler:
+    """Muestrea las pilas de los hilos registrados con `start()` hasta su `stop()`."""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._targets = {}
+        self._thread = None
+
+    def start(self, thread_id: int = None) -> None:
+        thread_id = thread_id or threading.get_ident()
+        with self._lock:
+            self._targets[thread_id] = Counter()
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+                self._thread.start()
+
+    def stop(self, thread_id: int = None) -> Counter:
+        thread_id = thread_id or threading.get_ident()
+        with self._lock:
+            return self._targets.pop(thread_id, Counter())
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while True:
+            with self._lock:
+                if not self._targets:
+                    self._thread = None
+                    return
+                frames = sys._current_frames()
+                for thread_id, samples in self._targets.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None and thread_id != own:
+                        samples[collapse(frame)] += 1
+            del frames
+            time.sleep(self.interval)
+
+
+class ProfileBudget:
+    """Cupo compartido de peticiones a perfilar.
+
+    Cada worker consulta SQLite a lo sumo una vez cada `check_interval` segundos
+    mientras el profiler está desarmado, así el camino caliente no escribe nada.
+    """
+
+    def __init__(self, path: str, check_interval: float = 1.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._checked_at = 0.0
+        self._armed = False
+        connect(path).execute(
+            "CREATE TABLE IF NOT EXISTS profile_budget ("
+            " id INTEGER PRIMARY KEY CHECK (id = 1), remaining INTEGER NOT NULL, armed_at REAL)"
+        )
+
+    def arm(self, requests: int) -> None:
+        connect(self.path).execute(
+            "INSERT INTO profile_budget (id, remaining, armed_at) VALUES (1, ?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET remaining = excluded.remaining, armed_at = excluded.armed_at",
+            (requests, time.time()),
+        )
+        self._armed = requests > 0
+
+    def remaining(self) -> int:
+        row = connect(self.path).execute("SELECT remaining FROM profile_budget WHERE id = 1").fetchone()
+        return row[0] if row else 0
+
+    def claim(self) -> bool:
+        """True si esta petición entra en el cupo (y lo descuenta)."""
+        now = time.monotonic()
+        if not self._armed:
+            if now - self._checked_at < self.check_interval:
+                return False
+            self._checked_at = now
+            self._armed = self.remaining() > 0
+            if not self._armed:
+                return False
+        row = connect(self.path).execute(
+            "UPDATE profile_budget SET remaining = remaining - 1 WHERE id = 1 AND remaining > 0 "
+            "RETURNING remaining"
+        ).fetchone()
+        if row is None or row[0] == 0:
+            self._armed = False
+        return row is not None
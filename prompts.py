@@ -0,0 +1,151 @@
+"""
+Variantes de prompt con nombre y versión, reparto de tráfico entre ellas y un
+banco de pruebas offline para compararlas antes de usarlas.
+
+Cada ruta ("tutor", "quiz", "quiz_batch") tiene una o más variantes
+(`completo@1`, `compacto@1`...). Una variante es un template de `str.format`
+que no se modifica: para cambiar un prompt se registra una versión nueva, así
+las métricas de cada versión no se mezclan.
+
+El reparto se configura con un texto como
+"tutor=completo@1:90,compacto@1:10;quiz=compacto@1": porcentajes por ruta
+(sin porcentaje, 100). Con una `key` (la duda normalizada) la elección es
+determinística: la misma duda va siempre a la misma variante en todos los
+workers.
+"""
+import hashlib
+import random
+import time
+from functools import lru_cache
+
+
+def estimate_tokens(text: str) -> int:
+    """Tokens aproximados (~4 caracteres por token) cuando el modelo no informa el uso."""
+    return max(1, round(len(text or "") / 4))
+
+
+def usage_tokens(response, prompt: str, text: str):
+    """(tokens de entrada, tokens de salida): los que informa el modelo o una estimación."""
+    usage = getattr(response, "usage_metadata", None)
+    input_tokens = getattr(usage, "prompt_token_count", None)
+    output_tokens = getattr(usage, "candidates_token_count", None)
+    return (
+        input_tokens if input_tokens is not None else estimate_tokens(prompt),
+        output_tokens if output_tokens is not None else estimate_tokens(text),
+    )
+
+
+class PromptVariant:
+    def __init__(self, route: str, name: str, version: int, template: str, description: str = ""):
+        self.route = route
+        self.name = name
+        self.version = version
+        self.template = template
+        self.description = description
+        self.id = f"{name}@{version}"
+
+    def build(self, **values) -> str:
+        return self.template.format(**values)
+
+    def __repr__(self) -> str:
+        return f"<PromptVariant {self.route}/{self.id}>"
+
+
+@lru_cache(maxsize=16)
+def parse_split(spec: str) -> dict:
+    """"tutor=completo@1:90,compacto@1:10;quiz=compacto@1" -> {ruta: {variante: peso}}."""
+    split = {}
+    for part in (spec or "").split(";"):
+        route, _, variants = part.partition("=")
+        if not route.strip() or not variants.strip():
+            continue
+        weights = split.setdefault(route.strip(), {})
+        for item in variants.split(","):
+            variant_id, _, weight = item.strip().partition(":")
+            if variant_id:
+                weights[variant_id] = float(weight) if weight else 100.0
+    return split
+
+
+class PromptRegistry:
+    def __init__(self):
+        self._variants = {}
+
+    def register(self, route: str, name: str, version: int, template: str, description: str = "") -> PromptVariant:
+        variant = PromptVariant(route, name, version, template, description)
+        variants = self._variants.setdefault(route, {})
+        if variant.id in variants:
+            raise ValueError(f"La variante {route}/{variant.id} ya existe: registrá una versión nueva")
+        variants[variant.id] = variant
+        return variant
+
+    def get(self, route: str, variant_id: str) -> PromptVariant:
+        return self._variants[route][variant_id]
+
+    def variants(self, route: str) -> list:
+        return list(self._variants.get(route, {}).values())
+
+    def routes(self) -> list:
+        return list(self._variants)
+
+    def choose(self, route: str, split: dict = None, key: str = None) -> PromptVariant:
+        """Variante para una llamada según los pesos de `split` ({variante: peso}).
+
+        Sin reparto (o con variantes que no existen) usa la primera registrada.
+        """
+        variants = self._variants[route]
+        weights = [(variants[vid], w) for vid, w in (split or {}).items() if vid in variants and w > 0]
+        if not weights:
+            return next(iter(variants.values()))
+        if len(weights) == 1:
+            return weights[0][0]
+        total = sum(w for _, w in weights)
+        if key is None:
+            point = random.random() * total
+        else:
+            digest = hashlib.sha256(f"{route}:{key}".encode("utf-8")).digest()
+            point = int.from_bytes(digest[:8], "big") / 2 ** 64 * total
+        for variant, weight in weights:
+            point -= weight
+            if point < 0:
+                return variant
+        return weights[-1][0]
+
+
+def compare(variants, cases, generate, check) -> list:
+    """Corre cada caso contra cada variante y resume tamaño, tokens, latencia y parseo.
+
+    `cases` son dicts con los valores del template; `generate(prompt)` devuelve la
+    respuesta del modelo y `check(texto)` si se pudo leer. Devuelve una fila por variante.
+    """
+    rows = []
+    for variant in variants:
+        prompt_chars = input_tokens = output_tokens = parsed = errors = 0
+        seconds = 0.0
+        for values in cases:
+            prompt = variant.build(**values)
+            started = time.perf_counter()
+            try:
+                response = generate(prompt)
+            except Exception:
+                errors += 1
+                continue
+            seconds += time.perf_counter() - started
+            text = getattr(response, "text", "")
+            tokens_in, tokens_out = usage_tokens(response, prompt, text)
+            prompt_chars += len(prompt)
+            input_tokens += tokens_in
+            output_tokens += tokens_out
+            parsed += bool(check(text))
+        answered = len(cases) - errors
+        rows.append({
+            "variant": variant.id,
+            "cases": len(cases),
+            "errors": errors,
+            "prompt_chars": round(prompt_chars / answered) if answered else 0,
+            "input_tokens": round(input_tokens / answered) if answered else 0,
+            "output_tokens": round(output_tokens / answered) if answered else 0,
+            "ms": round(seconds * 1000 / answered, 1) if answered else 0.0,
+            "parse_rate": parsed / answered if answered else 0.0,
+        })
+    return rows
@@ -0,0 +1,103 @@
+"""
+Banco de preguntas en disco, indexado por (materia, nivel).
+
+Reemplaza al viejo diccionario FALLBACK_TESTS de app.py: arranca con las
+preguntas de `data/question_bank.json` y crece con cada pregunta válida que
+genera Gemini (sin duplicados, por hash de la pregunta normalizada). /test saca
+de acá 10 preguntas al azar cuando el pool de tandas está vacío.
+"""
+import hashlib
+import json
+import time
+
+from answer_cache import normalize_question
+from storage import connect
+
+
+def question_hash(question: str) -> str:
+    return hashlib.sha256(normalize_question(question).encode("utf-8")).hexdigest()[:32]
+
+
+def dump(data: dict, fp) -> None:
+    """Escribe {materia: {nivel: [preguntas]}} con una pregunta por línea."""
+    fp.write("{\n")
+    for i, (materia, niveles) in enumerate(data.items()):
+        fp.write(f"  {json.dumps(materia, ensure_ascii=False)}: {{\n")
+        for j, (nivel, preguntas) in enumerate(niveles.items()):
+            fp.write(f"    {json.dumps(nivel)}: [\n")
+            fp.write(",\n".join(
+                "      " + json.dumps(pregunta, ensure_ascii=False) for pregunta in preguntas
+            ))
+            fp.write("\n    ]" + ("," if j < len(niveles) - 1 else "") + "\n")
+        fp.write("  }" + ("," if i < len(data) - 1 else "") + "\n")
+    fp.write("}\n")
+
+
+class QuestionBank:
+    def __init__(self, path: str):
+        self.path = path
+        conn = connect(path)
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS bank (
+                id INTEGER PRIMARY KEY,
+                materia TEXT NOT NULL,
+                nivel TEXT NOT NULL,
+                hash TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                UNIQUE (materia, nivel, hash)
+            )
+            """
+        )
+
+    def add(self, materia: str, nivel: str, preguntas: list) -> int:
+        """Agrega preguntas ya validadas; devuelve cuántas eran nuevas."""
+        now = time.time()
+        conn = connect(self.path)
+        before = conn.total_changes
+        conn.executemany(
+            "INSERT OR IGNORE INTO bank (materia, nivel, hash, payload, created_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            [
+                (materia, nivel, question_hash(p["question"]),
+                 json.dumps(p, ensure_ascii=False), now)
+                for p in preguntas
+            ],
+        )
+        return conn.total_changes - before
+
+    def sample(self, materia: str, nivel: str, n: int) -> list:
+        """Hasta `n` preguntas distintas al azar, en una sola consulta por índice."""
+        rows = connect(self.path).execute(
+            "SELECT payload FROM bank WHERE materia = ? AND nivel = ? ORDER BY random() LIMIT ?",
+            (materia, nivel, n),
+        ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def count(self, materia: str = None, nivel: str = None) -> int:
+        sql, params = "SELECT count(*) FROM bank", []
+        if materia is not None:
+            sql += " WHERE materia = ?"
+            params.append(materia)
+            if nivel is not None:
+                sql += " AND nivel = ?"
+                params.append(nivel)
+        return connect(self.path).execute(sql, params).fetchone()[0]
+
+    def import_data(self, data: dict) -> int:
+        """Importa {materia: {nivel: [preguntas]}}; devuelve cuántas eran nuevas."""
+        return sum(
+            self.add(materia, nivel, preguntas)
+            for materia, niveles in data.items()
+            for nivel, preguntas in niveles.items()
+        )
+
+    def export_data(self) -> dict:
+        data = {}
+        rows = connect(self.path).execute(
+            "SELECT materia, nivel, payload FROM bank ORDER BY materia, nivel, id"
+        )
+        for materia, nivel, payload in rows:
+            data.setdefault(materia, {}).setdefault(nivel, []).append(json.loads(payload))
+        return data
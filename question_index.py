@@ -0,0 +1,197 @@
+"""
+Índice de similitud de preguntas (MinHash + LSH sobre n-gramas de caracteres).
+
+Permite reconocer que "¿Qué es una fracción?", "que es una fraccion" y
+"¿qué son las fracciones?" son la misma duda y reutilizar la respuesta ya
+generada. Las firmas y los buckets LSH se guardan en SQLite, así que el índice
+sobrevive a reinicios y lo comparten todos los workers.
+
+Las cuentas son la excepción: "25+17" y "25+18" se parecen mucho como texto
+pero tienen otra respuesta. Los operadores se conservan al normalizar y dos
+preguntas solo se consideran la misma si tienen exactamente los mismos números
+y operadores, en el mismo orden. Lo mismo con las palabras que dan vuelta el
+sentido ("no", "sin", "con", "nunca", "ni"...): "¿Qué animales no son
+mamíferos?" no es la misma duda que "¿Qué animales son mamíferos?".
+"""
+import hashlib
+import operator
+import re
+import struct
+import time
+import unicodedata
+from array import array
+
+from storage import connect
+
+NUM_PERM = 64
+# 8 bandas de 8 filas: el umbral efectivo de LSH queda cerca de (1/8)^(1/8) ≈ 0.77,
+# justo por debajo del umbral por defecto, y casi no aparecen candidatos falsos
+BANDS = 8
+ROWS = NUM_PERM // BANDS
+NGRAM = 3
+
+STOPWORDS = frozenset("""
+a al algo algun alguna algunas alguno algunos ante contra de del desde el ella ellas
+ellos en entre era eran es esa esas ese eso esos esta estan estas este esto estos fue
+fueron ha han hay la las le les lo los me mi mis muy nos o para pero por se ser
+sobre son su sus te tiene tienen tu tus un una unas uno unos y ya yo
+explicame explica decime dime sabes podrias puedes
+""".split())
+
+# Palabras que cambian el sentido de la pregunta: no son stopwords y tienen que coincidir
+POLARITY = frozenset("no ni nunca jamas tampoco sin con ningun ninguna ninguno nada".split())
+
+
+def _strip_accents(text: str) -> str:
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def _stem(word: str) -> str:
+    """Singulariza de forma muy simple (fracciones -> fraccion, luces -> luz)."""
+    if len(word) <= 4:
+        return word
+    if word.endswith("ces"):
+        return word[:-3] + "z"
+    if word.endswith("es") and word[-3] not in "aeiou":
+        return word[:-2]
+    if word.endswith("s") and word[-2] in "aeiou":
+        return word[:-1]
+    return word
+
+
+_OPERATORS = "+-*/=^%"
+_TOKENS = re.compile(r"[a-z0-9]+|[%s]" % re.escape(_OPERATORS))
+# Números y operadores; la "x" solo cuando no es parte de una palabra ("5 x 3", "25x17")
+_MATH = re.compile(r"\d+|[%s]|(?<![a-z])x(?![a-z])" % re.escape(_OPERATORS))
+
+
+def normalize(question: str) -> str:
+    """Quita tildes, mayúsculas, puntuación (salvo operadores) y stopwords del español."""
+    text = _strip_accents(question.casefold())
+    words = _TOKENS.findall(text)
+    return " ".join(_stem(w) for w in words if w not in STOPWORDS)
+
+
+def math_key(normalized: str) -> str:
+    """Números y operadores de la pregunta normalizada, en orden ("25+17")."""
+    return "".join(_MATH.findall(normalized))
+
+
+def polarity_key(normalized: str) -> str:
+    """Negaciones y "con"/"sin" de la pregunta normalizada, en orden ("no sin")."""
+    return " ".join(w for w in normalized.split() if w in POLARITY)
+
+
+def shingles(normalized: str) -> set:
+    padded = f" {normalized} "
+    if len(padded) <= NGRAM:
+        return {padded}
+    return {padded[i:i + NGRAM] for i in range(len(padded) - NGRAM + 1)}
+
+
+def signature(normalized: str) -> array:
+    """Firma MinHash de NUM_PERM valores de 32 bits.
+
+    Cada n-grama se expande con SHAKE-128 a NUM_PERM hashes independientes y la
+    firma es el mínimo por columna; así todo el trabajo pesado queda en C.
+    """
+    columns = [
+        array("I", hashlib.shake_128(s.encode("utf-8")).digest(NUM_PERM * 4))
+        for s in shingles(normalized)
+    ]
+    return array("I", map(min, zip(*columns)))
+
+
+def _band_keys(sig: array) -> list:
+    keys = []
+    for band in range(BANDS):
+        chunk = sig[band * ROWS:(band + 1) * ROWS].tobytes()
+        digest = hashlib.blake2b(chunk, digest_size=7, person=struct.pack("<I", band)).digest()
+        keys.append(int.from_bytes(digest, "big"))
+    return keys
+
+
+def similarity(sig_a: array, sig_b: array) -> float:
+    """Estimación de Jaccard: proporción de minhashes coincidentes."""
+    return sum(map(operator.eq, sig_a, sig_b)) / NUM_PERM
+
+
+class QuestionIndex:
+    def __init__(self, path: str, threshold: float = 0.8):
+        self.path = path
+        self.threshold = threshold
+        conn = connect(path)
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS questions (
+                id INTEGER PRIMARY KEY,
+                namespace TEXT NOT NULL,
+                normalized TEXT NOT NULL,
+                signature BLOB NOT NULL,
+                answer_key TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                UNIQUE (namespace, normalized)
+            )
+            """
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS buckets (key INTEGER NOT NULL, question_id INTEGER NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS buckets_key ON buckets (key)")
+
+    def add(self, question: str, answer_key: str, namespace: str = "") -> None:
+        normalized = normalize(question)
+        if not normalized:
+            return
+        sig = signature(normalized)
+        now = time.time()
+        conn = connect(self.path)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            cur = conn.execute(
+                "INSERT INTO questions (namespace, normalized, signature, answer_key, created_at) "
+                "VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (namespace, normalized) DO UPDATE SET answer_key = excluded.answer_key "
+                "RETURNING id, (created_at = ?)",
+                (namespace, normalized, sig.tobytes(), answer_key, now, now),
+            )
+            question_id, inserted = cur.fetchone()
+            if inserted:
+                conn.executemany(
+                    "INSERT INTO buckets (key, question_id) VALUES (?, ?)",
+                    [(key, question_id) for key in _band_keys(sig)],
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def lookup(self, question: str, namespace: str = ""):
+        """Devuelve (answer_key, similitud) de la pregunta más parecida o None."""
+        normalized = normalize(question)
+        if not normalized:
+            return None
+        sig = signature(normalized)
+        keys = _band_keys(sig)
+        conn = connect(self.path)
+        # CROSS JOIN fuerza a SQLite a partir de los buckets (pocas filas) y no de la tabla entera
+        rows = conn.execute(
+            "SELECT DISTINCT q.normalized, q.signature, q.answer_key FROM buckets b CROSS JOIN questions q"
+            f" ON q.id = b.question_id WHERE b.key IN ({','.join('?' * len(keys))}) AND q.namespace = ?",
+            (*keys, namespace),
+        ).fetchall()
+
+        best = None
+        numbers, polarity = math_key(normalized), polarity_key(normalized)
+        for other, blob, answer_key in rows:
+            if math_key(other) != numbers or polarity_key(other) != polarity:
+                # Otra cuenta, o la misma pregunta negada ("no son", "sin luz"): nunca es la misma duda
+                continue
+            score = similarity(sig, array("I", blob))
+            if score >= self.threshold and (best is None or score > best[1]):
+                best = (answer_key, score)
+        return best
+
+    def __len__(self) -> int:
+        return connect(self.path).execute("SELECT count(*) FROM questions").fetchone()[0]
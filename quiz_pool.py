@@ -0,0 +1,160 @@
+"""
+Pool de tests pre-generados por (materia, nivel).
+
+Un hilo en segundo plano mantiene cada combinación con al menos
+`low_water` tandas validadas de 10 preguntas, de modo que /test solo tenga
+que sacar una tanda lista de SQLite en lugar de esperar a Gemini. Solo un
+worker de Gunicorn a la vez rellena el pool (lock de archivo en DATA_DIR).
+"""
+import json
+import logging
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from storage import connect, try_lock
+
+QUESTIONS_PER_SET = 10
+
+logger = logging.getLogger(__name__)
+
+
+class QuizPool:
+    def __init__(self, path: str, max_age: int = 24 * 3600):
+        self.path = path
+        self.max_age = max_age
+        conn = connect(path)
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS quiz_sets (
+                id INTEGER PRIMARY KEY,
+                materia TEXT NOT NULL,
+                nivel TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                payload TEXT NOT NULL
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS quiz_sets_key ON quiz_sets (materia, nivel, id)")
+
+    def push(self, materia: str, nivel: str, preguntas: list) -> None:
+        connect(self.path).execute(
+            "INSERT INTO quiz_sets (materia, nivel, created_at, payload) VALUES (?, ?, ?, ?)",
+            (materia, nivel, time.time(), json.dumps(preguntas, ensure_ascii=False)),
+        )
+
+    def pop(self, materia: str, nivel: str):
+        """Saca la tanda más vieja que no esté vencida, o None si el pool está vacío."""
+        row = connect(self.path).execute(
+            "DELETE FROM quiz_sets WHERE id = ("
+            " SELECT id FROM quiz_sets WHERE materia = ? AND nivel = ? AND created_at >= ?"
+            " ORDER BY id LIMIT 1) RETURNING payload",
+            (materia, nivel, time.time() - self.max_age),
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def size(self, materia: str, nivel: str) -> int:
+        return connect(self.path).execute(
+            "SELECT count(*) FROM quiz_sets WHERE materia = ? AND nivel = ? AND created_at >= ?",
+            (materia, nivel, time.time() - self.max_age),
+        ).fetchone()[0]
+
+    def purge_stale(self) -> None:
+        connect(self.path).execute(
+            "DELETE FROM quiz_sets WHERE created_at < ?", (time.time() - self.max_age,)
+        )
+
+
+class PoolRefiller(threading.Thread):
+    """Hilo que repone el pool usando `generate(materia, nivel) -> list`.
+
+    Si se pasa `generate_batch(materia, {nivel: tandas}) -> {nivel: [tandas]}`,
+    pide juntas hasta `batch_sets` tandas de una misma materia en cada llamada.
+    """
+
+    def __init__(self, pool: QuizPool, generate, keys, lock_path: str,
+                 low_water: int = 3, refill_size: int = 2, concurrency: int = 2,
+                 interval: float = 30.0, generate_batch=None, batch_sets: int = 3):
+        super().__init__(name="quiz-pool-refiller", daemon=True)
+        self.pool = pool
+        self.generate = generate
+        self.keys = list(keys)
+        self.lock_path = lock_path
+        self.low_water = low_water
+        self.refill_size = refill_size
+        self.concurrency = concurrency
+        self.interval = interval
+        self.generate_batch = generate_batch
+        self.batch_sets = batch_sets
+        self._stop_event = threading.Event()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+    def run(self) -> None:
+        lock = None
+        while not self._stop_event.is_set():
+            if lock is None:
+                lock = try_lock(self.lock_path)
+            if lock is not None:
+                try:
+                    self.refill_once()
+                except Exception as e:
+                    logger.warning("Error reponiendo el pool de tests: %s", e)
+            self._stop_event.wait(self.interval)
+
+    def refill_once(self) -> int:
+        """Genera las tandas que falten hasta el low-water mark. Devuelve cuántas agregó."""
+        self.pool.purge_stale()
+        jobs = []
+        for materia, nivel in self.keys:
+            missing = self.low_water - self.pool.size(materia, nivel)
+            jobs.extend([(materia, nivel)] * max(0, min(missing, self.refill_size)))
+        if not jobs:
+            return 0
+        if self.generate_batch is not None:
+            return self._refill_batched(jobs)
+
+        added = 0
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            futures = [(key, executor.submit(self.generate, *key)) for key in jobs]
+            for (materia, nivel), future in futures:
+                try:
+                    preguntas = future.result()
+                except Exception as e:
+                    logger.warning("Error generando tanda %s/%s: %s", materia, nivel, e)
+                    continue
+                if len(preguntas) >= QUESTIONS_PER_SET:
+                    self.pool.push(materia, nivel, preguntas[:QUESTIONS_PER_SET])
+                    added += 1
+        return added
+
+    def _refill_batched(self, jobs) -> int:
+        added = 0
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            futures = [
+                (materia, executor.submit(self.generate_batch, materia, niveles))
+                for materia, niveles in self._plan_batches(jobs)
+            ]
+            for materia, future in futures:
+                try:
+                    batch = future.result()
+                except Exception as e:
+                    logger.warning("Error generando lote de %s: %s", materia, e)
+                    continue
+                for nivel, tandas in batch.items():
+                    for preguntas in tandas:
+                        if len(preguntas) >= QUESTIONS_PER_SET:
+                            self.pool.push(materia, nivel, preguntas[:QUESTIONS_PER_SET])
+                            added += 1
+        return added
+
+    def _plan_batches(self, jobs):
+        """Agrupa las tandas faltantes por materia, de a `batch_sets` por llamada."""
+        by_subject = {}
+        for materia, nivel in jobs:
+            by_subject.setdefault(materia, []).append(nivel)
+        for materia, niveles in by_subject.items():
+            for i in range(0, len(niveles), self.batch_sets):
+                yield materia, dict(Counter(niveles[i:i + self.batch_sets]))
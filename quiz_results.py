@@ -0,0 +1,189 @@
+"""
+Resultados de los tests y estadísticas de aciertos por pregunta y por (materia, nivel).
+
+El navegador manda, al terminar un test, si acertó o no cada pregunta.
+`record()` solo suma en memoria (un lock y un dict) y un hilo de fondo vuelca
+lo acumulado a SQLite cada `flush_interval` segundos, o antes si se juntan
+`max_pending` respuestas: la petición nunca espera al disco.
+
+En cada volcado se guardan las respuestas crudas (para analizarlas después) y
+se actualizan en la misma transacción los agregados: intentos y aciertos por
+(materia, nivel) y por pregunta. Las estadísticas se leen de esos agregados
+por clave primaria, sin recorrer las respuestas crudas.
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+
+from question_bank import question_hash
+from storage import connect
+
+logger = logging.getLogger(__name__)
+
+
+class QuizResults:
+    def __init__(self, path: str, flush_interval: float = 5.0, max_pending: int = 1000):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._reset_pending()
+        conn = connect(path)
+        conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS quiz_answers (
+                answered_at REAL NOT NULL,
+                materia TEXT NOT NULL,
+                nivel TEXT NOT NULL,
+                hash TEXT NOT NULL,
+                correct INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS quiz_level_stats (
+                materia TEXT NOT NULL,
+                nivel TEXT NOT NULL,
+                quizzes INTEGER NOT NULL,
+                answers INTEGER NOT NULL,
+                correct INTEGER NOT NULL,
+                PRIMARY KEY (materia, nivel)
+            );
+            CREATE TABLE IF NOT EXISTS quiz_question_stats (
+                materia TEXT NOT NULL,
+                nivel TEXT NOT NULL,
+                hash TEXT NOT NULL,
+                question TEXT NOT NULL,
+                answers INTEGER NOT NULL,
+                correct INTEGER NOT NULL,
+                accuracy REAL NOT NULL,
+                PRIMARY KEY (materia, nivel, hash)
+            );
+            CREATE INDEX IF NOT EXISTS quiz_question_accuracy
+                ON quiz_question_stats (materia, nivel, accuracy);
+            """
+        )
+        atexit.register(self.flush)
+
+    def record(self, materia: str, nivel: str, outcomes) -> int:
+        """Suma un test terminado; `outcomes` son pares (texto de la pregunta, acertó)."""
+        now = time.time()
+        outcomes = [(question, bool(correct)) for question, correct in outcomes]
+        with self._lock:
+            self._check_pid()
+            level = self._levels.setdefault((materia, nivel), [0, 0, 0])
+            level[0] += 1
+            for question, correct in outcomes:
+                key = (materia, nivel, question_hash(question))
+                entry = self._questions.setdefault(key, [question, 0, 0])
+                entry[1] += 1
+                entry[2] += correct
+                level[1] += 1
+                level[2] += correct
+                self._answers.append((now, materia, nivel, key[2], int(correct)))
+            pending = len(self._answers)
+        self._ensure_thread()
+        if pending >= self.max_pending:
+            self._wake.set()
+        return len(outcomes)
+
+    def flush(self) -> int:
+        """Vuelca a SQLite lo acumulado en este proceso. Devuelve cuántas respuestas escribió."""
+        with self._flush_lock:
+            with self._lock:
+                self._check_pid()
+                answers, levels, questions = self._answers, self._levels, self._questions
+                self._reset_pending()
+            if not answers and not levels:
+                return 0
+            conn = connect(self.path)
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                conn.executemany(
+                    "INSERT INTO quiz_answers (answered_at, materia, nivel, hash, correct) VALUES (?, ?, ?, ?, ?)",
+                    answers,
+                )
+                conn.executemany(
+                    "INSERT INTO quiz_level_stats (materia, nivel, quizzes, answers, correct) VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT(materia, nivel) DO UPDATE SET quizzes = quizzes + excluded.quizzes, "
+                    "answers = answers + excluded.answers, correct = correct + excluded.correct",
+                    [(materia, nivel, *totals) for (materia, nivel), totals in levels.items()],
+                )
+                conn.executemany(
+                    "INSERT INTO quiz_question_stats (materia, nivel, hash, question, answers, correct, accuracy) "
+                    "VALUES (?, ?, ?, ?, ?, ?, CAST(? AS REAL) / ?) "
+                    "ON CONFLICT(materia, nivel, hash) DO UPDATE SET "
+                    "answers = answers + excluded.answers, correct = correct + excluded.correct, "
+                    "accuracy = CAST(correct + excluded.correct AS REAL) / (answers + excluded.answers)",
+                    [
+                        (materia, nivel, qhash, question, n, ok, ok, n)
+                        for (materia, nivel, qhash), (question, n, ok) in questions.items()
+                    ],
+                )
+            return len(answers)
+
+    def level_stats(self, materia: str, nivel: str) -> dict:
+        row = connect(self.path).execute(
+            "SELECT quizzes, answers, correct FROM quiz_level_stats WHERE materia = ? AND nivel = ?",
+            (materia, nivel),
+        ).fetchone()
+        quizzes, answers, correct = row or (0, 0, 0)
+        return {
+            "quizzes": quizzes,
+            "answers": answers,
+            "correct": correct,
+            "accuracy": correct / answers if answers else None,
+        }
+
+    def question_stats(self, materia: str, nivel: str, question: str):
+        row = connect(self.path).execute(
+            "SELECT answers, correct, accuracy FROM quiz_question_stats "
+            "WHERE materia = ? AND nivel = ? AND hash = ?",
+            (materia, nivel, question_hash(question)),
+        ).fetchone()
+        if row is None:
+            return None
+        return {"answers": row[0], "correct": row[1], "accuracy": row[2]}
+
+    def hardest(self, materia: str, nivel: str, n: int = 10, min_answers: int = 5) -> list:
+        """Las `n` preguntas con menos aciertos (con al menos `min_answers` respuestas)."""
+        rows = connect(self.path).execute(
+            "SELECT question, answers, correct, accuracy FROM quiz_question_stats "
+            "WHERE materia = ? AND nivel = ? AND answers >= ? ORDER BY accuracy LIMIT ?",
+            (materia, nivel, min_answers, n),
+        )
+        return [
+            {"question": question, "answers": answers, "correct": correct, "accuracy": accuracy}
+            for question, answers, correct, accuracy in rows
+        ]
+
+    def _ensure_thread(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="quiz-results-flush", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.warning("No se pudieron guardar los resultados de los tests: %s", e)
+
+    def _reset_pending(self) -> None:
+        self._answers = []
+        self._levels = {}
+        self._questions = {}
+        self._pid = os.getpid()
+
+    def _check_pid(self) -> None:
+        if self._pid != os.getpid():
+            # Lo heredado del proceso padre lo vuelca el padre; el hilo no sobrevive al fork
+            self._reset_pending()
+            self._thread = None
@@ -0,0 +1,82 @@
+"""
+Token buckets compartidos entre workers para limitar clientes y llamadas a Gemini.
+
+Cada bucket tiene una capacidad (ráfaga máxima) y se recarga a `per_minute`
+fichas por minuto. El estado vive en SQLite y cada `take()` es un único UPSERT
+atómico: recarga según el tiempo transcurrido y descuenta una ficha solo si
+alcanza, así los 4 workers de Gunicorn ven el mismo bucket sin locks propios.
+
+Se usan para dos cosas: limitar a cada alumno (por sesión y por IP) y poner un
+presupuesto global de llamadas por minuto a cada modelo. Como hay una fila por
+sesión, cada `purge_every` llamadas se borran los buckets que no se tocan hace
+más de `max_idle` segundos (para entonces ya estarían llenos de nuevo).
+"""
+import time
+
+from circuit_breaker import CircuitOpenError
+from storage import connect
+
+
+class QuotaExceededError(CircuitOpenError):
+    """Se agotó el presupuesto de llamadas por minuto del modelo: no se llama a la API.
+
+    Hereda de CircuitOpenError para que los mismos caminos de respaldo (respuesta
+    vencida de la caché, banco de preguntas) cubran los dos casos.
+    """
+
+
+class TokenBuckets:
+    def __init__(self, path: str, max_idle: float = 3600, purge_every: int = 1000):
+        self.path = path
+        self.max_idle = max_idle
+        self.purge_every = purge_every
+        self._takes = 0
+        connect(path).execute(
+            """
+            CREATE TABLE IF NOT EXISTS token_buckets (
+                key TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                allowed INTEGER NOT NULL
+            )
+            """
+        )
+
+    def take(self, key: str, capacity: float, per_minute: float, now: float = None) -> bool:
+        """Descuenta una ficha del bucket `key` si hay; True si la petición puede pasar."""
+        now = time.time() if now is None else now
+        rate = per_minute / 60.0
+        self._takes += 1
+        if self._takes % self.purge_every == 0:
+            self.purge()
+        # En el SET las columnas valen lo que tenían antes del UPDATE
+        row = connect(self.path).execute(
+            """
+            INSERT INTO token_buckets (key, tokens, updated_at, allowed) VALUES (?1, ?2 - 1, ?3, ?2 >= 1)
+            ON CONFLICT(key) DO UPDATE SET
+                tokens = CASE WHEN MIN(?2, tokens + MAX(0, ?3 - updated_at) * ?4) >= 1
+                              THEN MIN(?2, tokens + MAX(0, ?3 - updated_at) * ?4) - 1
+                              ELSE MIN(?2, tokens + MAX(0, ?3 - updated_at) * ?4) END,
+                allowed = MIN(?2, tokens + MAX(0, ?3 - updated_at) * ?4) >= 1,
+                updated_at = MAX(updated_at, ?3)
+            RETURNING allowed
+            """,
+            (key, float(capacity), now, rate),
+        ).fetchone()
+        return bool(row[0])
+
+    def tokens(self, key: str, capacity: float, per_minute: float, now: float = None) -> float:
+        """Fichas disponibles ahora (sin descontar)."""
+        now = time.time() if now is None else now
+        row = connect(self.path).execute(
+            "SELECT tokens, updated_at FROM token_buckets WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return float(capacity)
+        return min(capacity, row[0] + max(0.0, now - row[1]) * per_minute / 60.0)
+
+    def purge(self) -> int:
+        """Borra los buckets sin uso (ya recargados del todo) para que la tabla no crezca."""
+        return connect(self.path).execute(
+            "DELETE FROM token_buckets WHERE updated_at < ?", (time.time() - self.max_idle,)
+        ).rowcount
@@ -0,0 +1,131 @@
+"""
+Ruteo de dudas entre un modelo rápido y uno más fuerte, con pedidos "hedged".
+
+Las preguntas cortas y simples ("¿Qué es una fracción?") van al modelo rápido;
+las largas, con varias preguntas, palabras que piden razonar o temas que
+suelen necesitar más explicación, al modelo fuerte. Si el modelo elegido no
+respondió cuando ya pasó su p95 de latencia observada, se lanza el mismo
+pedido al otro modelo y gana el primero que responda bien.
+"""
+import asyncio
+import re
+from concurrent.futures import FIRST_COMPLETED, TimeoutError as FuturesTimeout, wait
+
+from question_index import _strip_accents
+
+# Palabras que piden razonar, comparar o explicar procesos
+COMPLEX_KEYWORDS = (
+    "por qué", "porque", "cómo funciona", "diferencia", "compará", "comparar",
+    "explicá", "explicame", "relación", "causa", "consecuencia", "paso a paso",
+    "demostrá", "demostrar", "qué pasaría",
+)
+
+# Temas que suelen necesitar una explicación más cuidada, por materia
+SUBJECT_KEYWORDS = {
+    "Cs. Naturales": ("fotosíntesis", "célula", "ecosistema", "energía", "digestión",
+                      "respiración", "sistema solar", "evaporación", "cadena alimentaria"),
+    "Cs. Sociales": ("revolución", "independencia", "constitución", "gobierno", "economía",
+                     "colonización", "democracia"),
+    "Matemática": ("ecuación", "proporción", "porcentaje", "fracciones equivalentes",
+                   "área", "perímetro", "problema"),
+}
+
+
+def _plain(text: str) -> str:
+    """Minúsculas, sin tildes ni puntuación y con espacios en los bordes."""
+    words = re.findall(r"[a-z0-9]+", _strip_accents(text.casefold()))
+    return " " + " ".join(words) + " "
+
+
+def _mentions(text: str, keywords) -> bool:
+    # Coincide al comienzo de palabra: "célula" encuentra también "células"
+    return any(" " + k in text for k in keywords)
+
+
+class ModelRouter:
+    """Elige el modelo para una duda con heurísticas baratas (sin llamar a ningún modelo)."""
+
+    def __init__(self, fast_model: str, strong_model: str, max_simple_words: int = 12,
+                 complex_keywords=COMPLEX_KEYWORDS, strong_subjects=tuple(SUBJECT_KEYWORDS)):
+        self.fast_model = fast_model
+        self.strong_model = strong_model
+        self.max_simple_words = max_simple_words
+        self.complex_keywords = tuple(_plain(k).strip() for k in complex_keywords)
+        self.subject_keywords = tuple(
+            _plain(k).strip() for subject in strong_subjects for k in SUBJECT_KEYWORDS.get(subject, ())
+        )
+
+    def choose(self, question: str):
+        """Devuelve (modelo, motivo) para la duda."""
+        text = _plain(question)
+        if question.count("?") > 1 or len(text.split()) > self.max_simple_words:
+            return self.strong_model, "length"
+        if _mentions(text, self.complex_keywords):
+            return self.strong_model, "keyword"
+        if _mentions(text, self.subject_keywords):
+            return self.strong_model, "subject"
+        return self.fast_model, "simple"
+
+    def alternate(self, model: str) -> str:
+        return self.fast_model if model == self.strong_model else self.strong_model
+
+
+def hedged(primary, secondary, delay: float, executor):
+    """Corre `primary()`; si no terminó en `delay` segundos, lanza también `secondary()`.
+
+    Gana el primero que responda sin error. Devuelve (resultado, ganador, hedge_enviado),
+    con ganador "primary" o "secondary". Si el primario falla antes del delay, el
+    error se propaga (el hedge es para la latencia, no un reintento).
+    """
+    first = executor.submit(primary)
+    try:
+        return first.result(timeout=delay), "primary", False
+    except FuturesTimeout:
+        pass
+    if secondary is None:
+        return first.result(), "primary", False
+
+    pending = {first: "primary", executor.submit(secondary): "secondary"}
+    error = None
+    while pending:
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            name = pending.pop(future)
+            try:
+                return future.result(), name, True
+            except Exception as e:
+                error = e
+    raise error
+
+
+def _retrieve(task) -> None:
+    # El perdedor sigue solo: su error (si lo hay) no se reporta como no leído
+    if not task.cancelled():
+        task.exception()
+
+
+async def hedged_async(primary, secondary, delay: float):
+    """`hedged` para el event loop: `primary` y `secondary` son funciones que devuelven corrutinas.
+
+    Ninguna espera ocupa un hilo. El perdedor no se cancela: termina en segundo
+    plano, como en la versión con hilos.
+    """
+    first = asyncio.ensure_future(primary())
+    first.add_done_callback(_retrieve)
+    done, _ = await asyncio.wait({first}, timeout=delay)
+    if done or secondary is None:
+        return await first, "primary", False
+
+    second = asyncio.ensure_future(secondary())
+    second.add_done_callback(_retrieve)
+    pending = {first: "primary", second: "secondary"}
+    error = None
+    while pending:
+        done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            name = pending.pop(task)
+            try:
+                return task.result(), name, True
+            except Exception as e:
+                error = e
+    raise error
@@ -0,0 +1,150 @@
+"""
+Single-flight: une llamadas idénticas que están en curso al mismo tiempo.
+
+Si veinte chicos piden la misma duda (o el mismo test) a la vez, solo la
+primera petición llama a Gemini; las demás esperan y comparten el resultado.
+Dentro de un worker se coordina con un Event; entre workers de Gunicorn con
+una tabla `inflight` en SQLite local, donde el líder deja el resultado.
+"""
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+from storage import Counters, connect
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self, path: str, result_ttl: float = 5.0, max_wait: float = 60.0,
+                 poll_interval: float = 0.05):
+        self.path = path
+        self.result_ttl = result_ttl
+        self.max_wait = max_wait
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._calls = {}
+        conn = connect(path)
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS inflight (key TEXT PRIMARY KEY, started_at REAL NOT NULL)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL, finished_at REAL NOT NULL)"
+        )
+        self.counters = Counters(path, table="singleflight_counters")
+
+    def do(self, key: str, fn):
+        """Ejecuta `fn()` una sola vez por clave entre todas las peticiones concurrentes."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.event.wait()
+            self.counters.incr("coalesced_local")
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = self._do_shared(key, fn)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+
+    def in_flight(self, key: str) -> bool:
+        row = connect(self.path).execute(
+            "SELECT 1 FROM inflight WHERE key = ? AND started_at >= ?",
+            (key, time.time() - self.max_wait),
+        ).fetchone()
+        return row is not None
+
+    @contextmanager
+    def leading(self, key: str):
+        """Reclama la clave para un líder que produce el resultado por su cuenta (p. ej. un stream).
+
+        Entrega una función `publish(valor)` para compartir el resultado, o None
+        si otra petición ya está generando esa clave.
+        """
+        if not self._claim(key):
+            yield None
+            return
+        self.counters.incr("leaders")
+        try:
+            yield lambda value: self._publish(key, value)
+        finally:
+            self._release(key)
+
+    def stats(self) -> dict:
+        return self.counters.snapshot()
+
+    def _do_shared(self, key: str, fn):
+        cached = self._recent_result(key, time.time() - self.result_ttl)
+        if cached is not None:
+            self.counters.incr("coalesced_remote")
+            return cached[0]
+
+        if self._claim(key):
+            self.counters.incr("leaders")
+            try:
+                value = fn()
+                self._publish(key, value)
+                return value
+            finally:
+                self._release(key)
+
+        # Otro worker está generando: esperamos su resultado
+        waited_since = time.time()
+        while time.time() - waited_since < self.max_wait:
+            time.sleep(self.poll_interval)
+            cached = self._recent_result(key, waited_since - self.result_ttl)
+            if cached is not None:
+                self.counters.incr("coalesced_remote")
+                return cached[0]
+            if not self.in_flight(key):
+                break
+
+        # El líder falló o tardó demasiado: lo hacemos nosotros
+        return fn()
+
+    def _claim(self, key: str) -> bool:
+        now = time.time()
+        cur = connect(self.path).execute(
+            "INSERT INTO inflight (key, started_at) VALUES (?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET started_at = excluded.started_at "
+            "WHERE inflight.started_at < ?",
+            (key, now, now - self.max_wait),
+        )
+        return cur.rowcount == 1
+
+    def _release(self, key: str) -> None:
+        connect(self.path).execute("DELETE FROM inflight WHERE key = ?", (key,))
+
+    def _publish(self, key: str, value) -> None:
+        conn = connect(self.path)
+        now = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO results (key, value, finished_at) VALUES (?, ?, ?)",
+            (key, json.dumps(value, ensure_ascii=False), now),
+        )
+        conn.execute("DELETE FROM results WHERE finished_at < ?", (now - self.result_ttl,))
+
+    def _recent_result(self, key: str, since: float):
+        row = connect(self.path).execute(
+            "SELECT value FROM results WHERE key = ? AND finished_at >= ?", (key, since)
+        ).fetchone()
+        return (json.loads(row[0]),) if row else None
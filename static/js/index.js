@@ -67,13 +67,25 @@ document.addEventListener('DOMContentLoaded', () => {
     });
   }
 
-  const quizDataElement = document.getElementById('quizData');
-  if (quizDataElement) {
-    const questions = JSON.parse(quizDataElement.textContent || '[]');
-    const total = questions.length;
+  const quizConfigElement = document.getElementById('quizConfig');
+  const quizArea = document.querySelector('.quiz-area');
+  if (quizConfigElement && quizArea) {
+    // La página es la misma para toda materia y nivel: se leen de la URL y las preguntas llegan de /api/quiz
+    const config = JSON.parse(quizConfigElement.textContent || '{}');
+    const materias = config.materias || [];
+    const niveles = config.niveles || {};
+    const levelKeys = Object.keys(niveles);
+    const params = new URLSearchParams(window.location.search);
+    let materia = materias.includes(params.get('materia')) ? params.get('materia') : 'Matemática';
+    let nivel = (params.get('nivel') || '').toLowerCase();
+    if (!(nivel in niveles)) nivel = 'facil';
+
+    let questions = [];
+    let total = 0;
     let currentIndex = 0;
     let score = 0;
     let answered = false;
+    let loading = false;
 
     const questionTitle = document.getElementById('questionTitle');
     const optionsContainer = document.getElementById('optionsContainer');
@@ -86,6 +98,90 @@ document.addEventListener('DOMContentLoaded', () => {
     const questionLabel = document.getElementById('questionLabel');
     const summarySection = document.getElementById('quizSummary');
     const summaryText = summarySection?.querySelector('.summary-text');
+    const materiaTitle = document.getElementById('quizMateria');
+    const nivelChip = document.getElementById('quizNivel');
+    const actionLinks = document.querySelectorAll('[data-quiz-action]');
+    let results = [];
+    let resultsSent = false;
+
+    const nextLevel = level => levelKeys[levelKeys.indexOf(level) + 1];
+    const quizUrl = (base, m, n) => `${base}?${new URLSearchParams({ materia: m, nivel: n })}`;
+
+    // Tandas pedidas de antemano mientras el alumno responde. Quedan en sessionStorage
+    // (así también sirven si recarga la página) y se usan una sola vez: cada tanda
+    // salió del pool y repetirla sería repetir preguntas.
+    const PREFETCH_TTL = 30 * 60 * 1000;
+    const pending = new Map();
+    const storageKey = (m, n) => `gatto:quiz:${m}:${n}`;
+
+    const fetchSet = (m, n) => fetch(quizUrl(quizArea.dataset.quizUrl, m, n), { headers: { Accept: 'application/json' } })
+      .then(response => {
+        if (!response.ok) throw new Error(`HTTP ${response.status}`);
+        return response.json();
+      })
+      .then(data => data.preguntas || []);
+
+    const takeStored = key => {
+      try {
+        const stored = JSON.parse(sessionStorage.getItem(key) || 'null');
+        sessionStorage.removeItem(key);
+        if (stored && Date.now() - stored.at < PREFETCH_TTL && stored.preguntas.length) return stored.preguntas;
+      } catch (e) { /* sessionStorage bloqueado o dato viejo: se pide de nuevo */ }
+      return null;
+    };
+
+    const prefetch = (m, n) => {
+      const key = storageKey(m, n);
+      if (!n || pending.has(key)) return;
+      try {
+        if (sessionStorage.getItem(key)) return;
+      } catch (e) { /* sin sessionStorage queda solo en memoria */ }
+      const request = fetchSet(m, n).catch(() => []);
+      pending.set(key, request);
+      request.then(preguntas => {
+        // Si ya se usó mientras llegaba, no se guarda (se repetiría)
+        if (pending.get(key) !== request || !preguntas.length) return;
+        try {
+          sessionStorage.setItem(key, JSON.stringify({ at: Date.now(), preguntas }));
+          pending.delete(key);
+        } catch (e) { /* queda en memoria */ }
+      });
+    };
+
+    const takeSet = (m, n) => {
+      const key = storageKey(m, n);
+      const request = pending.get(key);
+      pending.delete(key);
+      const stored = takeStored(key);
+      if (stored) return Promise.resolve(stored);
+      if (request) return request.then(preguntas => (preguntas.length ? preguntas : fetchSet(m, n)));
+      return fetchSet(m, n);
+    };
+
+    // Manda al servidor qué preguntas se acertaron (al terminar, al reiniciar o al salir a mitad del test).
+    // sendBeacon no demora la navegación y sobrevive al cierre de la página.
+    const sendResults = () => {
+      if (resultsSent || !results.length || !quizArea.dataset.resultsUrl) return;
+      resultsSent = true;
+      const body = JSON.stringify({ materia, nivel, answers: results });
+      const blob = new Blob([body], { type: 'application/json' });
+      if (!navigator.sendBeacon || !navigator.sendBeacon(quizArea.dataset.resultsUrl, blob)) {
+        fetch(quizArea.dataset.resultsUrl, { method: 'POST', body, keepalive: true,
+          headers: { 'Content-Type': 'application/json' } }).catch(() => {});
+      }
+    };
+    window.addEventListener('pagehide', sendResults);
+
+    const showError = () => {
+      questionTitle.textContent = 'No pudimos traer las preguntas 😿';
+      optionsContainer.innerHTML = '';
+      const retry = document.createElement('button');
+      retry.type = 'button';
+      retry.className = 'option-btn';
+      retry.textContent = 'Reintentar';
+      retry.addEventListener('click', () => loadQuiz(materia, nivel));
+      optionsContainer.appendChild(retry);
+    };
 
     const renderQuestion = () => {
       answered = false;
@@ -93,7 +189,10 @@ document.addEventListener('DOMContentLoaded', () => {
       nextButton.textContent = 'Siguiente pregunta';
       feedbackBox.classList.remove('show');
       const current = questions[currentIndex];
-      if (!current) return;
+      if (!current) {
+        showError();
+        return;
+      }
 
       questionLabel.textContent = `Pregunta ${currentIndex + 1}`;
       questionTitle.textContent = current.question;
@@ -112,6 +211,12 @@ document.addEventListener('DOMContentLoaded', () => {
           answered = true;
           const isCorrect = option === current.correct;
           if (isCorrect) score += 1;
+          results.push({ question: current.question, correct: isCorrect });
+
+          // Ya está respondiendo: se piden de antemano la tanda para reintentar y, desde
+          // la mitad, la del nivel siguiente
+          prefetch(materia, nivel);
+          if (currentIndex + 1 >= total / 2) prefetch(materia, nextLevel(nivel));
 
           Array.from(optionsContainer.children).forEach(btn => {
             const text = btn.textContent?.trim();
@@ -137,6 +242,58 @@ document.addEventListener('DOMContentLoaded', () => {
       });
     };
 
+    const startQuiz = (m, n, preguntas) => {
+      materia = m;
+      nivel = n;
+      questions = preguntas;
+      total = preguntas.length;
+      currentIndex = 0;
+      score = 0;
+      results = [];
+      resultsSent = false;
+
+      materiaTitle.textContent = materia;
+      nivelChip.textContent = niveles[nivel];
+      const pageUrl = quizUrl(window.location.pathname, materia, nivel);
+      window.history.replaceState(null, '', pageUrl);
+      actionLinks.forEach(link => {
+        const target = link.dataset.quizAction === 'next-level' ? nextLevel(nivel) : nivel;
+        link.style.display = target ? '' : 'none';
+        if (target) link.href = quizUrl(window.location.pathname, materia, target);
+      });
+
+      summarySection?.classList.add('hidden');
+      quizArea.style.display = '';
+      progressFill.style.width = '0%';
+      renderQuestion();
+    };
+
+    const loadQuiz = (m, n) => {
+      if (loading) return;
+      loading = true;
+      sendResults();
+      summarySection?.classList.add('hidden');
+      quizArea.style.display = '';
+      optionsContainer.innerHTML = '';
+      feedbackBox.classList.remove('show');
+      nextButton.disabled = true;
+      questionTitle.textContent = 'Preparando tu desafío...';
+      takeSet(m, n)
+        .catch(() => [])
+        .then(preguntas => {
+          loading = false;
+          startQuiz(m, n, preguntas);
+        });
+    };
+
+    actionLinks.forEach(link => {
+      link.addEventListener('click', event => {
+        event.preventDefault();
+        const target = link.dataset.quizAction === 'next-level' ? nextLevel(nivel) : nivel;
+        if (target) loadQuiz(materia, target);
+      });
+    });
+
     nextButton?.addEventListener('click', () => {
       if (!answered) return;
       currentIndex += 1;
@@ -145,13 +302,14 @@ document.addEventListener('DOMContentLoaded', () => {
       if (currentIndex >= total) {
         summarySection?.classList.remove('hidden');
         summaryText.textContent = `Acertaste ${score} de ${total} preguntas.`;
-        document.querySelector('.quiz-area').style.display = 'none';
+        sendResults();
+        quizArea.style.display = 'none';
       } else {
         renderQuestion();
       }
     });
 
-    renderQuestion();
+    loadQuiz(materia, nivel);
   }
 
   const alphabetToggle = document.querySelector('.alphabet-toggle');
@@ -0,0 +1,85 @@
+"""
+Utilidades de almacenamiento local compartido entre workers de Gunicorn.
+
+Todos los stores de GATTO (caché de respuestas, contadores, etc.) usan SQLite
+en disco local: cada worker abre su propia conexión y SQLite se encarga del
+bloqueo entre procesos.
+"""
+import os
+import sqlite3
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows: en desarrollo hay un solo proceso
+    fcntl = None
+
+_local = threading.local()
+
+
+def connect(path: str) -> sqlite3.Connection:
+    """Devuelve una conexión SQLite reutilizable para este hilo y proceso."""
+    conns = getattr(_local, "conns", None)
+    if conns is None or getattr(_local, "pid", None) != os.getpid():
+        # Después de un fork las conexiones heredadas no son seguras
+        conns = _local.conns = {}
+        _local.pid = os.getpid()
+
+    conn = conns.get(path)
+    if conn is None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(path, timeout=10, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conns[path] = conn
+    return conn
+
+
+def try_lock(path: str):
+    """Intenta tomar un lock exclusivo entre procesos sin bloquear.
+
+    Devuelve el archivo abierto (hay que mantenerlo vivo mientras dure el lock)
+    o None si otro proceso ya lo tiene.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    handle = open(path, "a+")
+    if fcntl is None:
+        return handle
+    try:
+        fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        handle.close()
+        return None
+    return handle
+
+
+class Counters:
+    """Contadores con nombre persistidos en SQLite y sumados entre workers."""
+
+    def __init__(self, path: str, table: str = "counters"):
+        self.path = path
+        self.table = table
+        connect(path).execute(
+            f"CREATE TABLE IF NOT EXISTS {table} (name TEXT PRIMARY KEY, value INTEGER NOT NULL)"
+        )
+
+    def incr(self, name: str, amount: int = 1) -> None:
+        connect(self.path).execute(
+            f"INSERT INTO {self.table} (name, value) VALUES (?, ?) "
+            f"ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            (name, amount),
+        )
+
+    def get(self, name: str) -> int:
+        row = connect(self.path).execute(
+            f"SELECT value FROM {self.table} WHERE name = ?", (name,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def snapshot(self) -> dict:
+        rows = connect(self.path).execute(f"SELECT name, value FROM {self.table}").fetchall()
+        return dict(rows)
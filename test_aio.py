@@ -0,0 +1,118 @@
+"""
+Tests de las llamadas sin bloquear del modo asíncrono
+Uso: pytest test_aio.py -v
+"""
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from aio import AsyncRunner, ModelSaturatedError, ModelSlots
+from circuit_breaker import CircuitOpenError
+from models import StubError, StubModel
+
+
+def test_llamadas_en_vuelo_en_un_solo_loop():
+    runner = AsyncRunner()
+    model = StubModel("stub", latency="0.2")
+    started = time.perf_counter()
+    # 200 peticiones a la vez esperan 0,2 s cada una sin ocupar 200 llamadas bloqueantes
+    with ThreadPoolExecutor(max_workers=200) as executor:
+        textos = list(executor.map(lambda i: runner.generate(model, f"Duda del alumno: {i}", 5).text, range(200)))
+    assert time.perf_counter() - started < 2
+    assert "Respuesta de prueba sobre: 7<" in textos[7]
+
+
+def test_timeout_cancela_la_llamada():
+    runner = AsyncRunner()
+    model = StubModel("stub", latency="5")
+    with pytest.raises(TimeoutError):
+        runner.generate(model, "Duda del alumno: hola", 0.05)
+
+
+def test_lugares_por_modelo():
+    slots = ModelSlots(2, wait=0.05)
+    with slots.take("a"), slots.take("a"):
+        assert slots.in_flight() == {"a": 2}
+        with pytest.raises(ModelSaturatedError):
+            with slots.take("a"):
+                pass
+        # Cada modelo tiene sus propios lugares
+        with slots.take("b"):
+            pass
+    assert slots.in_flight() == {"a": 0, "b": 0}
+    # Los caminos de respaldo del circuito abierto cubren también la saturación
+    assert issubclass(ModelSaturatedError, CircuitOpenError)
+
+
+def test_lugares_en_el_loop_sin_sondeo():
+    slots = ModelSlots(1, wait=2)
+    intentos = 0
+    acquire = slots.acquire
+
+    def contar(model_name, timeout=None):
+        nonlocal intentos
+        intentos += 1
+        return acquire(model_name, timeout)
+
+    slots.acquire = contar
+
+    async def usar(i):
+        if not await slots.acquire_async("a"):
+            return False
+        await asyncio.sleep(0.01)
+        slots.release("a")
+        return True
+
+    async def main():
+        assert slots.acquire("a", timeout=0)
+        tareas = asyncio.gather(*(usar(i) for i in range(50)))
+        await asyncio.sleep(0.3)
+        # Mientras el lugar está tomado, las 50 corrutinas esperan dormidas (un intento cada una)
+        assert intentos == 51
+        slots.release("a")
+        return await tareas
+
+    assert all(asyncio.run(main()))
+    # Cada corrutina prueba cuando la despiertan, no 200 veces por segundo
+    assert intentos < 150
+    assert slots.in_flight() == {"a": 0}
+
+
+def test_lugar_en_el_loop_vence():
+    slots = ModelSlots(1, wait=0.1)
+    assert slots.acquire("a", timeout=0)
+    started = time.perf_counter()
+    assert asyncio.run(slots.acquire_async("a")) is False
+    assert 0.1 <= time.perf_counter() - started < 0.5
+    slots.release("a")
+    assert asyncio.run(slots.acquire_async("a")) is True
+
+
+def test_sin_limite():
+    slots = ModelSlots(0)
+    with slots.take("a"), slots.take("a"), slots.take("a"):
+        assert slots.in_flight() == {}
+
+
+def test_stream_desde_el_loop():
+    runner = AsyncRunner()
+    model = StubModel("stub", latency="0.1")
+    chunks = list(runner.stream(lambda: model.generate_content_async("Duda del alumno: hola", stream=True), 5))
+    assert len(chunks) == 4 and chunks[0].text.startswith("<h3>1)")
+
+    with pytest.raises(StubError):
+        list(runner.stream(lambda: StubModel("stub", error_rate=1.0).generate_content_async("x", stream=True), 5))
+    with pytest.raises(TimeoutError):
+        list(runner.stream(lambda: StubModel("stub", latency="5").generate_content_async("x", stream=True), 0.05))
+
+    # Si el alumno cierra la página, el stream se cancela en el loop
+    lento = runner.stream(lambda: StubModel("stub", latency="4").generate_content_async("x", stream=True), 10)
+    assert next(lento).text.startswith("<h3>1)")
+    lento.close()
+
+    async def pendientes():
+        await asyncio.sleep(0.05)
+        return len(asyncio.all_tasks()) - 1
+    assert runner.run(pendientes()) == 0
@@ -0,0 +1,47 @@
+"""
+Tests de la caché persistente de respuestas
+Uso: pytest test_answer_cache.py -v
+"""
+import time
+
+from answer_cache import AnswerCache, normalize_question
+
+
+def test_normalize_question():
+    assert normalize_question("  ¿Qué   es una FRACCIÓN? ") == "qué es una fracción"
+
+
+def test_key_depende_del_prompt_y_modelo():
+    base = AnswerCache.make_key("hola", "prompt", "modelo-a")
+    assert base == AnswerCache.make_key("  HOLA ", "prompt", "modelo-a")
+    assert base != AnswerCache.make_key("hola", "otro prompt", "modelo-a")
+    assert base != AnswerCache.make_key("hola", "prompt", "modelo-b")
+
+
+def test_hits_misses_y_ttl(tmp_path):
+    cache = AnswerCache(str(tmp_path / "answers.sqlite3"), ttl=0)
+    assert cache.get("k") is None
+    cache.set("k", "valor")
+    time.sleep(0.01)
+    assert cache.get("k") is None
+    assert cache.get("k", allow_expired=True) == "valor"
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 2
+
+
+def test_compartida_entre_instancias(tmp_path):
+    path = str(tmp_path / "answers.sqlite3")
+    AnswerCache(path).set("k", "valor")
+    assert AnswerCache(path).get("k") == "valor"
+
+
+def test_evict_lru(tmp_path):
+    cache = AnswerCache(str(tmp_path / "answers.sqlite3"), max_entries=2)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    cache.get("a")
+    cache.set("c", "3")
+    assert cache.get("a") == "1"
+    assert cache.get("b") is None
+    assert cache.get("c") == "3"
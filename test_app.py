@@ -14,22 +14,99 @@ except Exception:
         def main(self, args=None):
             return None
     pytest = _PytestShim()
+import asyncio
 import json
-from app import app
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from answer_cache import AnswerCache
+from assets import build as build_assets
+from models import StubModel
+from quiz_pool import PoolRefiller
+from app import (app, call_tutor, generate_question_batch, generate_questions, get_answer_cache, get_counters, get_question_bank,
+                 get_model_slots, get_models, get_popular_questions, get_question_index, get_quiz_pool, _answer_json,
+                 _cached_answer, _parse_answer, answer_context, QUIZ_MODEL, SUGERENCIAS, TUTOR_MODEL)
 
 @pytest.fixture
-def client():
+def client(tmp_path):
     """Crea un cliente de test"""
     app.config['TESTING'] = True
+    app.config['DATA_DIR'] = str(tmp_path)
+    app.config['QUIZ_POOL_ENABLED'] = False
+    app.config['BUSCAR_STREAMING'] = True
+    app.config['BUSCAR_ASYNC'] = False
+    app.config['MODEL_BACKEND'] = 'stub'
+    app.config['ADMIN_TOKEN'] = 'secreto'
+    app.config['ROUTING_ENABLED'] = False
+    app.config['ASSETS_DIST_DIR'] = str(tmp_path / 'dist')
+    app.config['PAGE_CACHE_CHECK_INTERVAL'] = 0
+    app.config['RATE_LIMIT_ENABLED'] = False
+    app.config['UPSTREAM_BUDGETS'] = {}
+    for name in ('answer_cache', 'question_index', 'quiz_pool', 'single_flight', 'breakers',
+                 'job_queue', 'job_workers', 'counters', 'question_bank', 'models', 'metrics', 'profiler',
+                 'profile_budget', 'router', 'hedge_executor', 'tutor_latencies',
+                 'asset_manifest', 'image_manifest', 'image_sizes', 'popular_questions',
+                 'page_cache', 'quiz_results', 'rate_limiter', 'model_slots'):
+        app.extensions.pop(name, None)
     with app.test_client() as client:
         yield client
 
+def _usar_modelo(nombre, model_class):
+    """Reemplaza el cliente de un modelo por uno falso"""
+    with app.app_context():
+        get_models().register(nombre, model_class(nombre))
+
 def test_home_page(client):
     """Verifica que la página de inicio carga"""
     response = client.get('/')
     assert response.status_code == 200
     assert b'GATTO' in response.data
 
+def test_static_con_hash_y_precomprimido(client, tmp_path):
+    """Verifica que url_for use los archivos con hash y que se sirvan comprimidos e inmutables"""
+    response = client.get('/static/css/index.css')
+    assert response.status_code == 200 and 'immutable' not in response.headers.get('Cache-Control', '')
+    assert 'fonts.googleapis.com' in client.get('/').get_data(as_text=True)
+
+    build_assets(os.path.join(app.root_path, 'static'), str(tmp_path / 'dist'))
+    app.extensions.pop('asset_manifest', None)
+    html = client.get('/').get_data(as_text=True)
+    url = html.split('<link rel="stylesheet" href="')[1].split('"')[0]
+    assert url.startswith('/static/dist/css/index.') and url != '/static/css/index.css'
+
+    response = client.get(url, headers={'Accept-Encoding': 'gzip, deflate'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.headers['Vary'] == 'Accept-Encoding'
+    assert response.mimetype == 'text/css'
+    assert 'immutable' in response.headers['Cache-Control']
+    assert 'max-age=31536000' in response.headers['Cache-Control']
+    sin_comprimir = client.get(url)
+    assert 'Content-Encoding' not in sin_comprimir.headers
+    assert len(sin_comprimir.data) > len(response.data)
+
+def test_imagenes_con_dimensiones(client):
+    """Verifica que las imágenes salgan con width/height y las de abajo con carga diferida"""
+    html = client.get('/').get_data(as_text=True)
+    assert 'width="500" height="500" alt="Gatito" loading="eager"' in html
+
+def test_home_cacheada_con_etag(client, tmp_path):
+    """Verifica que la página de inicio se sirva pre-renderizada, con ETag y 304"""
+    primera = client.get('/')
+    etag = primera.headers['ETag']
+    assert primera.headers['Cache-Control'] == 'no-cache'
+    assert client.get('/').data == primera.data
+
+    response = client.get('/', headers={'If-None-Match': etag})
+    assert response.status_code == 304 and response.data == b''
+    with app.app_context():
+        assert app.extensions['page_cache'].hits == 2
+
+    # Un build nuevo de estáticos (como un template editado) invalida la página
+    build_assets(os.path.join(app.root_path, 'static'), str(tmp_path / 'dist'))
+    response = client.get('/', headers={'If-None-Match': etag})
+    assert response.status_code == 200 and response.headers['ETag'] != etag
+    assert '/static/dist/css/index.' in response.get_data(as_text=True)
+
 def test_buscar_vacio(client):
     """Verifica que una búsqueda vacía redirija"""
     response = client.post('/buscar', data={'duda': ''})
@@ -46,21 +123,595 @@ def test_buscar_muy_larga(client):
     response = client.post('/buscar', data={'duda': duda})
     assert response.status_code == 302  # Redirect
 
+def test_buscar_usa_cache(client):
+    """Verifica que una pregunta repetida se responda desde la caché"""
+    with app.app_context():
+        key = AnswerCache.make_key('¿Qué es una fracción?', *answer_context('¿Qué es una fracción?'))
+        get_answer_cache().set(key, '<p>Respuesta guardada</p>')
+    response = client.post('/buscar', data={'duda': '  qué es una FRACCIÓN '})
+    assert response.status_code == 200
+    assert 'Respuesta guardada' in response.get_data(as_text=True)
+    assert response.headers['X-Gatto-Source'] == 'cache'
+
+def test_buscar_pregunta_parecida(client):
+    """Verifica que una pregunta parafraseada reutilice la respuesta guardada"""
+    with app.app_context():
+        key = AnswerCache.make_key('¿Qué es una fracción?', *answer_context('¿Qué es una fracción?'))
+        get_answer_cache().set(key, '<p>Respuesta guardada</p>')
+        get_question_index().add('¿Qué es una fracción?', key,
+                                 AnswerCache.context_hash(*answer_context('¿Qué es una fracción?')))
+    response = client.post('/buscar', data={'duda': '¿qué son las fracciones?'})
+    assert 'Respuesta guardada' in response.get_data(as_text=True)
+
+def test_buscar_con_stub(client):
+    """Verifica el camino completo de /buscar con el backend local"""
+    app.config['BUSCAR_STREAMING'] = False
+    response = client.post('/buscar', data={'duda': '¿Qué es un ecosistema?'})
+    html = response.get_data(as_text=True)
+    assert 'Respuesta de prueba sobre: ¿Qué es un ecosistema?' in html
+    assert '"desafio"' in html
+    assert response.headers['X-Gatto-Source'] == 'model'
+
+def test_buscar_streaming_devuelve_pagina(client):
+    """Verifica que sin caché /buscar responda enseguida con la URL del stream"""
+    response = client.post('/buscar', data={'duda': '¿Cómo se alimentan las plantas?'})
+    assert response.status_code == 200
+    assert b'data-stream-url="/buscar/stream?duda=' in response.data
+
+def test_buscar_stream_envia_secciones(client, monkeypatch):
+    """Verifica que el stream emita cada sección apenas se completa"""
+    chunks = ['```html\n<h3>1) Respuesta para la carpeta:</h3><ul><li>Uno</li></ul>',
+              '<h3>2) Explicación simple:</h3><p>Dos</p>', '```']
+
+    class FakeModel:
+        def __init__(self, name):
+            pass
+        def generate_content(self, prompt, stream=False, request_options=None):
+            assert stream
+            return iter(type('Chunk', (), {'text': c})() for c in chunks)
+
+    _usar_modelo(TUTOR_MODEL, FakeModel)
+    response = client.get('/buscar/stream?duda=¿Qué es una fracción?')
+    body = response.get_data(as_text=True)
+    assert response.mimetype == 'text/event-stream'
+    assert body.count('event: section') == 2
+    assert body.index('"key": "tecnica"') < body.index('"key": "simple"')
+    assert body.rstrip().endswith('data: {}')
+    with app.app_context():
+        key = AnswerCache.make_key('¿Qué es una fracción?', *answer_context('¿Qué es una fracción?'))
+        assert json.loads(get_answer_cache().get(key)) == {
+            'tecnica': '<ul><li>Uno</li></ul>', 'simple': '<p>Dos</p>'}
+
+def test_metrics(client, monkeypatch):
+    """Verifica que /metrics junte latencias por ruta, llamadas a modelos y origen de los tests"""
+    app.config['BUSCAR_STREAMING'] = False
+    client.get('/')
+    client.post('/buscar', data={'duda': '¿Qué es un ecosistema?'})
+    client.get('/api/quiz?materia=PDL&nivel=facil')
+
+    class SlowModel:
+        def __init__(self, name):
+            pass
+        def generate_content(self, prompt, **kwargs):
+            raise TimeoutError('Gemini no responde')
+
+    _usar_modelo(TUTOR_MODEL, SlowModel)
+    client.post('/buscar', data={'duda': '¿Qué es la fotosíntesis?'})
+
+    body = client.get('/metrics').get_data(as_text=True)
+    assert '# TYPE gatto_request_duration_seconds histogram' in body
+    assert 'gatto_request_duration_seconds_count{method="GET",route="/"} 1' in body
+    assert 'gatto_request_duration_seconds_bucket{method="POST",route="/buscar",le="+Inf"} 2' in body
+    assert f'gatto_model_calls_total{{model="{TUTOR_MODEL}",outcome="ok"}} 1' in body
+    assert f'gatto_model_calls_total{{model="{TUTOR_MODEL}",outcome="timeout"}} 1' in body
+    assert 'gatto_quiz_sets_served_total{source="bank"} 1' in body
+    assert 'gatto_answer_cache_hit_ratio 0' in body
+
+def test_server_timing(client):
+    """Verifica que /buscar y /api/quiz informen sus fases en Server-Timing"""
+    app.config['BUSCAR_STREAMING'] = False
+    response = client.post('/buscar', data={'duda': '¿Qué es un ecosistema?'})
+    fases = response.headers['Server-Timing']
+    for fase in ('cache;dur=', 'prompt;dur=', 'gemini;dur=', 'parse;dur=', 'render;dur=', 'total;dur='):
+        assert fase in fases
+    assert 'bank;dur=' in client.get('/api/quiz?materia=PDL').headers['Server-Timing']
+
+def test_profiler_admin(client, tmp_path):
+    """Verifica que el profiler solo se arme con el token y guarde pilas collapsed"""
+    assert client.post('/admin/profile', data={'requests': 1}).status_code == 403
+    app.config['ADMIN_TOKEN'] = None
+    assert client.get('/admin/profile').status_code == 404
+    app.config['ADMIN_TOKEN'] = 'secreto'
+    headers = {'X-Admin-Token': 'secreto'}
+    assert client.post('/admin/profile', data={'requests': 1}, headers=headers).get_json()['remaining'] == 1
+
+    client.get('/api/quiz?materia=PDL')
+    estado = client.get('/admin/profile', headers=headers).get_json()
+    assert estado['remaining'] == 0
+    assert len(estado['profiles']) == 1 and 'api_quiz' in estado['profiles'][0]
+    perfil = client.get(f"/admin/profile/{estado['profiles'][0]}", headers=headers)
+    assert perfil.status_code == 200
+
+def test_parse_answer_secciones():
+    """Verifica que la respuesta se parsee una vez en secciones sanitizadas"""
+    html = ('```html\n<h3>1) Respuesta para la carpeta:</h3><p>Es **una parte**</p>'
+            '<h3>2) Explicación simple:</h3><p onclick="x()">Simple</p><script>alert(1)</script>'
+            '<h3>3) Ejemplos cotidianos:</h3><p>Una pizza</p>'
+            '<h3>4) Desafío para practicar:</h3><p>¿Cuánto es 1/2 + 1/4?</p>\n```')
+    with app.app_context():
+        secciones = _parse_answer(html)
+    assert list(secciones) == ['tecnica', 'simple', 'ejemplos', 'desafio']
+    assert secciones['tecnica'] == '<p>Es <strong>una parte</strong></p>'
+    assert secciones['simple'] == '<p>Simple</p>'
+    assert '</script>' not in _answer_json(secciones)
+
+def test_parse_answer_cuenta_fallos(client):
+    """Verifica que una respuesta sin secciones se guarde igual y se cuente el fallo"""
+    with app.app_context():
+        secciones = _parse_answer('<p>Respuesta sin títulos</p>')
+        assert secciones == {'tecnica': '<p>Respuesta sin títulos</p>'}
+        assert get_counters().get('answer_parse_failures') == 1
+
+def test_buscar_circuito_abierto(client, monkeypatch):
+    """Verifica que con el circuito abierto /buscar responda sin llamar a Gemini"""
+    app.config['BUSCAR_STREAMING'] = False
+
+    class FailingModel:
+        calls = 0
+        def __init__(self, name):
+            pass
+        def generate_content(self, prompt, **kwargs):
+            FailingModel.calls += 1
+            raise TimeoutError('Gemini no responde')
+
+    _usar_modelo(TUTOR_MODEL, FailingModel)
+    for i in range(app.config['BREAKER_FAILURE_THRESHOLD']):
+        client.post('/buscar', data={'duda': f'Pregunta número {i}'})
+    response = client.post('/buscar', data={'duda': 'Otra pregunta'})
+    assert FailingModel.calls == app.config['BREAKER_FAILURE_THRESHOLD']
+    assert 'muy ocupado' in response.get_data(as_text=True)
+    # La página sale con 200, pero el encabezado dice que es un aviso y no una respuesta
+    assert response.status_code == 200 and response.headers['X-Gatto-Source'] == 'notice'
+
+def test_limite_por_alumno(client):
+    """Verifica que un alumno que pasa su límite reciba lo cacheado o un aviso, sin llamar a Gemini"""
+    app.config['BUSCAR_STREAMING'] = False
+    app.config['RATE_LIMIT_ENABLED'] = True
+    app.config['RATE_LIMIT_SESSION_BURST'] = 2
+    app.config['RATE_LIMIT_SESSION_PER_MINUTE'] = 0.001
+    with app.app_context():
+        key = AnswerCache.make_key('¿Qué es una fracción?', *answer_context('¿Qué es una fracción?'))
+        get_answer_cache().set(key, '<p>Respuesta guardada</p>')
+    for i in range(2):
+        html = client.post('/buscar', data={'duda': f'¿Qué es un ecosistema {i}?'}).get_data(as_text=True)
+        assert 'Respuesta de prueba' in html
+    response = client.post('/buscar', data={'duda': '¿Cómo vuelan los aviones?'})
+    html = response.get_data(as_text=True)
+    assert 'muy rápido' in html and 'Respuesta de prueba' not in html
+    assert response.headers['X-Gatto-Source'] == 'throttled'
+    # Lo que ya está en la caché no gasta fichas
+    assert 'Respuesta guardada' in client.post('/buscar', data={'duda': '¿Qué es una fracción?'}).get_data(as_text=True)
+    # Sin fichas, /api/quiz va directo al banco y deja el pool para los demás
+    tanda = [{'question': f'Pregunta del pool {i}', 'options': ['a', 'b'], 'correct': 'a', 'tip': 't'}
+             for i in range(10)]
+    with app.app_context():
+        get_quiz_pool().push('PDL', 'facil', tanda)
+    response = client.get('/api/quiz?materia=PDL&nivel=facil')
+    assert response.status_code == 200
+    assert 'Pregunta del pool 0' not in response.get_data(as_text=True)
+    assert response.headers['X-Gatto-Source'] == 'bank'
+    # Otro alumno (otra sesión) todavía puede preguntar
+    with app.test_client() as otro:
+        assert 'Respuesta de prueba' in otro.post('/buscar', data={'duda': '¿Qué es un río?'}).get_data(as_text=True)
+    metrics = client.get('/metrics').get_data(as_text=True)
+    assert 'gatto_rate_limit_total{decision="throttled",route="buscar",scope="session"} 1' in metrics
+
+def test_presupuesto_por_modelo(client):
+    """Verifica que agotado el presupuesto por minuto del modelo no se lo llame"""
+    app.config['BUSCAR_STREAMING'] = False
+    app.config['UPSTREAM_BUDGETS'] = {TUTOR_MODEL: 1}
+    assert 'Respuesta de prueba' in client.post('/buscar', data={'duda': '¿Qué es un río?'}).get_data(as_text=True)
+    html = client.post('/buscar', data={'duda': '¿Qué es un lago?'}).get_data(as_text=True)
+    assert 'muy ocupado' in html
+    metrics = client.get('/metrics').get_data(as_text=True)
+    assert f'gatto_model_calls_total{{model="{TUTOR_MODEL}",outcome="throttled"}} 1' in metrics
+    assert f'gatto_upstream_budget_total{{decision="throttled",model="{TUTOR_MODEL}"}} 1' in metrics
+
+def test_modo_asincrono(client, monkeypatch):
+    """Verifica que en ASYNC_MODE /buscar y el stream usen generate_content_async y se acoten las llamadas"""
+    monkeypatch.setitem(app.config, 'BUSCAR_STREAMING', False)
+    monkeypatch.setitem(app.config, 'ASYNC_MODE', True)
+    monkeypatch.setitem(app.config, 'MODEL_CONCURRENCY', 1)
+    monkeypatch.setitem(app.config, 'MODEL_SLOT_WAIT', 0.01)
+    llamadas = []
+
+    class AsyncModel(StubModel):
+        def generate_content(self, prompt, **kwargs):
+            raise AssertionError('en modo asíncrono no se bloquea el hilo')
+
+        async def generate_content_async(self, prompt, **kwargs):
+            llamadas.append(prompt)
+            return await super().generate_content_async(prompt, **kwargs)
+
+    _usar_modelo(TUTOR_MODEL, AsyncModel)
+    assert 'Respuesta de prueba' in client.post('/buscar', data={'duda': '¿Qué es un río?'}).get_data(as_text=True)
+    assert len(llamadas) == 1
+    # El stream también corre en el event loop
+    body = client.get('/buscar/stream?duda=¿Qué es un mar?').get_data(as_text=True)
+    assert body.count('event: section') == 4 and len(llamadas) == 2
+
+    # Sin lugares libres para el modelo no se lo llama y se responde con el respaldo
+    with app.app_context():
+        slots = get_model_slots()
+    with slots.take(TUTOR_MODEL):
+        html = client.post('/buscar', data={'duda': '¿Qué es un lago?'}).get_data(as_text=True)
+    assert 'muy ocupado' in html and len(llamadas) == 2
+    metrics = client.get('/metrics').get_data(as_text=True)
+    assert f'gatto_model_calls_total{{model="{TUTOR_MODEL}",outcome="saturated"}} 1' in metrics
+    # Esperar turno no cuenta como falla del modelo
+    assert f'gatto_breaker_open{{model="{TUTOR_MODEL}"}} 0' in metrics
+
+def test_hedge_asincrono_sin_pool_de_hilos(client, monkeypatch):
+    """Verifica que en ASYNC_MODE el hedge corra en el event loop y no se limite a HEDGE_THREADS"""
+    for key, value in (('ASYNC_MODE', True), ('ROUTING_ENABLED', True), ('HEDGE_ENABLED', True),
+                       ('HEDGE_THREADS', 2), ('HEDGE_DEFAULT_DELAY', 5), ('STUB_LATENCY', '0.3')):
+        monkeypatch.setitem(app.config, key, value)
+    fast_model = app.config['ROUTING_FAST_MODEL']
+
+    def pedir(i):
+        with app.app_context():
+            return call_tutor(f'¿Qué es el número {i}?', f'Duda del alumno: número {i}').text
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=20) as executor:
+        textos = list(executor.map(pedir, range(20)))
+    # Con 2 hilos de hedge, 20 llamadas de 0,3 s tardarían 3 s
+    assert time.perf_counter() - started < 1.5
+    assert 'número 7' in textos[7]
+    assert 'hedge_executor' not in app.extensions
+
+    # El hedge sale igual cuando el primer modelo tarda más que el delay
+    class Lento(StubModel):
+        async def generate_content_async(self, prompt, **kwargs):
+            await asyncio.sleep(1)
+            return await super().generate_content_async(prompt, **kwargs)
+
+    monkeypatch.setitem(app.config, 'HEDGE_DEFAULT_DELAY', 0.05)
+    monkeypatch.setitem(app.config, 'STUB_LATENCY', '0')
+    # Sin las latencias de las 20 llamadas anteriores el delay vuelve a HEDGE_DEFAULT_DELAY
+    for name in ('models', 'breakers'):
+        app.extensions.pop(name, None)
+    _usar_modelo(fast_model, Lento)
+    started = time.perf_counter()
+    assert 'Respuesta de prueba' in pedir(1)
+    assert time.perf_counter() - started < 0.5
+    metrics = client.get('/metrics').get_data(as_text=True)
+    assert 'gatto_tutor_hedges_total{outcome="won"} 1' in metrics
+
+def test_variantes_de_prompt(client, monkeypatch):
+    """Verifica que PROMPT_SPLIT elija la variante y que se cuenten tokens por variante"""
+    monkeypatch.setitem(app.config, 'BUSCAR_STREAMING', False)
+    monkeypatch.setitem(app.config, 'PROMPT_SPLIT', 'tutor=compacto@1;quiz=compacto@1')
+    prompts = []
+
+    class FakeModel(StubModel):
+        def generate_content(self, prompt, **kwargs):
+            prompts.append(prompt)
+            return super().generate_content(prompt, **kwargs)
+
+    _usar_modelo(TUTOR_MODEL, FakeModel)
+    _usar_modelo(QUIZ_MODEL, FakeModel)
+    response = client.post('/buscar', data={'duda': '¿Qué es un ecosistema?'})
+    assert 'Respuesta de prueba' in response.get_data(as_text=True)
+    with app.app_context():
+        assert len(generate_questions('PDL', 'facil')) == 10
+    assert 'fotosíntesis' not in prompts[0] and prompts[0].endswith('¿Qué es un ecosistema?')
+    assert 'Respondé solo con JSON' in prompts[1]
+    metrics = client.get('/metrics').get_data(as_text=True)
+    assert 'gatto_prompt_calls_total{parsed="true",route="tutor",variant="compacto@1"} 1' in metrics
+    assert 'gatto_prompt_calls_total{parsed="true",route="quiz",variant="compacto@1"} 1' in metrics
+    assert 'gatto_prompt_tokens_total{kind="input",route="tutor",variant="compacto@1"}' in metrics
+
+    result = app.test_cli_runner().invoke(args=['prompts', 'compare', '--route', 'tutor', '--limit', '3'])
+    assert result.exit_code == 0, result.output
+    assert 'completo@1' in result.output and 'compacto@1' in result.output and 'parseo 100%' in result.output
+
+def test_cache_por_variante_de_prompt(client, monkeypatch):
+    """Verifica que una respuesta de una variante no se sirva a quien recibe la otra"""
+    monkeypatch.setitem(app.config, 'BUSCAR_STREAMING', False)
+    prompts = []
+
+    class FakeModel(StubModel):
+        def generate_content(self, prompt, **kwargs):
+            prompts.append(prompt)
+            return super().generate_content(prompt, **kwargs)
+
+    _usar_modelo(TUTOR_MODEL, FakeModel)
+    monkeypatch.setitem(app.config, 'PROMPT_SPLIT', 'tutor=compacto@1')
+    assert client.post('/buscar', data={'duda': '¿Qué es un ecosistema?'}).headers['X-Gatto-Source'] == 'model'
+    assert client.post('/buscar', data={'duda': '¿Qué es un ecosistema?'}).headers['X-Gatto-Source'] == 'cache'
+    monkeypatch.setitem(app.config, 'PROMPT_SPLIT', 'tutor=completo@1')
+    assert client.post('/buscar', data={'duda': '¿Qué es un ecosistema?'}).headers['X-Gatto-Source'] == 'model'
+    assert len(prompts) == 2 and 'fotosíntesis' not in prompts[0] and 'fotosíntesis' in prompts[1]
+
+def test_build_avisa_sin_brotli(client, monkeypatch):
+    """Verifica que el build avise si falta brotli (sin .br ni woff2)"""
+    import app as app_module
+    monkeypatch.setattr(app_module, 'brotli', None)
+    result = app.test_cli_runner().invoke(args=['assets', 'build', '--no-images'])
+    assert result.exit_code == 0, result.output
+    assert 'brotli no está instalado' in result.output
+
+def test_build_avisa_sin_pillow(client, monkeypatch):
+    """Verifica que sin Pillow el build saltee las imágenes con un aviso y genere el resto"""
+    import images
+    monkeypatch.setattr(images, '_load_pillow', lambda: (None, ()))
+    result = app.test_cli_runner().invoke(args=['assets', 'build'])
+    assert result.exit_code == 0, result.output
+    assert '⚠️  Sin variantes de imágenes' in result.output and 'Pillow no está instalado' in result.output
+    assert 'archivos en' in result.output
+
+def test_buscar_asincrono(client, monkeypatch):
+    """Verifica que en modo asíncrono la duda se encole y se muestre la página de espera"""
+    app.config['BUSCAR_ASYNC'] = True
+    app.config['JOBS_MAX_QUEUE'] = 1
+    # Sin hilos de trabajo: la duda queda en la cola
+    monkeypatch.setattr('app.start_job_workers', lambda flask_app: None)
+    response = client.post('/buscar', data={'duda': '¿Cómo se alimentan las plantas?'})
+    assert response.status_code == 303
+    espera = client.get(response.headers['Location'])
+    assert 'Pensando tu respuesta' in espera.get_data(as_text=True)
+
+    lleno = client.post('/buscar', data={'duda': '¿Qué es una fracción?'})
+    assert lleno.status_code == 503
+    assert lleno.headers['Retry-After']
+    assert client.get('/api/jobs/stats').get_json()['rejected'] == 1
+
 def test_test_page_default(client):
     """Verifica que la página de test carga con valores por defecto"""
     response = client.get('/test')
     assert response.status_code == 200
+    datos = client.get('/api/quiz').get_json()
+    assert (datos['materia'], datos['nivel'], datos['nivel_label']) == ('Matemática', 'facil', 'Nivel fácil')
+    assert len(datos['preguntas']) == 10
 
 def test_test_page_materia(client):
     """Verifica que se puede acceder a diferentes materias"""
     for materia in ['Inglés', 'PDL', 'Cs. Naturales']:
-        response = client.get(f'/test?materia={materia}')
-        assert response.status_code == 200
+        response = client.get(f'/api/quiz?materia={materia}')
+        assert response.status_code == 200 and response.get_json()['materia'] == materia
 def test_test_page_nivel(client):
     """Verifica que se puede acceder a diferentes niveles"""
     for nivel in ['facil', 'intermedio', 'desafiante']:
-        response = client.get(f'/test?nivel={nivel}')
-        assert response.status_code == 200
+        response = client.get(f'/api/quiz?nivel={nivel}')
+        assert response.status_code == 200 and response.get_json()['nivel'] == nivel
+
+def test_test_page_usa_pool(client):
+    """Verifica que /api/quiz sirva una tanda del pool y luego caiga al banco de preguntas"""
+    tanda = [{'question': f'Pregunta del pool {i}', 'options': ['a', 'b'], 'correct': 'a', 'tip': 't'}
+             for i in range(10)]
+    with app.app_context():
+        get_quiz_pool().push('PDL', 'facil', tanda)
+    response = client.get('/api/quiz?materia=PDL&nivel=facil')
+    assert 'Pregunta del pool 0' in response.get_data(as_text=True)
+    # Cada tanda se sirve una sola vez: el navegador no la puede guardar
+    assert response.headers['Cache-Control'] == 'no-store'
+    response = client.get('/api/quiz?materia=PDL&nivel=facil')
+    assert 'Pregunta del pool 0' not in response.get_data(as_text=True)
+
+def test_test_page_estatica(client):
+    """Verifica que /test sea la misma página para toda materia y nivel, con ETag y 304"""
+    primera = client.get('/test?materia=PDL&nivel=facil')
+    assert primera.status_code == 200
+    html = primera.get_data(as_text=True)
+    assert 'id="quizConfig"' in html and 'Pregunta' in html
+    otra = client.get('/test?materia=Inglés&nivel=desafiante')
+    assert otra.headers['ETag'] == primera.headers['ETag']
+    response = client.get('/test?nivel=intermedio', headers={'If-None-Match': primera.headers['ETag']})
+    assert response.status_code == 304
+
+def test_reponer_pool_tandas_distintas(client, monkeypatch, tmp_path):
+    """Verifica que los pedidos simultáneos del pool no se unan en una sola tanda repetida"""
+    monkeypatch.setitem(app.config, 'STUB_LATENCY', '0.2')
+    with app.app_context():
+        pool = get_quiz_pool()
+
+    def generate(materia, nivel):
+        with app.app_context():
+            return generate_questions(materia, nivel)
+
+    refiller = PoolRefiller(pool, generate, keys=[('PDL', 'facil')], lock_path=str(tmp_path / 'lock'),
+                            low_water=3, refill_size=3, concurrency=3)
+    assert refiller.refill_once() == 3
+    tandas = {tuple(q['question'] for q in pool.pop('PDL', 'facil')) for _ in range(3)}
+    assert len(tandas) == 3
+
+def test_generar_tandas_en_lote(client, monkeypatch):
+    """Verifica que una sola llamada a Gemini rinda tandas de varios niveles"""
+    def tanda(nivel, n=10):
+        return {'questions': [{'question': f'¿{nivel} {i}?', 'options': ['a', 'b'], 'correct': 'a',
+                               'tip': 't'} for i in range(n)]}
+    payload = {'subject': 'PDL', 'levels': {'facil': [tanda('facil'), tanda('facil2')],
+                                            'intermedio': [tanda('intermedio', 7)],
+                                            'desafiante': 'roto'}}
+
+    class FakeModel:
+        calls = 0
+        def __init__(self, name):
+            pass
+        def generate_content(self, prompt, **kwargs):
+            FakeModel.calls += 1
+            return type('Response', (), {'text': json.dumps(payload)})()
+
+    _usar_modelo(QUIZ_MODEL, FakeModel)
+    with app.app_context():
+        lote = generate_question_batch('PDL', {'facil': 2, 'intermedio': 1, 'desafiante': 1})
+        assert [len(t) for t in lote['facil']] == [10, 10]
+        assert lote['desafiante'] == []
+        # Las preguntas válidas de una tanda incompleta van al banco y la tanda se completa con él
+        assert get_question_bank().count('PDL', 'intermedio') == 17
+        assert [len(t) for t in lote['intermedio']] == [10]
+        assert sum(q['question'].startswith('¿intermedio') for q in lote['intermedio'][0]) == 7
+    assert FakeModel.calls == 1
+    stats = client.get('/api/quiz/stats').get_json()
+    assert stats['batch']['calls'] == 1 and stats['batch']['questions'] == 27
+    assert stats['calls_saved'] == 1
+    assert stats['salvage']['sets_completed_bank'] == 1
+
+def test_rescata_tandas_cortadas(client, monkeypatch):
+    """Verifica que de un JSON cortado se rescaten las preguntas y se pidan solo las que faltan"""
+    tanda = {'subject': 'PDL', 'questions': [
+        {'question': f'¿Pregunta {i}?', 'options': ['a', 'b'], 'correct': 'a', 'tip': 't'} for i in range(10)]}
+    texto = json.dumps(tanda, ensure_ascii=False)
+    # Cortado a mitad de la octava pregunta, dentro de un bloque ```json
+    corte = texto.index('{"question": "¿Pregunta 7?"') + 20
+    pedidos = []
+
+    class FakeModel:
+        def __init__(self, name):
+            pass
+        def generate_content(self, prompt, **kwargs):
+            pedidos.append(prompt)
+            if len(pedidos) == 1:
+                return type('Response', (), {'text': '```json\n' + texto[:corte]})()
+            extra = [{'question': f'¿Pregunta {i}?', 'options': ['a', 'b'], 'correct': 'a', 'tip': 't'}
+                     for i in (6, 20, 21, 22)]
+            return type('Response', (), {'text': 'Acá van: ' + json.dumps({'questions': extra}) + ' ¡Suerte!'})()
+
+    _usar_modelo(QUIZ_MODEL, FakeModel)
+    with app.app_context():
+        preguntas = generate_questions('PDL', 'facil')
+    assert len(preguntas) == 10 and len(pedidos) == 2
+    assert 'Creá 3 preguntas' in pedidos[1] and '¿Pregunta 6?' in pedidos[1]
+    # La repetida (6) no entra; la tanda se completa con las nuevas
+    assert [q['question'] for q in preguntas[7:]] == ['¿Pregunta 20?', '¿Pregunta 21?', '¿Pregunta 22?']
+    salvage = client.get('/api/quiz/stats').get_json()['salvage']
+    # Las dos respuestas traían texto que json.loads no acepta
+    assert salvage['responses'] == 2 and salvage['rate'] == 1.0 and salvage['questions'] == 11
+    assert salvage['followup_calls'] == 1 and salvage['sets_completed_followup'] == 1
+    assert salvage['calls_saved'] == 0
+
+    # Sin pedido de seguimiento, lo que falta sale del banco
+    monkeypatch.setitem(app.config, 'QUIZ_SALVAGE_FOLLOWUP', False)
+    pedidos.clear()
+    with app.app_context():
+        preguntas = generate_questions('Inglés', 'facil')
+    assert len(preguntas) == 10 and len(pedidos) == 1
+    assert len({q['question'] for q in preguntas}) == 10
+    salvage = client.get('/api/quiz/stats').get_json()['salvage']
+    assert salvage['sets_completed_bank'] == 1 and salvage['calls_saved'] == 1
+
+def test_buscar_ruteo_y_hedge(client, monkeypatch):
+    """Verifica que una duda simple vaya al modelo rápido y, si tarda, gane el hedge"""
+    monkeypatch.setitem(app.config, 'ROUTING_ENABLED', True)
+    monkeypatch.setitem(app.config, 'BUSCAR_STREAMING', False)
+    monkeypatch.setitem(app.config, 'HEDGE_DEFAULT_DELAY', 0.05)
+    llamadas = []
+
+    def modelo(demora, texto):
+        class FakeModel:
+            def __init__(self, name):
+                self.name = name
+            def generate_content(self, prompt, **kwargs):
+                llamadas.append(self.name)
+                time.sleep(demora)
+                return type('Response', (), {'text': f'<h3>1) Respuesta para la carpeta:</h3><p>{texto}</p>'})()
+        return FakeModel
+
+    rapido = app.config['ROUTING_FAST_MODEL']
+    _usar_modelo(rapido, modelo(0.5, 'Del modelo rápido'))
+    _usar_modelo(TUTOR_MODEL, modelo(0, 'Del modelo fuerte'))
+    response = client.post('/buscar', data={'duda': '¿Qué es una fracción?'})
+    assert 'Del modelo fuerte' in response.get_data(as_text=True)
+    assert llamadas == [rapido, TUTOR_MODEL]
+
+    # Una duda que pide razonar va directo al modelo fuerte, que responde antes del hedge
+    response = client.post('/buscar', data={'duda': '¿Por qué llueve?'})
+    assert 'Del modelo fuerte' in response.get_data(as_text=True)
+    assert llamadas[2:] == [TUTOR_MODEL]
+
+    stats = client.get('/api/tutor/stats').get_json()
+    assert stats['routes']['simple'] == 1 and stats['routes']['keyword'] == 1
+    assert stats['calls'] == 2 and stats['hedges_sent'] == 1 and stats['hedges_won'] == 1
+    assert stats['hedge_rate'] == 0.5
+    assert 'gatto_tutor_hedges_total{outcome="won"} 1' in client.get('/metrics').get_data(as_text=True)
+
+def test_cache_por_modelo_ruteado(client, monkeypatch):
+    """Verifica que la caché guarde cada respuesta con la clave del modelo que eligió el ruteo"""
+    monkeypatch.setitem(app.config, 'ROUTING_ENABLED', True)
+    monkeypatch.setitem(app.config, 'HEDGE_ENABLED', False)
+    monkeypatch.setitem(app.config, 'BUSCAR_STREAMING', False)
+    rapido = app.config['ROUTING_FAST_MODEL']
+    with app.app_context():
+        prompt = answer_context('¿Qué es una fracción?')[0]
+        # Lo guardado con la clave del modelo fuerte no sirve para una duda que va al rápido
+        get_answer_cache().set(AnswerCache.make_key('¿Qué es una fracción?', prompt, TUTOR_MODEL),
+                               '<p>Del modelo fuerte</p>')
+    html = client.post('/buscar', data={'duda': '¿Qué es una fracción?'}).get_data(as_text=True)
+    assert 'Del modelo fuerte' not in html and 'Respuesta de prueba' in html
+    response = client.post('/buscar', data={'duda': '¿Por qué llueve?'})
+    with app.app_context():
+        cache = get_answer_cache()
+        assert 'Respuesta de prueba' in cache.get(AnswerCache.make_key('¿Qué es una fracción?', prompt, rapido))
+        assert cache.get(AnswerCache.make_key('¿Por qué llueve?', prompt, TUTOR_MODEL)) is not None
+        assert cache.get(AnswerCache.make_key('¿Por qué llueve?', prompt, rapido)) is None
+    assert response.headers['X-Gatto-Source'] == 'model'
+    # Armar las claves no cuenta como decisiones de ruteo
+    stats = client.get('/api/tutor/stats').get_json()
+    assert stats['routes']['simple'] == 1 and stats['routes']['keyword'] == 1
+
+def test_warm_precalienta_respuestas_y_tests(client):
+    """Verifica que `flask warm` genere las sugerencias, las dudas frecuentes y tandas de tests"""
+    app.config['BUSCAR_STREAMING'] = False
+    for _ in range(3):
+        client.post('/buscar', data={'duda': '¿Qué es un sustantivo?'})
+    client.post('/buscar', data={'duda': '¿Qué es un adjetivo?'})
+    with app.app_context():
+        get_popular_questions().flush()
+        get_answer_cache().clear()
+
+    result = app.test_cli_runner().invoke(args=['warm', '--top', '1', '--quiz-sets', '1', '--rate', '0'])
+    assert result.exit_code == 0, result.output
+    assert f'Respuestas: {len(SUGERENCIAS) + 1} generadas' in result.output
+    with app.app_context():
+        assert _cached_answer('¿Qué es un sustantivo?') is not None
+        assert _cached_answer('¿Qué es un adjetivo?') is None
+        assert all(_cached_answer(s) is not None for s in SUGERENCIAS)
+        assert get_quiz_pool().size('Inglés', 'desafiante') == 1
+
+    result = app.test_cli_runner().invoke(args=['warm', '--top', '1', '--quiz-sets', '0'])
+    assert 'Respuestas: 0 generadas, 5 ya estaban en la caché' in result.output
+
+def test_resultados_de_tests(client):
+    """Verifica que se reciban los resultados de un test y se sirvan las estadísticas"""
+    answers = [{'question': '¿Cuánto es 2 + 2?', 'correct': True},
+               {'question': '¿Cuánto es 3 + 5?', 'correct': False},
+               {'question': 'x' * 600, 'correct': True}]
+    response = client.post('/api/quiz/results', json={'materia': 'Matemática', 'nivel': 'facil',
+                                                      'answers': answers})
+    assert response.status_code == 202 and response.get_json() == {'recorded': 2}
+    assert client.post('/api/quiz/results', json={'materia': 'Física', 'nivel': 'facil',
+                                                  'answers': answers}).status_code == 400
+    assert client.post('/api/quiz/results', data='no es json').status_code == 400
+
+    with app.app_context():
+        app.extensions['quiz_results'].flush()
+    stats = client.get('/api/quiz/results/stats?materia=Matemática&nivel=facil&hardest=1').get_json()
+    assert stats['stats'] == [{'materia': 'Matemática', 'nivel': 'facil', 'quizzes': 1, 'answers': 2,
+                               'correct': 1, 'accuracy': 0.5, 'hardest': []}]
+    assert len(client.get('/api/quiz/results/stats').get_json()['stats']) == 18
+
+def test_test_page_usa_banco(client):
+    """Verifica que el banco sirva 10 preguntas distintas e incorpore las generadas"""
+    nuevas = [{'question': f'¿Pregunta nueva {i}?', 'options': ['a', 'b'], 'correct': 'a', 'tip': 't'}
+              for i in range(15)]
+    with app.app_context():
+        bank = get_question_bank()
+        assert bank.count('Inglés', 'facil') == 10
+        assert bank.add('Inglés', 'facil', nuevas + nuevas[:5]) == 15
+    preguntas = client.get('/api/quiz?materia=Inglés&nivel=facil').get_json()['preguntas']
+    assert len(preguntas) == 10
+    assert len({p['question'] for p in preguntas}) == 10
 
 if __name__ == '__main__':
     pytest.main([__file__, '-v'])
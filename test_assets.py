@@ -0,0 +1,56 @@
+"""
+Tests del build de archivos estáticos
+Uso: pytest test_assets.py -v
+"""
+import gzip
+import json
+
+from assets import build, load_manifest
+
+
+def _static(tmp_path):
+    src = tmp_path / "static"
+    (src / "css").mkdir(parents=True)
+    (src / "img").mkdir()
+    (src / "fonts").mkdir()
+    (src / "img" / "gato.png").write_bytes(b"\x89PNG gato")
+    (src / "css" / "index.css").write_text(
+        "body { background: url('../img/gato.png'); }\n" * 50
+        + ".x { background: url(data:image/png;base64,AAAA); }\n",
+        encoding="utf-8",
+    )
+    (src / "fonts" / "Nunito-Bold.woff2").write_bytes(b"wOF2 fuente")
+    return src
+
+
+def test_build_con_hash_y_comprimidos(tmp_path):
+    src = _static(tmp_path)
+    out = tmp_path / "static" / "dist"
+    manifest = build(str(src), str(out))
+
+    files = manifest["files"]
+    png, css = files["img/gato.png"], files["css/index.css"]
+    assert png.startswith("img/gato.") and png.endswith(".png")
+    # Las imágenes no se comprimen; el CSS sí, y apunta a la imagen con hash
+    assert png not in manifest["encodings"] and manifest["encodings"][css] == ["gzip"]
+    contenido = (out / css).read_text(encoding="utf-8")
+    assert f"url('../{png}')" in contenido and "data:image/png" in contenido
+    assert gzip.decompress((out / (css + ".gz")).read_bytes()).decode("utf-8") == contenido
+    assert load_manifest(str(out)) == json.loads(json.dumps(manifest))
+
+    # Mismo contenido, mismo nombre; el build anterior se reemplaza
+    assert build(str(src), str(out))["files"] == files
+    assert not (out / "dist").exists()
+
+
+def test_build_genera_fonts_css(tmp_path):
+    src = _static(tmp_path)
+    manifest = build(str(src), str(tmp_path / "dist"))
+    font = manifest["files"]["fonts/Nunito-Bold.woff2"]
+    css = (tmp_path / "dist" / manifest["files"]["css/fonts.css"]).read_text(encoding="utf-8")
+    assert "font-family: 'Nunito'" in css and "font-weight: 700" in css
+    assert f"url('../{font}') format('woff2')" in css
+
+
+def test_sin_build():
+    assert load_manifest("/no/existe") == {"files": {}, "encodings": {}}
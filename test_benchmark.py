@@ -0,0 +1,51 @@
+"""
+Tests del benchmark de carga
+Uso: pytest test_benchmark.py -v
+"""
+import threading
+
+from werkzeug.serving import make_server
+from werkzeug.wrappers import Response
+
+from benchmark import outcome, percentile, run_scenario
+
+
+def test_percentile():
+    samples = [i / 100 for i in range(1, 101)]
+    assert percentile(samples, 0.5) == 0.51
+    assert percentile(samples, 0.99) == 0.99
+    assert percentile(samples, 1.0) == 1.0
+    assert percentile([], 0.5) == 0.0
+
+
+def test_outcome_por_origen():
+    assert outcome(200, None) == "ok"
+    assert outcome(200, "model") == "ok"
+    assert outcome(200, "notice") == "errors"
+    assert outcome(200, "stale") == "stale"
+    assert outcome(200, "throttled") == "throttled"
+    assert outcome(200, "bank") == "fallback"
+    assert outcome(503, None) == "errors"
+    assert outcome(None, None) == "errors"
+
+
+def test_run_scenario_cuenta_errores():
+    def wsgi(environ, start_response):
+        path = environ["PATH_INFO"]
+        status = 500 if path == "/roto" else 200
+        headers = {"X-Gatto-Source": "notice"} if path == "/aviso" else {}
+        return Response("ok", status=status, headers=headers)(environ, start_response)
+
+    server = make_server("127.0.0.1", 0, wsgi, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        url = f"http://127.0.0.1:{server.server_port}"
+        result = run_scenario(url, lambda i: ("GET", ("/", "/roto", "/aviso")[i % 3], None),
+                              clients=4, requests=9)
+    finally:
+        server.shutdown()
+    assert result["requests"] == 9
+    assert result["ok"] == 3
+    # La página 200 con aviso también es un error
+    assert result["errors"] == 6
+    assert result["p50_ms"] <= result["p95_ms"] <= result["p99_ms"]
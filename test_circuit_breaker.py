@@ -0,0 +1,56 @@
+"""
+Tests del circuit breaker y los timeouts adaptativos
+Uso: pytest test_circuit_breaker.py -v
+"""
+import pytest
+
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+
+
+def _fail(breaker):
+    with pytest.raises(RuntimeError):
+        with breaker.guard():
+            raise RuntimeError("upstream caído")
+
+
+def test_abre_y_falla_rapido(tmp_path):
+    breaker = CircuitBreaker(str(tmp_path / "b.sqlite3"), "modelo", failure_threshold=2)
+    _fail(breaker)
+    assert breaker.state == CLOSED
+    _fail(breaker)
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        with breaker.guard():
+            pass
+
+
+def test_half_open_cierra_o_reabre(tmp_path):
+    breaker = CircuitBreaker(str(tmp_path / "b.sqlite3"), "modelo",
+                             failure_threshold=1, recovery_time=0)
+    _fail(breaker)
+    assert breaker.state == OPEN
+    _fail(breaker)  # la prueba half-open falla: vuelve a abrir
+    assert breaker.state == OPEN
+    with breaker.guard():
+        assert breaker.state == HALF_OPEN
+    assert breaker.state == CLOSED
+    counters = breaker.counters.snapshot()
+    assert counters["modelo:half_open->closed"] == 1
+    assert counters["modelo:half_open->open"] == 1
+
+
+def test_estado_compartido_entre_workers(tmp_path):
+    path = str(tmp_path / "b.sqlite3")
+    a = CircuitBreaker(path, "modelo", failure_threshold=1)
+    b = CircuitBreaker(path, "modelo", failure_threshold=1)
+    _fail(a)
+    assert b.state == OPEN
+
+
+def test_timeout_adaptativo(tmp_path):
+    breaker = CircuitBreaker(str(tmp_path / "b.sqlite3"), "modelo", min_timeout=1,
+                             max_timeout=30, timeout_multiplier=2, min_samples=5)
+    assert breaker.timeout() == 30
+    for seconds in (2.0, 2.5, 3.0, 3.0, 4.0):
+        breaker.latencies.add(seconds)
+    assert breaker.timeout() == 8.0
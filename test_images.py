@@ -0,0 +1,50 @@
+"""
+Tests de las variantes responsive de las imágenes
+Uso: pytest test_images.py -v
+"""
+import pytest
+
+from images import build, load_manifest, picture_html, png_size
+
+
+def _url(name):
+    return "/static/" + name
+
+
+def test_picture_sin_variantes():
+    html = picture_html(_url, "img/gato.png", 'Gato "feliz"', size=(500, 400), class_="cat-hero")
+    assert html == ('<img src="/static/img/gato.png" width="500" height="400" alt="Gato &#34;feliz&#34;" '
+                    'loading="lazy" decoding="async" class="cat-hero">')
+
+
+def test_picture_con_variantes():
+    entry = {"width": 500, "height": 500, "variants": {
+        "webp": [(170, "img/variants/gato-170.webp"), (500, "img/variants/gato-500.webp")],
+        "png": [(500, "img/gato.png")],
+    }}
+    html = picture_html(_url, "img/gato.png", "Gato", entry=entry, sizes="340px", loading="eager")
+    assert html.startswith('<picture><source type="image/webp" srcset="/static/img/variants/gato-170.webp 170w, '
+                           '/static/img/variants/gato-500.webp 500w" sizes="340px">')
+    assert '<img src="/static/img/gato.png" srcset="/static/img/gato.png 500w"' in html
+    assert 'width="500" height="500"' in html and 'loading="eager"' in html
+
+
+def test_build_incremental(tmp_path):
+    Image = pytest.importorskip("PIL.Image")
+    (tmp_path / "img").mkdir()
+    Image.new("RGB", (400, 200), "orange").save(tmp_path / "img" / "gato.png")
+    assert png_size(str(tmp_path / "img" / "gato.png")) == (400, 200)
+
+    result = build(str(tmp_path), widths=(100, 800))
+    entry = result["images"]["img/gato.png"]
+    assert result["generated"] == 1 and (entry["width"], entry["height"]) == (400, 200)
+    assert [w for w, _ in entry["variants"]["webp"]] == [100, 400]
+    # El respaldo a tamaño completo es el PNG original
+    assert tuple(entry["variants"]["png"][-1]) == (400, "img/gato.png")
+    for _, name in entry["variants"]["webp"]:
+        assert (tmp_path / name).exists()
+    assert load_manifest(str(tmp_path))["img/gato.png"]["hash"] == entry["hash"]
+
+    assert build(str(tmp_path), widths=(100, 800))["generated"] == 0
+    Image.new("RGB", (400, 200), "blue").save(tmp_path / "img" / "gato.png")
+    assert build(str(tmp_path), widths=(100, 800))["generated"] == 1
@@ -0,0 +1,47 @@
+"""
+Tests de la cola de trabajos del modo asíncrono
+Uso: pytest test_jobs.py -v
+"""
+import pytest
+
+from jobs import DONE, FAILED, QUEUED, RUNNING, JobQueue, JobWorkerPool, QueueFullError
+
+
+def test_cola_acotada(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"), max_queue=2)
+    queue.submit({"duda": "a"})
+    queue.submit({"duda": "b"})
+    with pytest.raises(QueueFullError):
+        queue.submit({"duda": "c"})
+    assert queue.stats()["rejected"] == 1
+
+
+def test_tope_de_concurrencia(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"), concurrency=1)
+    first = queue.submit({"duda": "a"})
+    second = queue.submit({"duda": "b"})
+    assert queue.claim()[0] == first
+    assert queue.claim() is None
+    assert queue.get(first)["status"] == RUNNING
+    assert queue.get(second)["status"] == QUEUED
+    assert queue.get(second)["position"] == 1
+
+
+def test_worker_pool(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"))
+    ok = queue.submit({"duda": "hola"})
+    bad = queue.submit({"duda": ""})
+
+    def handler(payload):
+        if not payload["duda"]:
+            raise ValueError("vacía")
+        return {"respuesta": payload["duda"].upper()}
+
+    pool = JobWorkerPool(queue, handler, threads=1)
+    assert pool.run_once() and pool.run_once()
+    assert not pool.run_once()
+    assert queue.get(ok)["status"] == DONE
+    assert queue.get(ok)["result"] == {"respuesta": "HOLA"}
+    assert queue.get(bad)["status"] == FAILED
+    stats = queue.stats()
+    assert stats["submitted"] == 2 and stats["failed"] == 1
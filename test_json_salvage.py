@@ -0,0 +1,46 @@
+"""
+Tests de la lectura tolerante del JSON de las tandas
+Uso: pytest test_json_salvage.py -v
+"""
+import json
+
+from json_salvage import iter_objects, salvage_questions, salvage_sets
+
+LEVELS = ["facil", "intermedio", "desafiante"]
+
+
+def _questions(prefix, n=10):
+    return [{"question": f"¿{prefix} {i}?", "options": ["a", "b"], "correct": "a", "tip": "t"}
+            for i in range(n)]
+
+
+def test_objetos_completos():
+    text = 'Hola {"a": 1} y {"b": {"c": [1, 2]}} y {"roto": '
+    assert [value for _, value in iter_objects(text)] == [{"a": 1}, {"b": {"c": [1, 2]}}]
+
+
+def test_tanda_cortada_con_texto_y_bloque():
+    text = json.dumps({"subject": "PDL", "questions": _questions("p")}, ensure_ascii=False)
+    # Con texto alrededor: se lee el objeto entero
+    assert len(salvage_questions("Acá está:\n" + text + "\n¡Suerte!")) == 10
+    # Cortada dentro de un bloque ```json: solo las preguntas que llegaron enteras
+    cut = text.index('{"question": "¿p 6?"') + 15
+    assert [q["question"] for q in salvage_questions("```json\n" + text[:cut])] == [f"¿p {i}?" for i in range(6)]
+    assert salvage_questions("") == [] and salvage_questions("sin json") == []
+
+
+def test_lote_cortado():
+    payload = {"subject": "PDL", "levels": {
+        "facil": [{"questions": _questions("f1")}, {"questions": _questions("f2")}],
+        "intermedio": [{"questions": _questions("i1")}],
+    }}
+    text = json.dumps(payload, ensure_ascii=False)
+    entero = salvage_sets("Listo: " + text + " fin", LEVELS)
+    assert [len(s) for s in entero["facil"]] == [10, 10] and [len(s) for s in entero["intermedio"]] == [10]
+
+    cut = text.index('{"question": "¿i1 4?"')
+    sets = salvage_sets(text[:cut], LEVELS)
+    assert [len(s) for s in sets["facil"]] == [10, 10]
+    # La tanda cortada queda incompleta, en su nivel
+    assert [[q["question"] for q in s] for s in sets["intermedio"]] == [[f"¿i1 {i}?" for i in range(4)]]
+    assert sets["desafiante"] == []
@@ -0,0 +1,37 @@
+"""
+Tests de las métricas compartidas entre workers
+Uso: pytest test_metrics.py -v
+"""
+from metrics import Metrics
+
+
+def test_suma_entre_workers(tmp_path):
+    path = str(tmp_path / "metrics.sqlite3")
+    worker_a, worker_b = Metrics(path), Metrics(path)
+    worker_a.inc("llamadas_total", model="flash")
+    worker_b.inc("llamadas_total", 2, model="flash")
+    worker_b.flush()
+    body = worker_a.render()
+    assert '# TYPE llamadas_total counter' in body
+    assert 'llamadas_total{model="flash"} 3' in body
+
+
+def test_histograma_acumulado(tmp_path):
+    metrics = Metrics(str(tmp_path / "metrics.sqlite3"), buckets=(0.1, 1.0))
+    metrics.describe("duracion_seconds", "Duración")
+    for value in (0.05, 0.5, 0.7, 3.0):
+        metrics.observe("duracion_seconds", value, route="/")
+    body = metrics.render()
+    assert '# HELP duracion_seconds Duración' in body
+    assert 'duracion_seconds_bucket{route="/",le="0.1"} 1' in body
+    assert 'duracion_seconds_bucket{route="/",le="1.0"} 3' in body
+    assert 'duracion_seconds_bucket{route="/",le="+Inf"} 4' in body
+    assert 'duracion_seconds_count{route="/"} 4' in body
+    assert 'duracion_seconds_sum{route="/"} 4.25' in body
+
+
+def test_flush_periodico(tmp_path):
+    path = str(tmp_path / "metrics.sqlite3")
+    metrics = Metrics(path, flush_interval=0)
+    metrics.inc("eventos_total", motivo='con "comillas"')
+    assert 'eventos_total{motivo="con \\"comillas\\""} 1' in Metrics(path).render()
@@ -0,0 +1,95 @@
+"""
+Tests del registro de clientes de modelos
+Uso: pytest test_models.py -v
+"""
+import json
+import sys
+
+import models
+from models import ModelRegistry, StubModel
+
+
+def test_importar_app_no_carga_gemini():
+    import app  # noqa: F401
+    assert "google.generativeai" not in sys.modules
+
+
+def test_clientes_reutilizados_por_proceso(monkeypatch):
+    registry = ModelRegistry(backend="stub")
+    cliente = registry.get("gemini-2.5-flash")
+    assert registry.get("gemini-2.5-flash") is cliente
+    assert registry.get("gemini-2.0-flash-exp") is not cliente
+    # Después de un fork el proceso hijo arma sus propios clientes
+    monkeypatch.setattr(models.os, "getpid", lambda: -1)
+    assert registry.get("gemini-2.5-flash") is not cliente
+
+
+def test_gemini_sin_api_key(monkeypatch):
+    monkeypatch.setattr(models, "_genai", None)
+    registry = ModelRegistry(backend="gemini", api_key=None)
+    try:
+        registry.get("gemini-2.5-flash")
+    except ValueError as e:
+        assert "GEMINI_API_KEY" in str(e)
+    else:
+        raise AssertionError("debería exigir la API key")
+
+
+def test_stub_respuestas():
+    model = StubModel("stub")
+    quiz = json.loads(model.generate_content('Tema "PDL"\n"questions": []').text)
+    assert len(quiz["questions"]) == 10
+    lote = json.loads(model.generate_content('- "facil": 2 tanda(s).\n"questions"').text)
+    assert len(lote["levels"]["facil"]) == 2
+    chunks = list(model.generate_content("Duda del alumno: hola", stream=True))
+    assert len(chunks) == 4
+
+
+def test_stub_deterministico():
+    def corrida():
+        model = StubModel("stub", seed=7)
+        return [model.generate_content('"questions"').text for _ in range(3)]
+    assert corrida() == corrida()
+    assert corrida() != [StubModel("stub", seed=8).generate_content('"questions"').text]
+
+
+def test_stub_errores_y_json_roto():
+    model = StubModel("stub", error_rate=1.0)
+    try:
+        model.generate_content('"questions"')
+    except models.StubError:
+        pass
+    else:
+        raise AssertionError("debería fallar")
+
+    texto = StubModel("stub", malformed_rate=1.0, fenced_rate=1.0).generate_content('"questions"').text
+    assert texto.startswith("```json")
+    try:
+        json.loads(texto.strip("`").removeprefix("json"))
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("el JSON debería estar cortado")
+
+
+def test_stub_timeout():
+    model = StubModel("stub", latency="uniform:0.2,0.3")
+    try:
+        model.generate_content("Duda del alumno: hola", request_options={"timeout": 0.01})
+    except TimeoutError:
+        pass
+    else:
+        raise AssertionError("debería vencer el timeout")
+    assert models.parse_latency("lognormal:1,0.5")(__import__("random").Random(1)) > 0
+
+
+def test_stub_async_igual_que_sync():
+    import asyncio
+
+    sync = StubModel("stub", seed=3)
+    asincrono = StubModel("stub", seed=3)
+    esperado = [sync.generate_content('"questions"').text for _ in range(3)]
+
+    async def corrida():
+        return [(await asincrono.generate_content_async('"questions"')).text for _ in range(3)]
+    assert asyncio.run(corrida()) == esperado
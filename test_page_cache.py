@@ -0,0 +1,32 @@
+"""
+Tests de la caché de páginas renderizadas
+Uso: pytest test_page_cache.py -v
+"""
+from page_cache import PageCache, files_version
+
+
+def test_renderiza_una_vez_y_se_invalida(tmp_path):
+    template = tmp_path / "index.html"
+    template.write_text("uno", encoding="utf-8")
+    renders, invalidaciones = [], []
+
+    def render():
+        renders.append(1)
+        return template.read_text(encoding="utf-8")
+
+    cache = PageCache(lambda: files_version(str(tmp_path)), check_interval=0,
+                      on_invalidate=lambda: invalidaciones.append(1))
+    body, etag = cache.get("home", render)
+    assert body == b"uno" and cache.get("home", render) == (body, etag)
+    assert len(renders) == 1 and cache.hits == 1
+
+    template.write_text("dos!", encoding="utf-8")
+    body, nuevo_etag = cache.get("home", render)
+    assert body == b"dos!" and nuevo_etag != etag
+    assert len(renders) == 2 and invalidaciones == [1]
+
+
+def test_version_de_archivos(tmp_path):
+    antes = files_version(str(tmp_path), str(tmp_path / "manifest.json"))
+    (tmp_path / "manifest.json").write_text("{}", encoding="utf-8")
+    assert files_version(str(tmp_path), str(tmp_path / "manifest.json")) != antes
@@ -0,0 +1,37 @@
+"""
+Tests del profiler por muestreo
+Uso: pytest test_profiler.py -v
+"""
+import time
+
+from profiler import ProfileBudget, SamplingProfiler, write_folded
+
+
+def _ocupado(segundos):
+    fin = time.perf_counter() + segundos
+    while time.perf_counter() < fin:
+        pass
+
+
+def test_muestrea_el_hilo_actual(tmp_path):
+    profiler = SamplingProfiler(interval=0.001)
+    profiler.start()
+    _ocupado(0.05)
+    samples = profiler.stop()
+    assert sum(samples.values()) > 5
+    assert any("_ocupado (test_profiler.py" in stack for stack in samples)
+
+    path = tmp_path / "perfil.folded"
+    write_folded(str(path), samples)
+    linea = path.read_text(encoding="utf-8").splitlines()[0]
+    assert linea.rsplit(" ", 1)[1].isdigit()
+
+
+def test_cupo_compartido(tmp_path):
+    path = str(tmp_path / "profiler.sqlite3")
+    worker_a, worker_b = ProfileBudget(path, check_interval=0), ProfileBudget(path, check_interval=0)
+    assert not worker_a.claim()
+    worker_a.arm(3)
+    assert worker_b.claim() and worker_a.claim() and worker_b.claim()
+    assert not worker_a.claim() and not worker_b.claim()
+    assert worker_a.remaining() == 0
@@ -0,0 +1,61 @@
+"""
+Tests del registro de variantes de prompt
+Uso: pytest test_prompts.py -v
+"""
+import pytest
+
+from prompts import PromptRegistry, compare, estimate_tokens, parse_split, usage_tokens
+
+
+def _registry():
+    registry = PromptRegistry()
+    registry.register("tutor", "completo", 1, "Largo largo largo. Duda: {duda}")
+    registry.register("tutor", "compacto", 1, "Duda: {duda}")
+    return registry
+
+
+def test_registro_y_versiones():
+    registry = _registry()
+    assert [v.id for v in registry.variants("tutor")] == ["completo@1", "compacto@1"]
+    assert registry.get("tutor", "compacto@1").build(duda="¿Qué es?") == "Duda: ¿Qué es?"
+    # Una variante no se pisa: se registra otra versión
+    with pytest.raises(ValueError):
+        registry.register("tutor", "compacto", 1, "Otra: {duda}")
+    assert registry.register("tutor", "compacto", 2, "Otra: {duda}").id == "compacto@2"
+
+
+def test_reparto():
+    registry = _registry()
+    assert parse_split("tutor=completo@1:90, compacto@1:10;quiz=compacto@1") == {
+        "tutor": {"completo@1": 90.0, "compacto@1": 10.0}, "quiz": {"compacto@1": 100.0}}
+    # Sin reparto, o con variantes que no existen, la primera registrada
+    assert registry.choose("tutor").id == "completo@1"
+    assert registry.choose("tutor", {"nueva@9": 100}).id == "completo@1"
+    split = {"completo@1": 80, "compacto@1": 20}
+    # La misma clave siempre va a la misma variante
+    assert len({registry.choose("tutor", split, key="qué es una fracción").id for _ in range(20)}) == 1
+    elegidas = [registry.choose("tutor", split, key=f"duda {i}").id for i in range(2000)]
+    assert 0.15 < elegidas.count("compacto@1") / len(elegidas) < 0.25
+
+
+def test_tokens():
+    assert estimate_tokens("a" * 400) == 100
+    usage = type("Usage", (), {"prompt_token_count": 12, "candidates_token_count": 34})()
+    assert usage_tokens(type("R", (), {"usage_metadata": usage})(), "x" * 400, "y") == (12, 34)
+    assert usage_tokens(None, "x" * 400, "y" * 40) == (100, 10)
+
+
+def test_compare():
+    registry = _registry()
+
+    def generate(prompt):
+        if "explota" in prompt:
+            raise RuntimeError("error")
+        return type("R", (), {"text": "ok" if "Largo" in prompt else "roto"})()
+
+    rows = compare(registry.variants("tutor"), [{"duda": "¿uno?"}, {"duda": "explota"}],
+                   generate, lambda text: text == "ok")
+    completo, compacto = rows
+    assert completo["errors"] == 1 and completo["parse_rate"] == 1.0
+    assert compacto["parse_rate"] == 0.0
+    assert completo["prompt_chars"] > compacto["prompt_chars"]
@@ -0,0 +1,45 @@
+"""
+Tests del banco de preguntas
+Uso: pytest test_question_bank.py -v
+"""
+import io
+import json
+
+from question_bank import QuestionBank, dump
+
+
+def _preguntas(*textos):
+    return [{"question": t, "options": ["a", "b"], "correct": "a", "tip": "t"} for t in textos]
+
+
+def test_add_sin_duplicados(tmp_path):
+    bank = QuestionBank(str(tmp_path / "bank.sqlite3"))
+    assert bank.add("PDL", "facil", _preguntas("¿Qué es un verbo?", "¿Qué es un sustantivo?")) == 2
+    # La misma pregunta con otra puntuación o mayúsculas no se repite
+    assert bank.add("PDL", "facil", _preguntas("qué es un VERBO")) == 0
+    assert bank.add("PDL", "intermedio", _preguntas("qué es un VERBO")) == 1
+    assert bank.count() == 3
+    assert bank.count("PDL", "facil") == 2
+
+
+def test_sample_al_azar_sin_repetir(tmp_path):
+    bank = QuestionBank(str(tmp_path / "bank.sqlite3"))
+    bank.add("PDL", "facil", _preguntas(*(f"P{i}" for i in range(30))))
+    tanda = bank.sample("PDL", "facil", 10)
+    assert len({p["question"] for p in tanda}) == 10
+    assert len(bank.sample("PDL", "desafiante", 10)) == 0
+    assert len(bank.sample("PDL", "facil", 50)) == 30
+
+
+def test_export_import(tmp_path):
+    bank = QuestionBank(str(tmp_path / "bank.sqlite3"))
+    bank.add("PDL", "facil", _preguntas("P1", "P2"))
+    bank.add("Inglés", "facil", _preguntas("P3"))
+    out = io.StringIO()
+    dump(bank.export_data(), out)
+    data = json.loads(out.getvalue())
+    assert [p["question"] for p in data["PDL"]["facil"]] == ["P1", "P2"]
+
+    otro = QuestionBank(str(tmp_path / "otro.sqlite3"))
+    assert otro.import_data(data) == 3
+    assert otro.import_data(data) == 0
@@ -0,0 +1,54 @@
+"""
+Tests del índice de preguntas parecidas
+Uso: pytest test_question_index.py -v
+"""
+from question_index import QuestionIndex, math_key, normalize, polarity_key
+
+
+def test_normalize():
+    assert normalize("¿Qué es una fracción?") == "que fraccion"
+    assert normalize("que es una fraccion") == "que fraccion"
+    assert normalize("¿qué son las fracciones?") == "que fraccion"
+
+
+def test_lookup_parecidas(tmp_path):
+    index = QuestionIndex(str(tmp_path / "questions.sqlite3"))
+    index.add("¿Cómo se alimentan las plantas?", "k1")
+    match = index.lookup("como se alimentan las plantas")
+    assert match is not None and match[0] == "k1"
+    assert index.lookup("¿Cuáles son las capitales de Argentina?") is None
+
+
+def test_namespace_y_persistencia(tmp_path):
+    path = str(tmp_path / "questions.sqlite3")
+    QuestionIndex(path).add("¿Qué es una fracción?", "k1", namespace="a")
+    index = QuestionIndex(path)
+    assert index.lookup("que son las fracciones", namespace="a")[0] == "k1"
+    assert index.lookup("que son las fracciones", namespace="b") is None
+    assert len(index) == 1
+
+
+def test_cuentas_distintas_no_se_confunden(tmp_path):
+    assert normalize("¿Cuánto es 25+17?") == "cuanto 25 + 17"
+    assert math_key(normalize("¿Cuánto es 25 x 17?")) == "25x17"
+    assert math_key(normalize("explicame el examen")) == ""
+    index = QuestionIndex(str(tmp_path / "questions.sqlite3"))
+    index.add("¿Cuánto es 25+17?", "suma")
+    index.add("¿Cuánto es 6/3?", "division")
+    assert index.lookup("¿Cuánto es 25-17?") is None
+    assert index.lookup("¿Cuánto es 25+18?") is None
+    assert index.lookup("¿Cuánto es 6*3?") is None
+    assert index.lookup("cuanto es 25 + 17")[0] == "suma"
+
+
+def test_negaciones_no_se_confunden(tmp_path):
+    assert polarity_key(normalize("¿Qué animales no son mamíferos?")) == "no"
+    assert polarity_key(normalize("¿Qué es una fracción?")) == ""
+    index = QuestionIndex(str(tmp_path / "questions.sqlite3"))
+    index.add("¿Qué animales son mamíferos?", "mamiferos")
+    index.add("¿Qué plantas crecen con luz?", "con_luz")
+    assert index.lookup("¿Qué animales no son mamíferos?") is None
+    assert index.lookup("¿Qué animales nunca son mamíferos?") is None
+    assert index.lookup("¿Qué plantas crecen sin luz?") is None
+    assert index.lookup("que animales son mamiferos")[0] == "mamiferos"
+    assert index.lookup("¿que plantas crecen con luz?")[0] == "con_luz"
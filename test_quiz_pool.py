@@ -0,0 +1,66 @@
+"""
+Tests del pool de tests pre-generados
+Uso: pytest test_quiz_pool.py -v
+"""
+from quiz_pool import PoolRefiller, QuizPool
+
+
+def _tanda(n=10):
+    return [{"question": f"P{i}", "options": ["a", "b"], "correct": "a", "tip": "t"} for i in range(n)]
+
+
+def test_push_pop_fifo(tmp_path):
+    pool = QuizPool(str(tmp_path / "pool.sqlite3"))
+    assert pool.pop("PDL", "facil") is None
+    pool.push("PDL", "facil", _tanda())
+    pool.push("PDL", "facil", _tanda(11))
+    assert pool.size("PDL", "facil") == 2
+    assert len(pool.pop("PDL", "facil")) == 10
+    assert pool.size("PDL", "facil") == 1
+    assert pool.pop("Inglés", "facil") is None
+
+
+def test_tandas_vencidas(tmp_path):
+    pool = QuizPool(str(tmp_path / "pool.sqlite3"), max_age=-1)
+    pool.push("PDL", "facil", _tanda())
+    assert pool.pop("PDL", "facil") is None
+
+
+def test_refill_hasta_low_water(tmp_path):
+    pool = QuizPool(str(tmp_path / "pool.sqlite3"))
+    calls = []
+
+    def generate(materia, nivel):
+        calls.append((materia, nivel))
+        # Las tandas incompletas no se agregan al pool
+        return _tanda(9) if nivel == "desafiante" else _tanda()
+
+    refiller = PoolRefiller(pool, generate, [("PDL", "facil"), ("PDL", "desafiante")],
+                            lock_path=str(tmp_path / "pool.lock"), low_water=3, refill_size=2)
+    assert refiller.refill_once() == 2
+    assert refiller.refill_once() == 1
+    assert pool.size("PDL", "facil") == 3
+    assert pool.size("PDL", "desafiante") == 0
+    assert refiller.refill_once() == 0
+
+
+def test_refill_en_lote(tmp_path):
+    pool = QuizPool(str(tmp_path / "pool.sqlite3"))
+    calls = []
+
+    def generate(materia, nivel):
+        raise AssertionError("con lote no se pide de a una tanda")
+
+    def generate_batch(materia, niveles):
+        calls.append((materia, niveles))
+        return {nivel: [_tanda()] * n for nivel, n in niveles.items()}
+
+    keys = [(m, n) for m in ("PDL", "Inglés") for n in ("facil", "intermedio", "desafiante")]
+    refiller = PoolRefiller(pool, generate, keys, lock_path=str(tmp_path / "pool.lock"),
+                            low_water=2, refill_size=2, generate_batch=generate_batch,
+                            batch_sets=3)
+    # 12 tandas en 4 llamadas (2 por materia) en lugar de 12
+    assert refiller.refill_once() == 12
+    assert len(calls) == 4
+    assert calls[0] == ("PDL", {"facil": 2, "intermedio": 1})
+    assert all(pool.size(m, n) == 2 for m, n in keys)
@@ -0,0 +1,38 @@
+"""
+Tests de los resultados de los tests y sus estadísticas
+Uso: pytest test_quiz_results.py -v
+"""
+import time
+
+from quiz_results import QuizResults
+
+
+def test_agregados_por_nivel_y_pregunta(tmp_path):
+    results = QuizResults(str(tmp_path / "results.sqlite3"), flush_interval=60)
+    results.record("PDL", "facil", [("¿Qué es un verbo?", True), ("¿Qué es un sustantivo?", False)])
+    results.record("PDL", "facil", [("¿Qué es un verbo?", True), ("¿qué es un SUSTANTIVO?", False)])
+    # Nada llega al disco hasta el volcado
+    assert results.level_stats("PDL", "facil")["answers"] == 0
+    assert results.flush() == 4
+
+    assert results.level_stats("PDL", "facil") == {"quizzes": 2, "answers": 4, "correct": 2, "accuracy": 0.5}
+    assert results.question_stats("PDL", "facil", "¿Qué es un verbo?") == {"answers": 2, "correct": 2, "accuracy": 1.0}
+    assert results.level_stats("PDL", "intermedio")["accuracy"] is None
+
+    results.record("PDL", "facil", [("¿Qué es un verbo?", False)])
+    results.flush()
+    hardest = results.hardest("PDL", "facil", n=5, min_answers=2)
+    assert [(h["question"], h["answers"], round(h["accuracy"], 2)) for h in hardest] == [
+        ("¿Qué es un sustantivo?", 2, 0.0), ("¿Qué es un verbo?", 3, 0.67)]
+    assert results.hardest("PDL", "facil", min_answers=3) == [hardest[1]]
+
+
+def test_volcado_en_segundo_plano(tmp_path):
+    results = QuizResults(str(tmp_path / "results.sqlite3"), flush_interval=60, max_pending=3)
+    results.record("Inglés", "facil", [("¿Cómo se dice gato?", True)] * 3)
+    # Con max_pending alcanzado el hilo vuelca sin esperar el intervalo
+    for _ in range(100):
+        if results.level_stats("Inglés", "facil")["answers"] == 3:
+            break
+        time.sleep(0.01)
+    assert results.level_stats("Inglés", "facil")["answers"] == 3
@@ -0,0 +1,42 @@
+"""
+Tests de los token buckets compartidos
+Uso: pytest test_rate_limit.py -v
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+from circuit_breaker import CircuitOpenError
+from rate_limit import QuotaExceededError, TokenBuckets
+
+
+def test_rafaga_y_recarga(tmp_path):
+    buckets = TokenBuckets(str(tmp_path / "rate.sqlite3"))
+    assert [buckets.take("alumno", 3, 60, now=100) for _ in range(5)] == [True, True, True, False, False]
+    # 60 por minuto = 1 ficha por segundo
+    assert buckets.take("alumno", 3, 60, now=101)
+    assert not buckets.take("alumno", 3, 60, now=101)
+    # Nunca acumula más que la ráfaga
+    assert buckets.tokens("alumno", 3, 60, now=1000) == 3
+    assert buckets.tokens("otro", 3, 60, now=100) == 3
+
+
+def test_compartido_entre_instancias(tmp_path):
+    path = str(tmp_path / "rate.sqlite3")
+    # Cada hilo con su propia instancia, como los workers de Gunicorn
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(lambda _: TokenBuckets(path).take("model:x", 10, 0.001), range(40)))
+    assert results.count(True) == 10
+
+
+def test_cuota_agotada_es_circuito_abierto():
+    # Los caminos de respaldo que atrapan CircuitOpenError cubren también la cuota
+    assert issubclass(QuotaExceededError, CircuitOpenError)
+
+
+def test_borra_buckets_sin_uso(tmp_path):
+    buckets = TokenBuckets(str(tmp_path / "rate.sqlite3"), max_idle=60, purge_every=3)
+    buckets.take("viejo", 3, 60, now=0)
+    buckets.take("nuevo", 3, 60)
+    buckets.take("nuevo", 3, 60)
+    assert buckets.tokens("viejo", 3, 60, now=0) == 3
+    assert buckets.tokens("nuevo", 3, 60) < 3
+    assert buckets.purge() == 0
@@ -0,0 +1,83 @@
+"""
+Tests del ruteo de dudas entre modelos y de los pedidos hedged
+Uso: pytest test_routing.py -v
+"""
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from routing import ModelRouter, hedged, hedged_async
+
+
+def test_elige_modelo_segun_la_duda():
+    router = ModelRouter("rapido", "fuerte", max_simple_words=8)
+    assert router.choose("¿Qué es una fracción?") == ("rapido", "simple")
+    assert router.choose("¿Por qué llueve?") == ("fuerte", "keyword")
+    assert router.choose("¿Qué son las CÉLULAS?") == ("fuerte", "subject")
+    assert router.choose("¿Qué es un verbo? ¿Y un adjetivo?") == ("fuerte", "length")
+    assert router.choose("Quiero saber cuál es la capital de Francia, por favor") == ("fuerte", "length")
+    assert router.alternate("rapido") == "fuerte" and router.alternate("fuerte") == "rapido"
+
+
+def test_materias_y_palabras_configurables():
+    router = ModelRouter("rapido", "fuerte", complex_keywords=("resumí",), strong_subjects=())
+    assert router.choose("¿Qué es la fotosíntesis?") == ("rapido", "simple")
+    assert router.choose("Resumí la revolución de mayo")[1] == "keyword"
+
+
+def _tarda(segundos, valor):
+    def run():
+        time.sleep(segundos)
+        return valor
+    return run
+
+
+def test_hedge_gana_el_mas_rapido():
+    with ThreadPoolExecutor(4) as executor:
+        assert hedged(_tarda(0, "a"), _tarda(0, "b"), 0.5, executor) == ("a", "primary", False)
+        started = time.perf_counter()
+        assert hedged(_tarda(0.5, "a"), _tarda(0, "b"), 0.05, executor) == ("b", "secondary", True)
+        assert time.perf_counter() - started < 0.3
+        assert hedged(_tarda(0.1, "a"), _tarda(0.5, "b"), 0.05, executor) == ("a", "primary", True)
+
+
+def test_hedge_con_errores():
+    def falla():
+        time.sleep(0.1)
+        raise RuntimeError("caído")
+
+    with ThreadPoolExecutor(4) as executor:
+        # Si el hedge falla, se espera al primario
+        assert hedged(_tarda(0.2, "a"), falla, 0.05, executor) == ("a", "primary", True)
+        # Un error del primario antes del delay no dispara el hedge
+        with pytest.raises(RuntimeError):
+            hedged(falla, _tarda(0, "b"), 1, executor)
+
+
+def _tarda_async(segundos, valor):
+    async def run():
+        await asyncio.sleep(segundos)
+        if isinstance(valor, Exception):
+            raise valor
+        return valor
+    return run
+
+
+def test_hedge_async():
+    async def corrida():
+        assert await hedged_async(_tarda_async(0, "a"), _tarda_async(0, "b"), 0.5) == ("a", "primary", False)
+        assert await hedged_async(_tarda_async(0.5, "a"), _tarda_async(0, "b"), 0.05) == ("b", "secondary", True)
+        # Si el hedge falla, se espera al primario
+        assert await hedged_async(_tarda_async(0.2, "a"), _tarda_async(0.1, RuntimeError("caído")), 0.05) == (
+            "a", "primary", True)
+        # Un error del primario antes del delay no dispara el hedge
+        with pytest.raises(RuntimeError):
+            await hedged_async(_tarda_async(0, RuntimeError("caído")), _tarda_async(0, "b"), 1)
+
+        # Cien pedidos a la vez esperan en paralelo, sin un pool de hilos de por medio
+        started = time.perf_counter()
+        await asyncio.gather(*(hedged_async(_tarda_async(0.2, i), None, 0.05) for i in range(100)))
+        assert time.perf_counter() - started < 0.5
+    asyncio.run(corrida())
@@ -0,0 +1,50 @@
+"""
+Tests de la coalescencia de llamadas (single-flight)
+Uso: pytest test_singleflight.py -v
+"""
+import threading
+import time
+
+from singleflight import SingleFlight
+
+
+def test_coalesce_en_el_mismo_worker(tmp_path):
+    flight = SingleFlight(str(tmp_path / "sf.sqlite3"))
+    calls = []
+
+    def slow():
+        calls.append(1)
+        time.sleep(0.2)
+        return "respuesta"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do("k", slow))) for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert results == ["respuesta"] * 5
+    assert len(calls) == 1
+    assert flight.stats()["coalesced_local"] == 4
+
+
+def test_coalesce_entre_workers(tmp_path):
+    path = str(tmp_path / "sf.sqlite3")
+    # Dos instancias simulan dos workers que comparten el mismo archivo
+    leader, follower = SingleFlight(path), SingleFlight(path, poll_interval=0.01)
+    with leader.leading("k") as publish:
+        assert publish is not None
+        assert follower.in_flight("k")
+        threading.Timer(0.1, publish, args=(["a", "b"],)).start()
+        assert follower.do("k", lambda: ["otra llamada"]) == ["a", "b"]
+    assert not follower.in_flight("k")
+    assert follower.stats()["coalesced_remote"] == 1
+
+
+def test_si_el_lider_falla_el_seguidor_genera(tmp_path):
+    path = str(tmp_path / "sf.sqlite3")
+    leader, follower = SingleFlight(path), SingleFlight(path, poll_interval=0.01)
+    with leader.leading("k"):
+        threading.Timer(0.05, leader._release, args=("k",)).start()
+        assert follower.do("k", lambda: "propia") == "propia"
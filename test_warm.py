@@ -0,0 +1,39 @@
+"""
+Tests de las preguntas frecuentes y del pre-calentado
+Uso: pytest test_warm.py -v
+"""
+import time
+
+from warm import PopularQuestions, Throttle, run_throttled
+
+
+def test_cuenta_dudas_normalizadas(tmp_path):
+    popular = PopularQuestions(str(tmp_path / "popular.sqlite3"), flush_interval=60)
+    for duda in ("¿Qué es una fracción?", "qué es una FRACCIÓN", "¿Por qué llueve?"):
+        popular.record(duda)
+    popular.record("¿Qué es una fracción?")
+    # Otro worker (otra instancia) suma sobre la misma tabla
+    otro = PopularQuestions(str(tmp_path / "popular.sqlite3"))
+    otro.record("¿Por qué llueve?")
+    otro.flush()
+    assert popular.top(5) == [("¿Qué es una fracción?", 3), ("¿Por qué llueve?", 2)]
+    assert popular.top(1) == [("¿Qué es una fracción?", 3)]
+
+
+def test_ventana_de_tiempo(tmp_path):
+    popular = PopularQuestions(str(tmp_path / "popular.sqlite3"))
+    popular.record("¿Qué es un verbo?")
+    popular.flush()
+    time.sleep(0.05)
+    assert popular.top(5, max_age=0.01) == []
+    assert popular.top(5, max_age=60) == [("¿Qué es un verbo?", 1)]
+
+
+def test_throttle_y_concurrencia():
+    throttle = Throttle(rate=50)
+    started = time.perf_counter()
+    results = run_throttled(lambda n: 10 // n, [1, 2, 0, 5, 10], concurrency=3, throttle=throttle)
+    # 5 llamadas a 50/s: la última sale a los 80 ms
+    assert time.perf_counter() - started >= 0.08
+    assert results[1] == 10 and results[5] == 2
+    assert isinstance(results[0], ZeroDivisionError)
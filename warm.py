@@ -0,0 +1,129 @@
+"""
+Preguntas más frecuentes y pre-calentado de cachés fuera de hora pico.
+
+`PopularQuestions` cuenta cuántas veces se pregunta cada duda (normalizada como
+la clave de la caché de respuestas). Como las métricas, cada worker acumula en
+memoria y suma en SQLite cada `flush_interval` segundos, así /buscar no escribe
+en disco en cada petición.
+
+`flask warm` usa `top()` para generar de antemano las respuestas más pedidas
+y tandas de tests, con pocas llamadas en paralelo y un ritmo máximo (`Throttle`)
+para no gastar la cuota de Gemini de golpe.
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from answer_cache import normalize_question
+from storage import connect
+
+logger = logging.getLogger(__name__)
+
+
+class PopularQuestions:
+    def __init__(self, path: str, flush_interval: float = 5.0):
+        self.path = path
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._reset_pending()
+        connect(path).execute(
+            """
+            CREATE TABLE IF NOT EXISTS popular_questions (
+                key TEXT PRIMARY KEY,
+                question TEXT NOT NULL,
+                count INTEGER NOT NULL,
+                last_seen REAL NOT NULL
+            )
+            """
+        )
+        atexit.register(self.flush)
+
+    def record(self, question: str) -> None:
+        key = normalize_question(question)
+        if not key:
+            return
+        with self._lock:
+            self._check_pid()
+            entry = self._pending.get(key)
+            if entry is None:
+                self._pending[key] = [question.strip(), 1, time.time()]
+            else:
+                entry[0], entry[1], entry[2] = question.strip(), entry[1] + 1, time.time()
+        if time.monotonic() - self._last_flush >= self.flush_interval:
+            try:
+                self.flush()
+            except Exception as e:
+                logger.warning("No se pudieron guardar las preguntas frecuentes: %s", e)
+
+    def flush(self) -> None:
+        with self._lock:
+            self._check_pid()
+            pending = self._pending
+            self._reset_pending()
+        if pending:
+            connect(self.path).executemany(
+                "INSERT INTO popular_questions (key, question, count, last_seen) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET question = excluded.question, "
+                "count = count + excluded.count, last_seen = MAX(last_seen, excluded.last_seen)",
+                [(key, question, count, seen) for key, (question, count, seen) in pending.items()],
+            )
+
+    def top(self, n: int, max_age: float = None) -> list:
+        """Las `n` dudas más preguntadas (vistas en los últimos `max_age` segundos), como (texto, veces)."""
+        self.flush()
+        since = time.time() - max_age if max_age else 0
+        return [
+            (question, count)
+            for question, count in connect(self.path).execute(
+                "SELECT question, count FROM popular_questions WHERE last_seen >= ? "
+                "ORDER BY count DESC, last_seen DESC LIMIT ?",
+                (since, n),
+            )
+        ]
+
+    def _reset_pending(self) -> None:
+        self._pending = {}
+        self._pid = os.getpid()
+        self._last_flush = time.monotonic()
+
+    def _check_pid(self) -> None:
+        if self._pid != os.getpid():
+            # Lo heredado del proceso padre ya lo cuenta el padre
+            self._reset_pending()
+
+
+class Throttle:
+    """Deja pasar a lo sumo `rate` llamadas por segundo entre todos los hilos."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next = time.monotonic()
+
+    def wait(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def run_throttled(fn, items, concurrency: int, throttle: Throttle) -> dict:
+    """Corre `fn(item)` para cada ítem con `concurrency` hilos al ritmo de `throttle`.
+
+    Devuelve {item: resultado o excepción}.
+    """
+    def run(item):
+        throttle.wait()
+        try:
+            return fn(item)
+        except Exception as e:
+            logger.warning("Error pre-calentando %r: %s", item, e)
+            return e
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        return dict(zip(items, executor.map(run, items)))